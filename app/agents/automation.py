@@ -1,10 +1,17 @@
 from typing import Dict, Any, List
 from pydantic import BaseModel, Field
 from .base import BaseAgent
+import asyncio
 import time
 import logging
 import json
 from app.utils.openai_client import OpenAIProjectClient
+from app.utils.model_routing import model_routing
+from app.utils.deadline import DeadlineExceeded, check_deadline, remaining
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.bulkhead import BulkheadFull
+from app.utils.command_lexer import command_lexer
+from app.utils.metrics import metrics
 from app.config import OPENAI_API_KEY
 
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +42,7 @@ class AutomationAgent(BaseAgent):
         logging.info(f"[AutomationAgent] ENTER execute with task: {json.dumps(task, indent=2)}")
         retries = 0
         last_error = None
+        escalate = False
         try:
             self.validate_input(task)
             logging.info("[AutomationAgent] Input validation successful")
@@ -43,24 +51,14 @@ class AutomationAgent(BaseAgent):
             return {"error": f"Input validation failed: {e}", "status": "failed"}
         while retries < self.max_retries:
             try:
+                check_deadline(f"automation attempt {retries + 1}")
                 logging.info(f"[AutomationAgent] Attempt {retries+1} to generate script")
-                script = await self._generate_script(task["task"])
+                script = await self._generate_script(task["task"], escalate=escalate)
                 logging.info(f"[AutomationAgent] Script generated: {script}")
                 verification = await self._verify_script(script)
                 logging.info(f"[AutomationAgent] Verification: {json.dumps(verification, indent=2)}")
-                commands = []
-                if script:
-                    lines = script.splitlines()
-                    logging.info(f"[AutomationAgent] Processing {len(lines)} lines from script")
-                    for line in lines:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            if line.startswith('az'):
-                                commands.append(line)
-                                logging.info(f"[AutomationAgent] Extracted Azure CLI command: {line}")
-                            elif line.startswith('$') or line.startswith('Get-') or line.startswith('Set-') or line.startswith('New-'):
-                                commands.append(line)
-                                logging.info(f"[AutomationAgent] Extracted PowerShell command: {line}")
+                # Parsed once per script; the graph reads the same cached parse
+                commands = command_lexer.command_texts(script, "powershell")
                 logging.info(f"[AutomationAgent] Extracted {len(commands)} commands")
                 result = {
                     "script": {
@@ -73,10 +71,21 @@ class AutomationAgent(BaseAgent):
                 }
                 logging.info(f"[AutomationAgent] RETURNING result: {json.dumps(result, indent=2)}")
                 return result
+            except DeadlineExceeded:
+                raise
+            except (CircuitOpenError, BulkheadFull) as e:
+                # Retrying cannot help while the provider is failing or our share of it is
+                # used up, and would only add load; give up straight away
+                error_result = {"error": f"LLM unavailable: {e}", "status": "failed"}
+                logging.error(f"[AutomationAgent] RETURNING error result: {json.dumps(error_result, indent=2)}")
+                return error_result
             except Exception as e:
                 last_error = str(e)
                 logging.error(f"[AutomationAgent] Error: {last_error}", exc_info=True)
                 retries += 1
+                # Unparseable output is a validation failure: retry on the stronger model
+                if isinstance(e, (ValueError, KeyError)) and model_routing.can_escalate("automation.generate"):
+                    escalate = True
                 if retries == self.max_retries:
                     error_result = {
                         "error": f"Failed after {retries} retries. Last error: {last_error}",
@@ -85,7 +94,9 @@ class AutomationAgent(BaseAgent):
                     logging.error(f"[AutomationAgent] RETURNING error result: {json.dumps(error_result, indent=2)}")
                     return error_result
                 logging.info(f"[AutomationAgent] Retrying (attempt {retries + 1}/{self.max_retries})")
-                time.sleep(1)
+                metrics.increment("agent_retries", agent="automation", reason="escalation" if escalate else "retry")
+                left = remaining()
+                await asyncio.sleep(1 if left is None else max(0, min(1, left)))
         error_result = {"error": "Unexpected error in automation execution", "status": "failed"}
         logging.error(f"[AutomationAgent] RETURNING error result: {json.dumps(error_result, indent=2)}")
         return error_result
@@ -117,7 +128,7 @@ class AutomationAgent(BaseAgent):
                 return {"script": script}
             raise ValueError("Could not extract script from LLM response (invalid JSON and no regex match).")
 
-    async def _generate_script(self, task: str) -> str:
+    async def _generate_script(self, task: str, escalate: bool = False) -> str:
         logging.info(f"[AutomationAgent] ENTER _generate_script with task: {task}")
         messages = [
             {"role": "system", "content": (
@@ -140,8 +151,8 @@ class AutomationAgent(BaseAgent):
             logging.info(f"[AutomationAgent] Sending request to OpenAI API with messages: {json.dumps(messages, indent=2)}")
             response = await self.client.create_chat_completion(
                 messages=messages,
-                model="gpt-3.5-turbo",
-                temperature=0.7
+                call_site="automation.generate",
+                escalate=escalate
             )
             logging.info(f"[AutomationAgent] OpenAI API raw response: {json.dumps(response, indent=2)}")
             content = response["choices"][0]["message"]["content"]
@@ -155,7 +166,7 @@ class AutomationAgent(BaseAgent):
             logging.error(f"[AutomationAgent] Error generating script: {str(e)}", exc_info=True)
             raise
     
-    async def _verify_script(self, script: str) -> Dict[str, Any]:
+    async def _verify_script(self, script: str, escalate: bool = False) -> Dict[str, Any]:
         """Verify the generated script for security and best practices."""
         logging.info(f"AutomationAgent._verify_script called with script: {script}")
         messages = [
@@ -166,8 +177,8 @@ class AutomationAgent(BaseAgent):
             logging.info(f"AutomationAgent sending verification request to OpenAI API with messages: {json.dumps(messages, indent=2)}")
             response = await self.client.create_chat_completion(
                 messages=messages,
-                model="gpt-3.5-turbo",
-                temperature=0.7
+                call_site="automation.verify",
+                escalate=escalate
             )
             logging.info(f"AutomationAgent received verification response from OpenAI API: {json.dumps(response, indent=2)}")
             content = response["choices"][0]["message"]["content"]
@@ -179,16 +190,28 @@ class AutomationAgent(BaseAgent):
                 if field not in parsed:
                     raise ValueError(f"Missing required field in verification: {field}")
             return parsed
+        except ValueError as e:
+            if not escalate and model_routing.can_escalate("automation.verify"):
+                logging.warning(f"AutomationAgent verification output invalid, escalating: {e}")
+                metrics.increment("agent_retries", agent="automation", reason="escalation")
+                return await self._verify_script(script, escalate=True)
+            logging.error(f"AutomationAgent error verifying script: {str(e)}", exc_info=True)
+            return self._failed_verification(e)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logging.error(f"AutomationAgent error verifying script: {str(e)}", exc_info=True)
-            return {
-                "syntax_check": False,
-                "security_check": False,
-                "lint_score": 0,
-                "lint_issues": [f"Verification failed: {str(e)}"],
-                "verification_steps": ["Script verification failed"],
-                "expected_output": "Error during script verification"
-            }
+            return self._failed_verification(e)
+    
+    def _failed_verification(self, e: Exception) -> Dict[str, Any]:
+        return {
+            "syntax_check": False,
+            "security_check": False,
+            "lint_score": 0,
+            "lint_issues": [f"Verification failed: {str(e)}"],
+            "verification_steps": ["Script verification failed"],
+            "expected_output": "Error during script verification"
+        }
     
     def validate_input(self, data: Dict[str, Any]) -> None:
         """Validate input data."""
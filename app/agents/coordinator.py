@@ -61,8 +61,7 @@ class CoordinatorAgent(BaseAgent):
             logging.info(f"CoordinatorAgent sending request to OpenAI API with messages: {json.dumps(messages, indent=2)}")
             response = await self.client.create_chat_completion(
                 messages=messages,
-                model="gpt-3.5-turbo",
-                temperature=0.7
+                call_site="coordinator.plan"
             )
             
             # Log the raw response
@@ -2,12 +2,17 @@ from typing import Dict, Any, List, Union
 from pydantic import BaseModel, Field
 import logging
 import json
+import re
 from app.agents.base import BaseAgent
-from app.config import OPENAI_API_KEY
-import openai
+from app.utils.model_routing import model_routing
+from app.utils.deadline import DeadlineExceeded
+from app.utils.metrics import metrics
 
 logging.basicConfig(level=logging.INFO)
 
+# Placeholder root cause used when a completion cannot be parsed
+UNPARSED_ROOT_CAUSE = "Could not parse diagnosis"
+
 class Solution(BaseModel):
     description: str = Field(..., description="Detailed description of the solution")
     confidence: float = Field(..., description="Confidence level between 0 and 1")
@@ -25,9 +30,52 @@ class DiagnosisResult(BaseModel):
 class DiagnosticAgent(BaseAgent):
     def __init__(self):
         super().__init__("DiagnosticAgent")
-        self.client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
         logging.info("Initialized DiagnosticAgent")
     
+    def _diagnosis_messages(self, task: str) -> List[Dict[str, str]]:
+        """Build the prompt used for every diagnosis request."""
+        return [
+            {"role": "system", "content": (
+                "You are an expert IT diagnostician. Analyze the given task and provide a diagnosis "
+                "in the following JSON format:\n"
+                "{\n"
+                "  \"root_cause\": \"Brief description of the root cause\",\n"
+                "  \"evidence\": [\"List of evidence points\"],\n"
+                "  \"solutions\": [\n"
+                "    {\n"
+                "      \"title\": \"Solution title\",\n"
+                "      \"confidence\": \"High/Medium/Low\"\n"
+                "    }\n"
+                "  ]\n"
+                "}\n"
+                "Respond ONLY with the JSON object, no other text."
+            )},
+            {"role": "user", "content": f"Analyze this task: {task}"}
+        ]
+    
+    def _parse_diagnosis_text(self, result_text: str) -> Dict[str, Any]:
+        """Parse a diagnosis from raw completion text, falling back to a placeholder."""
+        result_text = result_text.strip()
+        try:
+            # First try direct JSON parsing
+            return json.loads(result_text)
+        except json.JSONDecodeError:
+            pass
+        # If that fails, try to extract JSON from markdown code blocks
+        json_match = re.search(r'```(?:json)?\s*(\{[\s\S]*?\})\s*```', result_text)
+        if json_match:
+            try:
+                return json.loads(json_match.group(1))
+            except json.JSONDecodeError:
+                logging.warning("[DiagnosticAgent] Failed to parse JSON from markdown code block")
+        else:
+            logging.warning("[DiagnosticAgent] No JSON found in response")
+        return {
+            "root_cause": UNPARSED_ROOT_CAUSE,
+            "evidence": [],
+            "solutions": []
+        }
+    
     async def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute diagnostic analysis."""
         logging.info(f"DiagnosticAgent.execute called with task: {json.dumps(task, indent=2)}")
@@ -37,61 +85,12 @@ class DiagnosticAgent(BaseAgent):
                 raise ValueError("Invalid task format")
             logging.info("DiagnosticAgent input validation successful")
             
-            # Generate diagnosis using OpenAI
-            messages = [
-                {"role": "system", "content": (
-                    "You are an expert IT diagnostician. Analyze the given task and provide a diagnosis "
-                    "in the following JSON format:\n"
-                    "{\n"
-                    "  \"root_cause\": \"Brief description of the root cause\",\n"
-                    "  \"evidence\": [\"List of evidence points\"],\n"
-                    "  \"solutions\": [\n"
-                    "    {\n"
-                    "      \"title\": \"Solution title\",\n"
-                    "      \"confidence\": \"High/Medium/Low\"\n"
-                    "    }\n"
-                    "  ]\n"
-                    "}\n"
-                    "Respond ONLY with the JSON object, no other text."
-                )},
-                {"role": "user", "content": f"Analyze this task: {task['task']}"}
-            ]
-            
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            result_text = response.choices[0].message.content.strip()
-            logging.info(f"OpenAI API raw response: {response}")
-            
-            # Try to parse the response as JSON
-            try:
-                # First try direct JSON parsing
-                diagnosis = json.loads(result_text)
-            except json.JSONDecodeError:
-                # If that fails, try to extract JSON from markdown code blocks
-                import re
-                json_match = re.search(r'```(?:json)?\s*(\{[\s\S]*?\})\s*```', result_text)
-                if json_match:
-                    try:
-                        diagnosis = json.loads(json_match.group(1))
-                    except json.JSONDecodeError:
-                        logging.warning("[DiagnosticAgent] Failed to parse JSON from markdown code block")
-                        diagnosis = {
-                            "root_cause": "Could not parse diagnosis",
-                            "evidence": [],
-                            "solutions": []
-                        }
-                else:
-                    logging.warning("[DiagnosticAgent] No JSON found in response")
-                    diagnosis = {
-                        "root_cause": "Could not parse diagnosis",
-                        "evidence": [],
-                        "solutions": []
-                    }
+            # Generate diagnosis using OpenAI, escalating once if the output cannot be parsed
+            diagnosis = await self._request_diagnosis(task["task"])
+            if self._is_unparsed(diagnosis) and model_routing.can_escalate("diagnostic"):
+                logging.warning("[DiagnosticAgent] Unparseable diagnosis, retrying on escalation model")
+                metrics.increment("agent_retries", agent="diagnostic", reason="escalation")
+                diagnosis = await self._request_diagnosis(task["task"], escalate=True)
             
             logging.info(f"DiagnosticAgent generated diagnosis: {json.dumps(diagnosis, indent=2)}")
             
@@ -99,6 +98,8 @@ class DiagnosticAgent(BaseAgent):
                 "diagnosis": diagnosis,
                 "status": "success"
             }
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logging.error(f"Error in DiagnosticAgent.execute: {e}", exc_info=True)
             return {
@@ -110,6 +111,37 @@ class DiagnosticAgent(BaseAgent):
                 "status": "failed",
                 "error": str(e)
             }
+    
+    async def _request_diagnosis(self, task: str, escalate: bool = False) -> Dict[str, Any]:
+        response = await self.client.create_chat_completion(
+            messages=self._diagnosis_messages(task),
+            call_site="diagnostic",
+            escalate=escalate
+        )
+        return self._parse_diagnosis_text(response["choices"][0]["message"]["content"] or "")
+    
+    def _is_unparsed(self, diagnosis: Dict[str, Any]) -> bool:
+        return diagnosis.get("root_cause") == UNPARSED_ROOT_CAUSE
+    
+    async def sample_diagnoses(self, task: str, n: int = 3, max_tokens: int = 500) -> Dict[str, Any]:
+        """Sample `n` independent diagnoses in a single request.
+
+        Returns the parsed candidates together with the tokens the request consumed.
+        """
+        response = await self.client.create_chat_completion(
+            messages=self._diagnosis_messages(task),
+            max_tokens=max_tokens,
+            n=n,
+            call_site="diagnostic.sample"
+        )
+        candidates = [
+            self._parse_diagnosis_text(choice["message"]["content"] or "")
+            for choice in response["choices"]
+        ]
+        usage = response.get("usage") or {}
+        tokens = usage.get("total_tokens") or max_tokens * n
+        logging.info(f"DiagnosticAgent sampled {len(candidates)} diagnoses using {tokens} tokens")
+        return {"candidates": candidates, "tokens": tokens}
 
     def _parse_llm_json_response(self, content: str) -> dict:
         import re
@@ -153,8 +185,7 @@ class DiagnosticAgent(BaseAgent):
         try:
             response = await self.client.create_chat_completion(
                 messages=messages,
-                model="gpt-3.5-turbo",
-                temperature=0.7
+                call_site="diagnostic"
             )
             content = response["choices"][0]["message"]["content"]
             diagnosis = self._parse_llm_json_response(content)
@@ -0,0 +1,33 @@
+"""
+Process-wide agent instances, constructed on first use.
+"""
+import importlib
+import logging
+from typing import Dict
+
+from app.agents.base import BaseAgent
+
+# Agent name -> (module, class). Modules are only imported when the agent is first requested.
+AGENT_CLASSES = {
+    "diagnostic": ("app.agents.diagnostic", "DiagnosticAgent"),
+    "automation": ("app.agents.automation", "AutomationAgent"),
+    "writer": ("app.agents.writer", "WriterAgent"),
+}
+
+_instances: Dict[str, BaseAgent] = {}
+
+def get_agent(name: str) -> BaseAgent:
+    """Return the shared instance of the named agent, creating it on first use."""
+    agent = _instances.get(name)
+    if agent is None:
+        if name not in AGENT_CLASSES:
+            raise ValueError(f"Unknown agent: {name}")
+        module_name, class_name = AGENT_CLASSES[name]
+        agent_class = getattr(importlib.import_module(module_name), class_name)
+        agent = _instances[name] = agent_class()
+        logging.info(f"[AgentRegistry] Constructed {class_name}")
+    return agent
+
+def reset_agents() -> None:
+    """Drop all constructed agents (used by tests)."""
+    _instances.clear()
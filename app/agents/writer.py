@@ -4,7 +4,11 @@ from .base import BaseAgent
 import logging
 import json
 from app.utils.openai_client import OpenAIProjectClient
-from app.config import OPENAI_API_KEY
+from app.utils.model_routing import model_routing
+from app.utils.deadline import DeadlineExceeded
+from app.utils.context_builder import ContextBuilder
+from app.utils.metrics import metrics
+from app.config import OPENAI_API_KEY, WRITER_CONTEXT_TOKENS
 
 logging.basicConfig(level=logging.INFO)
 
@@ -40,8 +44,8 @@ class WriterAgent(BaseAgent):
                 await validate_result
             logging.info("WriterAgent input validation successful")
             
-            # Generate email draft
-            email_draft = await self._generate_email(task["task"])
+            # Generate email draft from the task and what earlier stages found
+            email_draft = await self._generate_email(task["task"], self._build_context(task))
             logging.info(f"WriterAgent generated email draft: {email_draft}")
             
             result = {
@@ -51,6 +55,8 @@ class WriterAgent(BaseAgent):
             logging.info(f"WriterAgent returning result: {json.dumps(result, indent=2)}")
             return result
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             error_result = {
                 "error": str(e),
@@ -85,19 +91,31 @@ class WriterAgent(BaseAgent):
                 return {"email": email}
             raise ValueError("Could not extract email from LLM response (invalid JSON and no regex match).")
 
-    async def _generate_email(self, task: str) -> str:
+    def _build_context(self, task: Dict[str, Any]) -> str:
+        """Diagnosis and script from earlier stages, rendered within the writer's token budget."""
+        builder = ContextBuilder(WRITER_CONTEXT_TOKENS)
+        if task.get("diagnosis"):
+            builder.add("Diagnosis", self._format_diagnosis(task["diagnosis"]))
+        if task.get("script"):
+            builder.add("Remediation Script", self._format_script(task["script"]))
+        return builder.build()
+
+    async def _generate_email(self, task: str, context: str = "", escalate: bool = False) -> str:
         """Generate an email draft using the LLM."""
         logging.info(f"WriterAgent._generate_email called with task: {task}")
+        prompt = f"Generate an email draft for:\n{task}\n\n"
+        if context:
+            prompt += f"Base the email on these findings:\n{context}\n\n"
         messages = [
             {"role": "system", "content": "You are an expert technical writer. Generate clear, professional email drafts. Use only double quotes for all property names and string values."},
-            {"role": "user", "content": f"Generate an email draft for:\n{task}\n\nFormat the response as a JSON object with an 'email' field containing the draft."}
+            {"role": "user", "content": prompt + "Format the response as a JSON object with an 'email' field containing the draft."}
         ]
         try:
             logging.info(f"WriterAgent sending request to OpenAI API with messages: {json.dumps(messages, indent=2)}")
             response = await self.client.create_chat_completion(
                 messages=messages,
-                model="gpt-3.5-turbo",
-                temperature=0.7
+                call_site="writer",
+                escalate=escalate
             )
             # Log the raw response
             logging.info(f"WriterAgent received response from OpenAI API: {json.dumps(response, indent=2)}")
@@ -108,6 +126,13 @@ class WriterAgent(BaseAgent):
             email = parsed["email"]
             logging.info(f"WriterAgent parsed email draft: {email}")
             return email
+        except (ValueError, KeyError) as e:
+            if not escalate and model_routing.can_escalate("writer"):
+                logging.warning(f"WriterAgent email output invalid, escalating: {e}")
+                metrics.increment("agent_retries", agent="writer", reason="escalation")
+                return await self._generate_email(task, context, escalate=True)
+            logging.error(f"WriterAgent error generating email: {str(e)}", exc_info=True)
+            raise
         except Exception as e:
             logging.error(f"WriterAgent error generating email: {str(e)}", exc_info=True)
             raise
@@ -122,15 +147,18 @@ class WriterAgent(BaseAgent):
         if "root_cause" in diagnosis:
             formatted.append(f"Root Cause: {diagnosis['root_cause']}")
             
-        if "evidence" in diagnosis:
+        if diagnosis.get("evidence"):
             formatted.append("\nEvidence:")
             for evidence in diagnosis["evidence"]:
                 formatted.append(f"- {evidence}")
                 
-        if "solutions" in diagnosis:
+        if diagnosis.get("solutions"):
             formatted.append("\nProposed Solutions:")
             for solution in diagnosis["solutions"]:
-                formatted.append(f"- {solution['title']} (Confidence: {solution['confidence']})")
+                if isinstance(solution, dict):
+                    formatted.append(f"- {solution.get('title', 'Solution')} (Confidence: {solution.get('confidence', 'unknown')})")
+                else:
+                    formatted.append(f"- {solution}")
                 
         return "\n".join(formatted)
 
@@ -141,12 +169,13 @@ class WriterAgent(BaseAgent):
             
         formatted = []
         
-        if "code" in script:
-            formatted.append("Script Overview:")
-            formatted.append(script["code"][:200] + "...")  # First 200 characters
-            
         if "lint_passed" in script:
-            formatted.append(f"\nScript Validation: {'Passed' if script['lint_passed'] else 'Failed'}")
+            formatted.append(f"Script Validation: {'Passed' if script['lint_passed'] else 'Failed'}")
+            
+        # The code goes last so that it is what gets truncated when the budget is tight
+        if script.get("code"):
+            formatted.append(f"Script ({script.get('language', 'unknown')}):")
+            formatted.append(script["code"])
             
         return "\n".join(formatted)
 
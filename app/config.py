@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -13,4 +14,165 @@ if not OPENAI_API_KEY:
 # API Configuration
 API_HOST = "0.0.0.0"
 API_PORT = 8000
-API_RELOAD = True 
\ No newline at end of file
+API_RELOAD = True
+
+# Task routing: requests whose keyword scores lead by less than ROUTER_MIN_MARGIN
+# are sent to the DSPy analyzer when ROUTER_LLM_ENABLED is set
+ROUTER_LLM_ENABLED = os.getenv("ROUTER_LLM_ENABLED", "true").lower() == "true"
+ROUTER_MIN_MARGIN = int(os.getenv("ROUTER_MIN_MARGIN", "1"))
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", "1024"))
+DSPY_PROGRAM_PATH = os.getenv("DSPY_PROGRAM_PATH", "data/dspy_router.json")
+
+# Per call-site LLM settings. Lookups fall back from "<agent>.<call>" to "<agent>" to "default".
+# "escalation_model" is only used when a call's output fails validation.
+# "hedge": true opts a call site into hedged requests (see HEDGE_* below).
+# MODEL_ROUTING_FILE may point to a JSON file with entries that override these.
+MODEL_ROUTING = {
+    "default": {"model": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 1000, "timeout": 30.0, "hedge": False},
+    "diagnostic": {"max_tokens": 500, "escalation_model": "gpt-4o-mini"},
+    "automation.generate": {"temperature": 0.2, "escalation_model": "gpt-4o-mini"},
+    "automation.verify": {"temperature": 0.0, "max_tokens": 400, "timeout": 20.0},
+    "writer": {"temperature": 0.7, "escalation_model": "gpt-4o-mini"},
+    "router": {"temperature": 0.0, "max_tokens": 300, "timeout": 10.0},
+    "coordinator.plan": {"temperature": 0.0, "max_tokens": 300, "timeout": 10.0},
+    "context_pruner": {"temperature": 0.3, "max_tokens": 2000},
+}
+MODEL_ROUTING_FILE = os.getenv("MODEL_ROUTING_FILE")
+
+# Admission control for pipeline execution: token buckets (requests/second and burst size)
+# and a bounded number of concurrent and queued pipelines
+ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "20"))
+ADMISSION_GLOBAL_BURST = float(os.getenv("ADMISSION_GLOBAL_BURST", "40"))
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "5"))
+ADMISSION_CLIENT_BURST = float(os.getenv("ADMISSION_CLIENT_BURST", "20"))
+MAX_CONCURRENT_PIPELINES = int(os.getenv("MAX_CONCURRENT_PIPELINES", "8"))
+MAX_QUEUED_PIPELINES = int(os.getenv("MAX_QUEUED_PIPELINES", "32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+# How long and how many Idempotency-Key responses are remembered for safe client retries
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+# Per-model circuit breaker around LLM calls: the circuit opens when, over the last
+# CIRCUIT_WINDOW calls, the error rate or the share of slow calls crosses its threshold
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_ERROR_THRESHOLD = float(os.getenv("CIRCUIT_ERROR_THRESHOLD", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "20"))
+CIRCUIT_SLOW_CALL_THRESHOLD = float(os.getenv("CIRCUIT_SLOW_CALL_THRESHOLD", "0.8"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "2"))
+# Model to use while a call site's model has an open circuit (a "fallback_model" entry in
+# MODEL_ROUTING takes precedence); unset means fail fast
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL")
+
+# Hedged LLM requests for call sites with "hedge": true: a duplicate is sent when a call runs
+# past the HEDGE_PERCENTILE of recent latency for its call site and model. At most
+# HEDGE_MAX_RATE of the last HEDGE_RATE_WINDOW calls are hedged, bounding extra token spend.
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.05"))
+HEDGE_RATE_WINDOW = int(os.getenv("HEDGE_RATE_WINDOW", "1000"))
+
+# Completion webhooks (callback_url): per-host batching window and size, retry policy and
+# the shared HTTP client's timeout and connection pool size
+WEBHOOK_BATCH_WINDOW = float(os.getenv("WEBHOOK_BATCH_WINDOW", "0.05"))
+WEBHOOK_MAX_BATCH = int(os.getenv("WEBHOOK_MAX_BATCH", "50"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+WEBHOOK_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_SECONDS", "0.5"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "20"))
+# Hosts a callback_url may name (comma-separated). When empty, any host is accepted whose
+# addresses are all public: private, loopback, link-local, reserved and cloud metadata
+# addresses are refused. Listed hosts are trusted even when they resolve to private addresses.
+WEBHOOK_ALLOWED_HOSTS = [host.strip().lower() for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+
+# Priority lanes for pipeline slots: approvals and critical tasks first, batch submissions
+# last. Each lane may use at most this many of the MAX_CONCURRENT_PIPELINES slots, and a
+# waiting request moves up one lane for every SCHEDULER_AGING_SECONDS it has waited.
+SCHEDULER_LANE_LIMITS = {
+    "critical": int(os.getenv("SCHEDULER_CRITICAL_CONCURRENCY", str(MAX_CONCURRENT_PIPELINES))),
+    "interactive": int(os.getenv("SCHEDULER_INTERACTIVE_CONCURRENCY", "6")),
+    "batch": int(os.getenv("SCHEDULER_BATCH_CONCURRENCY", "2")),
+}
+SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "5"))
+
+# Per-agent bulkheads for LLM calls, keyed by the agent part of the call site: concurrent
+# calls, call rate and burst, and how many calls may queue and for how long
+BULKHEADS = {
+    "diagnostic": {"max_concurrent": 8, "rate": 5.0, "burst": 10.0, "max_queue": 32, "queue_timeout": 20.0},
+    "automation": {"max_concurrent": 4, "rate": 3.0, "burst": 6.0, "max_queue": 16, "queue_timeout": 20.0},
+    "writer": {"max_concurrent": 4, "rate": 3.0, "burst": 6.0, "max_queue": 16, "queue_timeout": 20.0},
+    "router": {"max_concurrent": 8, "rate": 10.0, "burst": 20.0, "max_queue": 32, "queue_timeout": 5.0},
+}
+
+# Directory where task records and per-node pipeline checkpoints are persisted, so tasks
+# survive a restart and unfinished ones resume; unset keeps tasks in memory only
+TASK_STORE_DIR = os.getenv("TASK_STORE_DIR")
+
+# Content-addressed store for generated scripts and email drafts: bytes kept in memory before
+# the least recently used spill to ARTIFACT_DIR, and the size from which content is compressed.
+# With a task store, artifacts are written to disk as they are stored so records resolve after
+# a restart
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR") or (
+    os.path.join(TASK_STORE_DIR, "artifacts") if TASK_STORE_DIR else os.path.join(tempfile.gettempdir(), "ai-autopilot-artifacts")
+)
+ARTIFACT_MEMORY_BYTES = int(os.getenv("ARTIFACT_MEMORY_BYTES", str(64 * 1024 * 1024)))
+ARTIFACT_COMPRESS_MIN_BYTES = int(os.getenv("ARTIFACT_COMPRESS_MIN_BYTES", "1024"))
+ARTIFACT_DURABLE = bool(TASK_STORE_DIR)
+
+# Token budget for the diagnosis and script context included in the writer prompt
+WRITER_CONTEXT_TOKENS = int(os.getenv("WRITER_CONTEXT_TOKENS", "800"))
+
+# Scripts whose parsed commands are kept, keyed by script hash
+COMMAND_LEXER_CACHE_SIZE = int(os.getenv("COMMAND_LEXER_CACHE_SIZE", "256"))
+
+# Response compression: smallest body worth compressing, gzip level and brotli quality (brotli
+# is used when the package is installed), and compressed bodies cached for strong ETags
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "256"))
+
+# Finished tasks kept in memory (and in the task store): at most TASK_RETENTION_MAX of them,
+# each for at most TASK_RETENTION_SECONDS after it finished
+TASK_RETENTION_MAX = int(os.getenv("TASK_RETENTION_MAX", "10000"))
+TASK_RETENTION_SECONDS = float(os.getenv("TASK_RETENTION_SECONDS", "86400"))
+
+# Memory diagnostics: tracemalloc tracing, with this many frames per allocation, behind the
+# admin memory report. Tracing slows every allocation, so it is off by default
+MEMORY_PROFILING = os.getenv("MEMORY_PROFILING", "false").lower() == "true"
+MEMORY_PROFILING_FRAMES = int(os.getenv("MEMORY_PROFILING_FRAMES", "10"))
+
+# Token expected in the X-Admin-Token header of admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# On-demand request profiling: a request sent with X-Profile: 1 and the admin token is sampled
+# every REQUEST_PROFILING_INTERVAL seconds (for at most REQUEST_PROFILING_MAX_SECONDS) and its
+# profile written to REQUEST_PROFILING_DIR
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "false").lower() == "true"
+REQUEST_PROFILING_DIR = os.getenv("REQUEST_PROFILING_DIR", "logs/profiles")
+REQUEST_PROFILING_INTERVAL = float(os.getenv("REQUEST_PROFILING_INTERVAL", "0.005"))
+REQUEST_PROFILING_MAX_SECONDS = float(os.getenv("REQUEST_PROFILING_MAX_SECONDS", "120"))
+
+# LLM record/replay: "record" appends every chat completion exchange to LLM_CASSETTE_PATH;
+# "replay" answers from that file instead of the provider, after the recorded latency times
+# LLM_CASSETTE_LATENCY_SCALE (0 for no delay); "off" calls the provider as usual
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl")
+LLM_CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "1.0"))
+
+# LLM fault injection for testing retries, fallbacks and status handling under failure. With
+# LLM_FAULT_INJECTION set, each LLM call fails or is distorted with these probabilities;
+# LLM_FAULT_SEED makes a run repeatable and LLM_FAULT_TOKEN_DELAY is the slow-token delay
+LLM_FAULT_INJECTION = os.getenv("LLM_FAULT_INJECTION", "false").lower() == "true"
+LLM_FAULT_RATES = {
+    "timeout": float(os.getenv("LLM_FAULT_TIMEOUT", "0")),
+    "rate_limit": float(os.getenv("LLM_FAULT_RATE_LIMIT", "0")),
+    "server_error": float(os.getenv("LLM_FAULT_SERVER_ERROR", "0")),
+    "truncated_json": float(os.getenv("LLM_FAULT_TRUNCATED_JSON", "0")),
+    "fenced_json": float(os.getenv("LLM_FAULT_FENCED_JSON", "0")),
+    "slow_tokens": float(os.getenv("LLM_FAULT_SLOW_TOKENS", "0")),
+}
+LLM_FAULT_SEED = int(os.getenv("LLM_FAULT_SEED", "0"))
+LLM_FAULT_TOKEN_DELAY = float(os.getenv("LLM_FAULT_TOKEN_DELAY", "0.02"))
@@ -1,21 +1,30 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Callable, AsyncContextManager
+from collections import OrderedDict
 from pydantic import BaseModel, Field
 from app.utils.openai_client import OpenAIProjectClient
 from dotenv import load_dotenv
 import os
-from app.workflows.coordinator_graph import create_coordinator_graph, WorkflowState, CoordinatorGraph
-from app.agents.diagnostic import DiagnosticAgent
-from app.agents.automation import AutomationAgent
-from app.agents.writer import WriterAgent
-from app.config import OPENAI_API_KEY
+from app.workflows.coordinator_graph import create_coordinator_graph, WorkflowState, CoordinatorGraph, checkpoint_state
+from app.agents.registry import get_agent
+from app.config import OPENAI_API_KEY, TASK_STORE_DIR, TASK_RETENTION_MAX, TASK_RETENTION_SECONDS
 import json
 from datetime import datetime
 import uuid
 from fastapi import HTTPException
-from app.workflows.task_router import TaskRouter
-from app.workflows.dspy_router import DSPyRouter
-from app.workflows.context_pruner import ContextPruner
-from app.workflows.diagnostic_graph import DiagnosticGraph
+from app.workflows.task_router import TaskRouter, TaskType, normalize_request
+from app.workflows.hybrid_router import HybridRouter
+from app.utils.deadline import DeadlineExceeded, deadline_scope, remaining
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
+from app.utils.serialization import dumps_bytes
+from app.utils.webhooks import WebhookDispatcher
+from app.utils.subscriptions import SubscriptionHub
+from app.utils.task_store import TaskStore
+from app.utils.admission import AdmissionRejected
+from app.utils.artifacts import artifacts
+from app.utils.command_lexer import command_lexer
+import asyncio
+import hashlib
 import time
 import logging
 
@@ -67,56 +76,147 @@ class TaskResponse(BaseModel):
     commands: List[str] = Field(default_factory=list)
     plan: Optional[Dict[str, Any]] = None
     errors: Optional[List[str]] = None
+    completed_stages: Optional[List[str]] = None
+    coalesced_with: Optional[str] = None
+    artifacts: Optional[Dict[str, str]] = None
+
+# Response fields that are filled from stored artifacts
+ARTIFACT_FIELDS = {"script", "email_draft", "commands"}
+
+def needs_artifacts(inline_artifacts: bool, fields: Optional[Tuple[str, ...]]) -> bool:
+    """Whether a representation has to read artifacts back in at all."""
+    return inline_artifacts and (fields is None or not ARTIFACT_FIELDS.isdisjoint(fields))
+
+def project_response(response: BaseModel, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+    """A response as a dict with only `fields`, so unrequested fields are never serialized."""
+    return response.model_dump(include=set(fields) if fields is not None else None)
 
 class Coordinator:
     def __init__(self):
         self.coordinator_graph = CoordinatorGraph()
-        self.dspy_router = DSPyRouter()
-        self.context_pruner = ContextPruner()
-        self.diagnostic_graph = DiagnosticGraph()
+        self.task_router = TaskRouter()
+        self.router = HybridRouter(self.task_router)
         self.tasks = {}
-        self.client = OpenAIProjectClient(api_key=OPENAI_API_KEY)
+        # Identical requests arriving while one is running share its execution
+        self._singleflight = SingleFlight()
+        # Outcome of each approval, so a repeated approve shares it instead of re-running
+        self._approvals: Dict[str, asyncio.Future] = {}
+        # Serialized GET responses of finished tasks: task_id -> (version, body, etag)
+        self._response_cache: Dict[str, Dict[Tuple[bool, Optional[Tuple[str, ...]]], Tuple[int, bytes, str]]] = {}
+        # Set (and dropped) on the next change to a task; created only while someone waits
+        self._task_events: Dict[str, asyncio.Event] = {}
+        # Called with (task_id, record) after every change to a task record
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        # callback_url notifications, and the status each task was last notified for
+        self.webhooks = WebhookDispatcher()
+        self._notified_status: Dict[str, str] = {}
+        self.add_listener(self._notify_callback)
+        # Status-change events for WebSocket subscribers
+        self.events = SubscriptionHub()
+        self.add_listener(self.events.publish)
+        # Persist every change (including per-node checkpoints) when a store is configured,
+        # written in the background so file I/O stays off the event loop
+        self.store = TaskStore(TASK_STORE_DIR) if TASK_STORE_DIR else None
+        if self.store is not None:
+            self.add_listener(self.store.save_later)
+        self._resumed: Dict[str, asyncio.Task] = {}
+        # Finished tasks in the order they finished; the oldest are dropped once there are
+        # more than max_retained_tasks or they are older than retention_seconds
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self.max_retained_tasks = TASK_RETENTION_MAX
+        self.retention_seconds = TASK_RETENTION_SECONDS
+        # Heavy helpers (LLM clients, diagnostic graph) are built on first use
+        self._context_pruner = None
+        self._diagnostic_graph = None
+        self._client = None
+    
+    @property
+    def context_pruner(self):
+        if self._context_pruner is None:
+            from app.workflows.context_pruner import ContextPruner
+            self._context_pruner = ContextPruner()
+        return self._context_pruner
+    
+    @property
+    def diagnostic_graph(self):
+        if self._diagnostic_graph is None:
+            from app.workflows.diagnostic_graph import DiagnosticGraph
+            self._diagnostic_graph = DiagnosticGraph()
+        return self._diagnostic_graph
+    
+    @property
+    def client(self) -> OpenAIProjectClient:
+        if self._client is None:
+            self._client = OpenAIProjectClient(api_key=OPENAI_API_KEY)
+        return self._client
+    
+    def execution_lane(self, task: str, priority: Optional[str] = None) -> str:
+        """Scheduler lane for a new request: "batch" if asked for, "critical" for tasks the
+        keyword router classifies as critical, "interactive" otherwise."""
+        if priority == "batch":
+            return "batch"
+        task_type, _ = self.task_router.classify(task)
+        return "critical" if task_type == TaskType.CRITICAL else "interactive"
     
-    async def execute_task(self, task: str, require_approval: bool = False) -> TaskResponse:
-        """Execute a task with optional approval workflow."""
+    async def execute_task(
+        self,
+        task: str,
+        require_approval: bool = False,
+        deadline_seconds: Optional[float] = None,
+        callback_url: Optional[str] = None
+    ) -> TaskResponse:
+        """Execute a task with optional approval workflow.
+
+        `deadline_seconds` bounds routing and the pipeline run; when it is hit the task ends
+        as "partial" with whatever stages finished. For tasks that wait for approval, the
+        pipeline budget starts again when the task is approved.
+
+        `callback_url` receives the plan when the task starts waiting for approval and the
+        final response when it finishes.
+        """
         start_time = time.time()
         task_id = str(uuid.uuid4())
         
         try:
-            logging.info(f"Executing task: {task} (require_approval={require_approval})")
-            # Analyze task using the same TaskRouter as the coordinator graph for consistency
-            analysis = TaskRouter().analyze_task(task)
-            logging.info(f"Agent analysis for approval plan: {json.dumps(analysis, indent=2)}")
-            
-            # Create task record
-            task_record = {
-                "task_id": task_id,
-                "task": task,
-                "status": "waiting_approval" if require_approval or analysis["requires_approval"] else "in_progress",
-                "type": analysis["task_type"],
-                "required_agents": analysis["required_agents"],
-                "complexity": analysis["complexity"],
-                "start_time": start_time,
-                "result": {}  # Initialize empty result
-            }
-            
-            # Store task record
-            self.tasks[task_id] = task_record
-            
-            # If approval required, return plan for approval
-            if task_record["status"] == "waiting_approval":
-                return TaskResponse(
-                    task_id=task_id,
-                    status="waiting_approval",
-                    duration_seconds=time.time() - start_time,
-                    plan={
+            with deadline_scope(deadline_seconds):
+                logging.info(f"Executing task: {task} (require_approval={require_approval})")
+                # Keyword routing for clear-cut requests, DSPy only for ambiguous ones.
+                # The analysis is handed to the coordinator graph so it is not repeated there.
+                analysis = await self.router.analyze_task(task)
+                logging.info(f"Agent analysis for approval plan: {json.dumps(analysis, indent=2)}")
+                
+                # Create task record
+                task_record = {
+                    "task_id": task_id,
+                    "task": task,
+                    "status": "waiting_approval" if require_approval or analysis["requires_approval"] else "in_progress",
+                    "type": analysis["task_type"],
+                    "required_agents": analysis["required_agents"],
+                    "complexity": analysis["complexity"],
+                    "analysis": analysis,
+                    "deadline_seconds": deadline_seconds,
+                    "callback_url": callback_url,
+                    "start_time": start_time,
+                    "result": {},  # Initialize empty result
+                    "version": 1
+                }
+                
+                if task_record["status"] == "waiting_approval":
+                    task_record["plan"] = {
                         "steps": [f"Execute {agent}" for agent in analysis["required_agents"]],
                         "summary": f"Will execute {len(analysis['required_agents'])} agents for {analysis['task_type']} task"
                     }
-                )
-            
-            # Execute task immediately if no approval required
-            return await self._execute_approved_task(task_id)
+                
+                # Store task record
+                self.tasks[task_id] = task_record
+                self._task_changed(task_id)
+                
+                # If approval required, return plan for approval
+                if task_record["status"] == "waiting_approval":
+                    return self._task_response(task_id)
+                
+                # Execute task immediately if no approval required
+                return await self._execute_coalesced(task_id)
             
         except Exception as e:
             logging.error(f"Error in execute_task: {e}", exc_info=True)
@@ -127,19 +227,82 @@ class Coordinator:
                 error=str(e)
             )
     
+    async def _execute_coalesced(self, task_id: str) -> TaskResponse:
+        """Execute a task, attaching to an identical in-flight request instead if there is one.
+
+        Only requests with the same deadline are coalesced, so a follower never takes a result
+        produced under a different budget, and it waits no longer than its own deadline.
+        """
+        task_record = self.tasks[task_id]
+        deadline_seconds = task_record.get("deadline_seconds")
+        key = f"{normalize_request(task_record['task'])}|deadline={deadline_seconds}"
+        try:
+            with deadline_scope(deadline_seconds):
+                response, leader_id = await self._singleflight.do(
+                    key, task_id, lambda: self._execute_approved_task(task_id), timeout=remaining()
+                )
+        except asyncio.TimeoutError:
+            # Only a follower's wait is bounded here; the leader handles its own deadline
+            leader_id = self._singleflight.leader(key)
+            logging.warning(f"[Coordinator] Task {task_id} hit its {deadline_seconds}s deadline waiting for task {leader_id}")
+            self._update_task(task_id, coalesced_with=leader_id)
+            errors = [f"Deadline of {deadline_seconds}s exceeded waiting for coalesced task {leader_id}"]
+            follower = self._finish_task(task_id, "partial", {"commands": []}, errors, [])
+            follower.coalesced_with = leader_id
+            return follower
+        if leader_id is None:
+            metrics.increment("singleflight_executions")
+            return response
+        
+        # Follower: keep our own task ID, link both records and copy the shared outcome
+        metrics.increment("singleflight_coalesced")
+        logging.info(f"[Coordinator] Task {task_id} coalesced with in-flight task {leader_id}")
+        self._update_task(task_id, coalesced_with=leader_id)
+        leader_record = self.tasks.get(leader_id)
+        if leader_record is not None:
+            self._update_task(leader_id, coalesced_task_ids=leader_record.get("coalesced_task_ids", []) + [task_id])
+        result = {
+            "diagnosis": response.diagnosis,
+            "script": response.script,
+            "email_draft": response.email_draft,
+            "commands": response.commands
+        }
+        errors = response.errors or ([response.error] if response.error else [])
+        follower = self._finish_task(task_id, response.status, result, errors, response.completed_stages or [])
+        follower.coalesced_with = leader_id
+        return follower
+    
     async def _execute_approved_task(self, task_id: str) -> TaskResponse:
         """Execute an approved task."""
         task_record = self.tasks[task_id]
         start_time = task_record["start_time"]
+        deadline_seconds = task_record.get("deadline_seconds")
+        # A run interrupted by a restart picks up after its last checkpointed node
+        checkpoint = task_record.get("checkpoint")
+        # Latest graph state and the nodes that finished, kept for partial results
+        progress = {"state": None, "completed_stages": list((checkpoint or {}).get("completed_stages") or [])}
+        
+        def on_state(node: str, state: Dict[str, Any]) -> None:
+            progress["state"] = state
+            progress["completed_stages"] = state["completed_stages"]
+            self._update_task(task_id, checkpoint=checkpoint_state(state))
         
         try:
             logging.info(f"Executing approved task: {task_id}")
             
-            # Execute using coordinator graph
-            final_state = await self.coordinator_graph.execute(
-                task=task_record["task"],
-                task_id=task_id
-            )
+            # Execute using coordinator graph; on deadline the run is cancelled, which
+            # also cancels any LLM call still in flight
+            with deadline_scope(deadline_seconds):
+                final_state = await asyncio.wait_for(
+                    self.coordinator_graph.execute(
+                        task=task_record["task"],
+                        task_id=task_id,
+                        analysis=task_record.get("analysis"),
+                        on_state=on_state,
+                        checkpoint=checkpoint
+                    ),
+                    timeout=remaining()
+                )
             
             # Use the final state's status and results
             processed_result = final_state.get("results", {})
@@ -161,36 +324,29 @@ class Coordinator:
             if status == "failed" and not non_retry_errors:
                 status = "in_progress"
             
-            # Update task record with status
-            task_record.update({
-                "status": status,
-                "result": processed_result,
-                "end_time": time.time(),
-                "duration_seconds": time.time() - start_time,
-                "errors": errors
-            })
-            
-            # Return standardized response
-            return TaskResponse(
-                task_id=task_id,
-                status=status,
-                duration_seconds=time.time() - start_time,
-                diagnosis=processed_result.get("diagnosis"),
-                script=processed_result.get("script"),
-                email_draft=processed_result.get("email_draft"),
-                commands=processed_result.get("commands", []),
-                plan=task_record.get("plan"),
-                errors=errors if errors else None
-            )
+            return self._finish_task(task_id, status, processed_result, errors, progress["completed_stages"])
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            state = progress["state"] or {}
+            logging.warning(f"[Coordinator] Task {task_id} hit its {deadline_seconds}s deadline after {progress['completed_stages']}")
+            partial_result = {
+                "diagnosis": state.get("diagnosis"),
+                "script": state.get("script"),
+                "email_draft": state.get("email_draft"),
+                "commands": state.get("commands") or []
+            }
+            errors = list(state.get("errors") or []) + [f"Deadline of {deadline_seconds}s exceeded"]
+            return self._finish_task(task_id, "partial", partial_result, errors, progress["completed_stages"])
         except Exception as e:
             logging.error(f"Error in _execute_approved_task: {e}", exc_info=True)
             # Update task record with error
-            task_record.update({
-                "status": "failed",
-                "error": str(e),
-                "end_time": time.time(),
-                "duration_seconds": time.time() - start_time
-            })
+            self._update_task(
+                task_id,
+                status="failed",
+                error=str(e),
+                end_time=time.time(),
+                duration_seconds=time.time() - start_time,
+                checkpoint=None
+            )
             return TaskResponse(
                 task_id=task_id,
                 status="failed",
@@ -198,6 +354,69 @@ class Coordinator:
                 error=str(e)
             )
     
+    def _finish_task(self, task_id: str, status: str, result: Dict[str, Any], errors: List[str], completed_stages: List[str]) -> TaskResponse:
+        """Record the outcome of a pipeline run and return it as a response."""
+        task_record = self.tasks[task_id]
+        start_time = task_record["start_time"]
+        
+        # Update task record with status; generated artifacts are stored by reference
+        self._update_task(
+            task_id,
+            status=status,
+            result=self._store_result(result),
+            end_time=time.time(),
+            duration_seconds=time.time() - start_time,
+            errors=errors,
+            completed_stages=completed_stages,
+            checkpoint=None
+        )
+        
+        # Return standardized response
+        return self._task_response(task_id)
+    
+    def _store_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record form of a pipeline result, with the script code and email draft as artifact digests.
+
+        The command list is left out when it is just the lexed script, since it can be rebuilt.
+        """
+        stored = dict(result)
+        digests = {}
+        script = result.get("script")
+        if isinstance(script, dict) and script.get("code"):
+            digests["script"] = artifacts.put(script["code"])
+            stored["script"] = {key: value for key, value in script.items() if key != "code"}
+            if (result.get("commands") or []) == command_lexer.command_texts(script["code"], script.get("language")):
+                stored.pop("commands", None)
+        if isinstance(result.get("email_draft"), str) and result["email_draft"]:
+            digests["email_draft"] = artifacts.put(result["email_draft"])
+            del stored["email_draft"]
+        if digests:
+            stored["artifacts"] = digests
+        return stored
+    
+    def _resolve_result(self, stored: Dict[str, Any], inline_artifacts: bool = True) -> Dict[str, Any]:
+        """A stored result with its artifacts read back in, unless `inline_artifacts` is False.
+
+        Commands left out of the record are rebuilt from the script either way, since they
+        are part of every representation.
+        """
+        digests = stored.get("artifacts")
+        if not digests:
+            return stored
+        result = dict(stored)
+        if "script" in digests and (inline_artifacts or "commands" not in stored):
+            code = artifacts.get_text(digests["script"])
+            script = {**(stored.get("script") or {}), "code": code}
+            if inline_artifacts:
+                result["script"] = script
+            if "commands" not in stored:
+                result["commands"] = command_lexer.command_texts(code, script.get("language")) if code else []
+        if not inline_artifacts:
+            return result
+        if "email_draft" in digests:
+            result["email_draft"] = artifacts.get_text(digests["email_draft"])
+        return result
+    
     async def approve_task(self, task_id: str) -> TaskResponse:
         """Approve a pending task."""
         if task_id not in self.tasks:
@@ -205,11 +424,79 @@ class Coordinator:
             
         task_record = self.tasks[task_id]
         
+        # A double-click or client retry attaches to the approval already made
+        approval = self._approvals.get(task_id)
+        if approval is not None:
+            logging.info(f"[Coordinator] Task {task_id} already approved; returning the same execution")
+            return await asyncio.shield(approval)
+        
         if task_record["status"] != "waiting_approval":
             raise HTTPException(status_code=400, detail=f"Task {task_id} is not pending approval")
         
-        # Execute the approved task
-        return await self._execute_approved_task(task_id)
+        # Claim the task before the first await so concurrent approvals cannot both run it
+        self._update_task(task_id, status="executing", approved_at=time.time())
+        approval = self._approvals[task_id] = asyncio.get_running_loop().create_future()
+        approval.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            response = await self._execute_approved_task(task_id)
+        except BaseException as e:
+            # Let the task be approved again rather than leaving it stuck in "executing"
+            del self._approvals[task_id]
+            self._update_task(task_id, status="waiting_approval")
+            if isinstance(e, asyncio.CancelledError):
+                approval.cancel()
+            else:
+                approval.set_exception(e)
+            raise
+        approval.set_result(response)
+        return response
+    
+    async def resume_tasks(self, admit: Optional[Callable[[str], AsyncContextManager]] = None) -> int:
+        """Load persisted tasks and resume the ones whose pipeline was interrupted.
+
+        Runs that were in progress, including approved ones, continue from their last
+        checkpointed node, so finished LLM stages are not paid for again. With `admit`, each
+        resumed run holds `admit(task_id)` (an execution slot) while it runs. Returns the
+        number of resumed tasks.
+        """
+        if self.store is None:
+            return 0
+        records = await asyncio.to_thread(self.store.load_all)
+        for task_id, task_record in records.items():
+            self.tasks.setdefault(task_id, task_record)
+        # Stored finished tasks count towards retention like ones finished in this process
+        finished = sorted((record["end_time"], task_id) for task_id, record in records.items() if "end_time" in record)
+        for end_time, task_id in finished:
+            self._finished[task_id] = end_time
+        self._evict_finished_tasks()
+        interrupted = [
+            task_id for task_id, task_record in records.items()
+            if task_record["status"] in ("in_progress", "executing") and "end_time" not in task_record
+        ]
+        for task_id in interrupted:
+            stages = (self.tasks[task_id].get("checkpoint") or {}).get("completed_stages") or []
+            logging.info(f"[Coordinator] Resuming task {task_id} after {stages}")
+            resumed = asyncio.create_task(self._resume_task(task_id, admit))
+            self._resumed[task_id] = resumed
+            resumed.add_done_callback(lambda _, task_id=task_id: self._resumed.pop(task_id, None))
+        logging.info(f"[Coordinator] Loaded {len(records)} stored tasks, resumed {len(interrupted)}")
+        return len(interrupted)
+
+    async def _resume_task(self, task_id: str, admit: Optional[Callable[[str], AsyncContextManager]]) -> TaskResponse:
+        if admit is None:
+            return await self._execute_approved_task(task_id)
+        while True:
+            try:
+                async with admit(task_id):
+                    return await self._execute_approved_task(task_id)
+            except AdmissionRejected as e:
+                # Resumed work is not dropped when the queue is full; it waits its turn
+                logging.info(f"[Coordinator] Resume of task {task_id} deferred: {e.reason}")
+                await asyncio.sleep(e.retry_after)
+    
+    def approval_started(self, task_id: str) -> bool:
+        """Whether `task_id` has already been approved (running or finished)."""
+        return task_id in self._approvals
     
     async def reject_task(self, task_id: str) -> TaskResponse:
         """Reject a pending task."""
@@ -222,11 +509,12 @@ class Coordinator:
             raise HTTPException(status_code=400, detail=f"Task {task_id} is not pending approval")
         
         # Update task record
-        task_record.update({
-            "status": "rejected",
-            "end_time": time.time(),
-            "duration_seconds": time.time() - task_record["start_time"]
-        })
+        self._update_task(
+            task_id,
+            status="rejected",
+            end_time=time.time(),
+            duration_seconds=time.time() - task_record["start_time"]
+        )
         
         return TaskResponse(
             task_id=task_id,
@@ -234,51 +522,206 @@ class Coordinator:
             duration_seconds=time.time() - task_record["start_time"]
         )
     
-    async def get_task(self, task_id: str) -> TaskResponse:
-        """Get task status and results."""
+    def _update_task(self, task_id: str, **fields: Any) -> Dict[str, Any]:
+        """Apply `fields` to a task record and bump its version.
+
+        All changes to a stored task go through here, so the version (and the ETag built
+        from it) changes whenever the task does.
+        """
+        task_record = self.tasks[task_id]
+        task_record.update(fields)
+        task_record["version"] = task_record.get("version", 0) + 1
+        self._response_cache.pop(task_id, None)
+        self._task_changed(task_id)
+        if "end_time" in fields and task_id not in self._finished:
+            self._finished[task_id] = fields["end_time"]
+            self._evict_finished_tasks()
+        return task_record
+    
+    def _evict_finished_tasks(self) -> None:
+        """Drop the oldest finished tasks beyond the retention count or age.
+
+        The newest finished task is always kept, so its response can still be returned.
+        """
+        cutoff = time.time() - self.retention_seconds
+        while len(self._finished) > 1:
+            task_id, end_time = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_retained_tasks and end_time >= cutoff:
+                break
+            self._finished.popitem(last=False)
+            self.forget_task(task_id)
+    
+    def forget_task(self, task_id: str) -> None:
+        """Remove a task and everything kept for it."""
+        self.tasks.pop(task_id, None)
+        self._finished.pop(task_id, None)
+        self._approvals.pop(task_id, None)
+        self._response_cache.pop(task_id, None)
+        self._task_events.pop(task_id, None)
+        self._notified_status.pop(task_id, None)
+        self.events.forget(task_id)
+        if self.store is not None:
+            self.store.delete_later(task_id)
+    
+    def add_listener(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Call `listener(task_id, record)` after every change to a task record."""
+        self._listeners.append(listener)
+    
+    def _task_changed(self, task_id: str) -> None:
+        event = self._task_events.pop(task_id, None)
+        if event is not None:
+            event.set()
+        task_record = self.tasks[task_id]
+        for listener in self._listeners:
+            try:
+                listener(task_id, task_record)
+            except Exception as e:
+                logging.error(f"[Coordinator] Task listener failed for {task_id}: {e}", exc_info=True)
+    
+    def _notify_callback(self, task_id: str, task_record: Dict[str, Any]) -> None:
+        """Queue the task's response for its callback_url on approval wait and completion."""
+        callback_url = task_record.get("callback_url")
+        if not callback_url:
+            return
+        status = task_record["status"]
+        if status != "waiting_approval" and "end_time" not in task_record:
+            return
+        if self._notified_status.get(task_id) == status:
+            return
+        self._notified_status[task_id] = status
+        self.webhooks.enqueue(callback_url, self._task_response(task_id).model_dump())
+    
+    async def wait_for_task(self, task_id: str, timeout: float, since_status: Optional[str] = None) -> Dict[str, Any]:
+        """Wait up to `timeout` seconds for the task to leave `since_status`.
+
+        `since_status` defaults to the task's current status. Returns the task record as soon
+        as its status differs, the task has finished, or the timeout passes, whichever is first.
+        """
         if task_id not in self.tasks:
             raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-            
         task_record = self.tasks[task_id]
-        result = task_record.get("result", {})
+        since_status = since_status or task_record["status"]
+        loop = asyncio.get_running_loop()
+        wait_until = loop.time() + timeout
+        while task_record["status"] == since_status and "end_time" not in task_record:
+            left = wait_until - loop.time()
+            if left <= 0:
+                break
+            event = self._task_events.get(task_id)
+            if event is None:
+                event = self._task_events[task_id] = asyncio.Event()
+            try:
+                await asyncio.wait_for(event.wait(), timeout=left)
+            except asyncio.TimeoutError:
+                break
+        return task_record
+    
+    def _task_response(self, task_id: str, inline_artifacts: bool = True) -> TaskResponse:
+        task_record = self.tasks[task_id]
+        result = self._resolve_result(task_record.get("result", {}), inline_artifacts)
+        # Finished tasks report their final duration, running ones the time so far
+        duration = task_record.get("duration_seconds")
+        if "end_time" not in task_record or duration is None:
+            duration = time.time() - task_record["start_time"]
         
         return TaskResponse(
             task_id=task_id,
             status=task_record["status"],
-            duration_seconds=time.time() - task_record["start_time"],
+            duration_seconds=duration,
             error=task_record.get("error"),
             diagnosis=result.get("diagnosis"),
             script=result.get("script"),
             email_draft=result.get("email_draft"),
             commands=result.get("commands", []),
-            plan=task_record.get("plan")
+            plan=task_record.get("plan"),
+            errors=task_record.get("errors") or None,
+            completed_stages=task_record.get("completed_stages"),
+            coalesced_with=task_record.get("coalesced_with"),
+            artifacts=result.get("artifacts")
         )
     
-    async def list_tasks(self) -> List[TaskResponse]:
+    async def get_task(self, task_id: str) -> TaskResponse:
+        """Get task status and results."""
+        if task_id not in self.tasks:
+            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+        return self._task_response(task_id)
+    
+    def task_etag(self, task_id: str, inline_artifacts: bool = True, fields: Optional[Tuple[str, ...]] = None) -> str:
+        """ETag of the task's current state, available without serializing it.
+
+        Finished tasks get a strong ETag because their response bytes never change; running
+        tasks get a weak one since the reported duration keeps growing between versions.
+        Each representation (artifacts by reference, a field projection) has its own ETag.
+        """
+        if task_id not in self.tasks:
+            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+        task_record = self.tasks[task_id]
+        suffix = "" if inline_artifacts else "-ref"
+        if fields is not None:
+            suffix += "-" + hashlib.sha1(",".join(fields).encode("utf-8")).hexdigest()[:8]
+        etag = f'"{task_id}-{task_record.get("version", 0)}{suffix}"'
+        return etag if "end_time" in task_record else f"W/{etag}"
+    
+    def get_task_bytes(self, task_id: str, inline_artifacts: bool = True, fields: Optional[Tuple[str, ...]] = None) -> Tuple[bytes, str]:
+        """The task's JSON response body and ETag, limited to `fields` if given.
+
+        Finished tasks are serialized once per representation and served from cache until
+        their record changes.
+        """
+        etag = self.task_etag(task_id, inline_artifacts, fields)
+        task_record = self.tasks[task_id]
+        version = task_record.get("version", 0)
+        representation = (inline_artifacts, fields)
+        cached = self._response_cache.get(task_id, {}).get(representation)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        body = dumps_bytes(project_response(self._task_response(task_id, needs_artifacts(inline_artifacts, fields)), fields))
+        if "end_time" in task_record:
+            self._response_cache.setdefault(task_id, {})[representation] = (version, body, etag)
+        return body, etag
+    
+    async def list_tasks(self, inline_artifacts: bool = True) -> List[TaskResponse]:
         """List all tasks."""
-        return [
-            TaskResponse(
+        responses = []
+        for task_id, record in self.tasks.items():
+            result = self._resolve_result(record.get("result", {}), inline_artifacts)
+            responses.append(TaskResponse(
                 task_id=task_id,
                 status=record["status"],
                 duration_seconds=time.time() - record["start_time"],
                 error=record.get("error"),
-                diagnosis=record.get("result", {}).get("diagnosis"),
-                script=record.get("result", {}).get("script"),
-                email_draft=record.get("result", {}).get("email_draft"),
-                commands=record.get("result", {}).get("commands"),
-                plan=record.get("plan")
-            )
-            for task_id, record in self.tasks.items()
-        ]
+                diagnosis=result.get("diagnosis"),
+                script=result.get("script"),
+                email_draft=result.get("email_draft"),
+                commands=result.get("commands") or [],
+                plan=record.get("plan"),
+                artifacts=result.get("artifacts")
+            ))
+        return responses
 
 class CoordinatorAgent:
     def __init__(self):
-        self.graph = create_coordinator_graph().compile()  # Compile the graph
-        self.diagnostic_agent = DiagnosticAgent()
-        self.automation_agent = AutomationAgent()
-        self.writer_agent = WriterAgent()
+        self._graph = None
         self.storage = task_storage
     
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = create_coordinator_graph().compile()
+        return self._graph
+    
+    @property
+    def diagnostic_agent(self):
+        return get_agent("diagnostic")
+    
+    @property
+    def automation_agent(self):
+        return get_agent("automation")
+    
+    @property
+    def writer_agent(self):
+        return get_agent("writer")
+    
     async def process_request(self, request: str, require_approval: bool = True) -> Dict[str, Any]:
         """Process a new request and create a task."""
         try:
@@ -14,14 +14,40 @@ logging.basicConfig(
     ]
 )
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response, Header, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
-from .coordinator import Coordinator
+from .utils.compression import CompressionMiddleware, response_etag
+from .utils.request_profiler import ProfilingMiddleware
+from pydantic import BaseModel, Field, AnyHttpUrl
+from typing import Optional, Dict, Any, List, Literal, Tuple
+from .coordinator import Coordinator, needs_artifacts, project_response
+from .utils.metrics import metrics
+from .utils.admission import AdmissionController, AdmissionRejected
+from .utils.artifacts import artifacts as artifact_store
+from .utils.bulkhead import bulkheads
+from .utils.circuit_breaker import circuit_breakers
+from .utils.memory_profiler import memory_profiler
+from .utils.idempotency import IdempotencyStore, IdempotencyConflict, fingerprint
+from .utils.webhooks import check_callback_url
+from .utils.serialization import etag_matches, dumps_bytes
+from .config import (
+    ADMISSION_GLOBAL_RATE, ADMISSION_GLOBAL_BURST, ADMISSION_CLIENT_RATE, ADMISSION_CLIENT_BURST,
+    MAX_CONCURRENT_PIPELINES, MAX_QUEUED_PIPELINES, ADMISSION_QUEUE_TIMEOUT,
+    SCHEDULER_LANE_LIMITS, SCHEDULER_AGING_SECONDS,
+    IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_KEYS, ADMIN_TOKEN
+)
+import asyncio
+import hmac
 import json
 
+# Trace allocations from as early as possible when memory profiling is enabled
+memory_profiler.start()
+
+def is_admin(token: Optional[str]) -> bool:
+    """Whether `token` is the configured admin token."""
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token, ADMIN_TOKEN))
+
 app = FastAPI(title="Agentic AI API")
 
 # Add CORS middleware
@@ -33,12 +59,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip (or brotli, when installed) for JSON and text responses the client accepts compressed
+app.add_middleware(CompressionMiddleware)
+
+# Sampling profiles of single requests sent with X-Profile: 1 and the admin token; added last
+# so it is outermost and the profile includes serialization and compression
+app.add_middleware(ProfilingMiddleware, authorize=is_admin)
+
 # Initialize coordinator
 coordinator = Coordinator()
 
+# Rate limits and bounded concurrency in front of pipeline execution
+admission = AdmissionController(
+    global_rate=ADMISSION_GLOBAL_RATE,
+    global_burst=ADMISSION_GLOBAL_BURST,
+    client_rate=ADMISSION_CLIENT_RATE,
+    client_burst=ADMISSION_CLIENT_BURST,
+    max_concurrent=MAX_CONCURRENT_PIPELINES,
+    max_queue=MAX_QUEUED_PIPELINES,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    lane_limits=SCHEDULER_LANE_LIMITS,
+    aging_seconds=SCHEDULER_AGING_SECONDS
+)
+
+# Responses remembered by Idempotency-Key so client retries never start a second pipeline
+idempotency = IdempotencyStore(ttl_seconds=IDEMPOTENCY_TTL_SECONDS, max_entries=IDEMPOTENCY_MAX_KEYS)
+
+def client_id(request: Request) -> str:
+    """Identify the caller for per-client rate limits."""
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "anonymous")
+
 class TaskRequest(BaseModel):
     request: str = Field(..., min_length=1, description="The request to process")
     require_approval: bool = Field(False, description="Whether the task requires approval")
+    deadline_seconds: Optional[float] = Field(None, gt=0, description="Latency budget for the pipeline; stages unfinished by then are cancelled and the task ends as 'partial'")
+    callback_url: Optional[AnyHttpUrl] = Field(None, description="URL that receives the plan when approval is needed and the final task response")
+    priority: Literal["interactive", "batch"] = Field("interactive", description="Scheduling lane; bulk submissions should use 'batch'")
 
 class TaskResponse(BaseModel):
     task_id: str
@@ -48,14 +104,50 @@ class TaskResponse(BaseModel):
     script: Optional[Dict[str, Any]] = None
     email_draft: Optional[str] = None
     duration_seconds: Optional[float] = None
+    error: Optional[str] = None
     errors: Optional[List[str]] = None
     commands: List[str] = Field(default_factory=list)
+    completed_stages: Optional[List[str]] = None
+    coalesced_with: Optional[str] = None
+    artifacts: Optional[Dict[str, str]] = None
+
+FIELDS_DESCRIPTION = "Comma-separated response fields to return, e.g. task_id,status,commands"
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Validated, canonically ordered field names from a `fields=` parameter."""
+    if not fields:
+        return None
+    names = tuple(sorted({name.strip() for name in fields.split(",") if name.strip()}))
+    unknown = [name for name in names if name not in TaskResponse.model_fields]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+def projected(result: BaseModel, fields: Optional[Tuple[str, ...]], headers: Optional[Dict[str, str]] = None):
+    """`result` limited to `fields`, serialized here so the other fields never are."""
+    if fields is None:
+        return result
+    return Response(content=dumps_bytes(project_response(result, fields)), media_type="application/json", headers=headers)
+
+@app.on_event("startup")
+async def startup():
+    # Pick up tasks persisted by a previous run (TASK_STORE_DIR) where they left off; they
+    # run as background work in the batch lane
+    await coordinator.resume_tasks(lambda task_id: admission.admit(task_id, rate_limited=False, lane="batch"))
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Deliver queued callback notifications and task record writes before the process exits
+    await coordinator.webhooks.aclose()
+    if coordinator.store is not None:
+        await coordinator.store.flush()
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -66,11 +158,51 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 @app.post("/api/v1/execute", response_model=TaskResponse)
-async def execute_task(request: TaskRequest):
-    """Execute a task with optional approval requirement."""
+async def execute_task(
+    request: TaskRequest,
+    http_request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Execute a task with optional approval requirement.
+
+    With an `Idempotency-Key` header, a retry of the same request returns the original
+    response (waiting for it if still running) instead of executing again. With `fields`,
+    only those response fields are returned.
+    """
+    selected = parse_fields(fields)
+    if request.callback_url:
+        # Refuse callbacks to internal addresses before anything is queued for them
+        try:
+            await check_callback_url(str(request.callback_url))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    async def run():
+        lane = coordinator.execution_lane(request.request, request.priority)
+        async with admission.admit(client_id(http_request), lane=lane):
+            return await coordinator.execute_task(
+                request.request,
+                request.require_approval,
+                request.deadline_seconds,
+                str(request.callback_url) if request.callback_url else None
+            )
+    
     try:
-        result = await coordinator.execute_task(request.request, request.require_approval)
-        return result
+        if not idempotency_key:
+            return projected(await run(), selected)
+        # Scope keys per client so two callers cannot collide on the same key
+        key = f"{client_id(http_request)}:{idempotency_key}"
+        result, replayed = await idempotency.run(key, fingerprint(request.model_dump()), run)
+        if replayed:
+            metrics.increment("idempotent_replays")
+            response.headers["Idempotent-Replayed"] = "true"
+        return projected(result, selected, dict(response.headers))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,8 +210,15 @@ async def execute_task(request: TaskRequest):
 async def approve_task(task_id: str):
     """Approve a task's plan."""
     try:
-        result = await coordinator.approve_task(task_id)
+        # A repeated approve only waits for the first one, so it does not need a slot
+        if coordinator.approval_started(task_id):
+            return await coordinator.approve_task(task_id)
+        # Approvals are interactive: they skip rate limits and take the highest-priority lane
+        async with admission.admit(task_id, rate_limited=False, lane="critical"):
+            result = await coordinator.approve_task(task_id)
         return result
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=e.headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -97,13 +236,39 @@ async def reject_task(task_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/tasks/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: str):
-    """Get a task by ID."""
+async def get_task(
+    task_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to hold the request until the task's status changes"),
+    since_status: Optional[str] = Query(None, description="Status the client last saw; defaults to the current one"),
+    artifacts: Literal["inline", "ref"] = Query("inline", description="Include script code and email draft, or only their digests"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Get a task by ID.
+
+    Responses carry an ETag; polling with `If-None-Match` returns 304 until the task
+    changes. Finished tasks are served from bytes serialized once. With `wait`, the
+    response is held until the task leaves `since_status` or the wait runs out. With
+    `artifacts=ref`, the script code and email draft are left out and can be fetched from
+    /api/v1/artifacts/{digest}. With `fields`, only those response fields are returned.
+    """
+    inline_artifacts = artifacts == "inline"
+    selected = parse_fields(fields)
     try:
-        result = await coordinator.get_task(task_id)
-        if not result:
-            raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-        return result
+        if wait:
+            await coordinator.wait_for_task(task_id, wait, since_status)
+        etag = coordinator.task_etag(task_id, inline_artifacts, selected)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and etag_matches(if_none_match, etag):
+            if not etag.startswith("W/"):
+                # Compression weakens the full response's ETag; send the same one here. The
+                # body of a finished task (the only strong ETag) is already serialized.
+                body, _ = coordinator.get_task_bytes(task_id, inline_artifacts, selected)
+                headers["ETag"] = response_etag(etag, accept_encoding, len(body))
+            return Response(status_code=304, headers=headers)
+        body, _ = coordinator.get_task_bytes(task_id, inline_artifacts, selected)
+        return Response(content=body, media_type="application/json", headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -111,11 +276,14 @@ async def get_task(task_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/v1/tasks", response_model=List[TaskResponse])
-async def list_tasks():
-    """List all tasks."""
+async def list_tasks(fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
+    """List all tasks, optionally with only some of their fields."""
+    selected = parse_fields(fields)
     try:
-        result = await coordinator.list_tasks()
-        return result
+        result = await coordinator.list_tasks(needs_artifacts(True, selected))
+        if selected is None:
+            return result
+        return Response(content=dumps_bytes([project_response(task, selected) for task in result]), media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
@@ -129,4 +297,117 @@ async def approve_plan(task_id: str):
 @app.post("/api/v1/plans/{task_id}/reject", response_model=TaskResponse)
 async def reject_plan(task_id: str):
     """Reject a plan (alias for /tasks/{task_id}/reject)."""
-    return await reject_task(task_id) 
\ No newline at end of file
+    return await reject_task(task_id) 
+
+@app.get("/api/v1/artifacts/{digest}")
+async def get_artifact(digest: str):
+    """A generated script or email draft by its sha256 digest; the content never changes."""
+    content = artifact_store.get(digest)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Artifact {digest} not found")
+    headers = {"ETag": f'"{digest}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    return Response(content=content, media_type="text/plain; charset=utf-8", headers=headers)
+
+def require_admin(token: Optional[str]) -> None:
+    """Reject the request unless it carries the configured admin token."""
+    if not is_admin(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/api/v1/admin/memory")
+async def get_memory_report(
+    top: int = Query(20, ge=1, le=200),
+    group_by: Literal["lineno", "filename", "traceback"] = Query("lineno"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Live memory by allocation site and the estimated footprint per task (admin only).
+
+    Requires MEMORY_PROFILING=true, since allocations are only traced when it is set.
+    """
+    require_admin(x_admin_token)
+    if not memory_profiler.tracing:
+        raise HTTPException(status_code=404, detail="Memory profiling is disabled; set MEMORY_PROFILING=true")
+    report = memory_profiler.report(coordinator.tasks, top, group_by)
+    report["artifacts"] = artifact_store.stats()
+    return report
+
+@app.get("/api/v1/metrics")
+async def get_metrics():
+    """In-process metrics, including LLM latency and token usage per call site, model and tier."""
+    return metrics.snapshot()
+
+@app.get("/api/v1/load")
+async def get_load():
+    """Pipeline queue depth for load balancers; returns 503 while the queue is full."""
+    stats = admission.stats()
+    return JSONResponse(status_code=503 if stats["saturated"] else 200, content=stats)
+
+@app.get("/api/v1/health")
+async def get_health():
+    """Service health with the LLM circuit breaker state of each model.
+
+    Reports "degraded" while any model's circuit is not closed.
+    """
+    breakers = circuit_breakers.snapshot()
+    degraded = any(b["state"] != "closed" for b in breakers.values())
+    return {"status": "degraded" if degraded else "ok", "circuit_breakers": breakers}
+
+@app.websocket("/api/v1/ws")
+async def task_events(websocket: WebSocket):
+    """Push task status changes to the client.
+
+    The client sends `{"action": "subscribe" | "unsubscribe", "task_ids": [...], "statuses": [...]}`
+    messages and receives one compact event per status change of a followed task, plus the
+    current status of each task ID it subscribes to.
+    """
+    await websocket.accept()
+    subscription = coordinator.events.subscribe()
+    
+    async def forward():
+        while True:
+            event = await subscription.queue.get()
+            await websocket.send_text(dumps_bytes(event).decode("utf-8"))
+    
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action") if isinstance(message, dict) else None
+            if action not in ("subscribe", "unsubscribe"):
+                await websocket.send_json({"type": "error", "detail": f"Unknown action: {action}"})
+                continue
+            task_ids = [str(t) for t in message.get("task_ids") or []]
+            statuses = [str(s) for s in message.get("statuses") or []]
+            coordinator.events.update(subscription, task_ids, statuses, add=action == "subscribe")
+            if action == "subscribe":
+                for task_id in task_ids:
+                    subscription.push(coordinator.events.snapshot_event(task_id, coordinator.tasks.get(task_id)))
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        coordinator.events.unsubscribe(subscription)
+        # Retrieve the sender's outcome, so a failed send is logged rather than lost
+        outcome, = await asyncio.gather(sender, return_exceptions=True)
+        if isinstance(outcome, Exception) and not isinstance(outcome, WebSocketDisconnect):
+            logging.warning(f"[WebSocket] Event sender failed: {outcome!r}")
+
+class BulkheadSettings(BaseModel):
+    max_concurrent: Optional[int] = Field(None, ge=1)
+    rate: Optional[float] = Field(None, ge=0)
+    burst: Optional[float] = Field(None, ge=1)
+    max_queue: Optional[int] = Field(None, ge=0)
+    queue_timeout: Optional[float] = Field(None, gt=0)
+
+@app.get("/api/v1/bulkheads")
+async def get_bulkheads():
+    """Per-agent LLM call limits with current usage and saturation."""
+    return bulkheads.snapshot()
+
+@app.put("/api/v1/bulkheads/{agent}")
+async def configure_bulkhead(agent: str, settings: BulkheadSettings, x_admin_token: Optional[str] = Header(None)):
+    """Change an agent's bulkhead limits at runtime; omitted fields keep their value (admin only)."""
+    require_admin(x_admin_token)
+    try:
+        return bulkheads.configure(agent, **settings.model_dump(exclude_none=True))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No bulkhead for agent {agent}")
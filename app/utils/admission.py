@@ -0,0 +1,159 @@
+from typing import Dict, Any, Optional, AsyncIterator
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+from app.utils.metrics import metrics
+from app.utils.scheduler import PriorityScheduler
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take `tokens` if available and return 0, else return seconds until they will be."""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (tokens - self.tokens) / self.rate
+
+    def refund(self, tokens: float = 1) -> None:
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; maps onto an HTTP status with a Retry-After header."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(f"Request rejected: {reason}")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+class AdmissionController:
+    """Rate limits and bounded concurrency in front of pipeline execution.
+
+    A request must pass the global and its client's token bucket (429 otherwise), then
+    take one of `max_concurrent` execution slots. Up to `max_queue` requests wait for a
+    slot for at most `queue_timeout` seconds; beyond that they are rejected with 503.
+    Slots are handed out by priority lane (see PriorityScheduler), each with its own
+    concurrency limit from `lane_limits`.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        global_burst: float,
+        client_rate: float,
+        client_burst: float,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float,
+        max_clients: int = 10000,
+        lane_limits: Optional[Dict[str, int]] = None,
+        aging_seconds: float = 5.0
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_clients = max_clients
+        self._client_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.scheduler = PriorityScheduler(max_concurrent, lane_limits, aging_seconds)
+        # Moving average of how long an admitted request holds its slot
+        self._service_seconds = 5.0
+
+    @property
+    def in_flight(self) -> int:
+        return self.scheduler.in_flight
+    
+    @property
+    def queued(self) -> int:
+        return self.scheduler.queued
+    
+    def _client_bucket(self, client_id: str) -> TokenBucket:
+        bucket = self._client_buckets.get(client_id)
+        if bucket is None:
+            bucket = self._client_buckets[client_id] = TokenBucket(self.client_rate, self.client_burst)
+            if len(self._client_buckets) > self.max_clients:
+                self._client_buckets.popitem(last=False)
+        else:
+            self._client_buckets.move_to_end(client_id)
+        return bucket
+
+    def _reject(self, status_code: int, reason: str, retry_after: float) -> AdmissionRejected:
+        metrics.increment("admission_rejected", reason=reason)
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    def check_rate(self, client_id: str) -> None:
+        """Consume a token for `client_id` or raise a 429 rejection."""
+        client_bucket = self._client_bucket(client_id)
+        wait = client_bucket.try_acquire()
+        if wait:
+            raise self._reject(429, "client_rate_limited", wait)
+        wait = self.global_bucket.try_acquire()
+        if wait:
+            client_bucket.refund()
+            raise self._reject(429, "global_rate_limited", wait)
+
+    def _queue_retry_after(self) -> float:
+        return self._service_seconds * (self.queued + 1) / self.max_concurrent
+
+    def _publish(self) -> None:
+        metrics.set_gauge("admission_in_flight", self.in_flight)
+        metrics.set_gauge("admission_queued", self.queued)
+
+    @asynccontextmanager
+    async def admit(self, client_id: str, rate_limited: bool = True, lane: str = "interactive") -> AsyncIterator[None]:
+        """Hold an execution slot in `lane` for the duration of the block."""
+        if rate_limited:
+            self.check_rate(client_id)
+        must_wait = not self.scheduler.can_start(lane)
+        if must_wait and self.queued >= self.max_queue:
+            raise self._reject(503, "queue_full", self._queue_retry_after())
+        queued_at = time.monotonic()
+        try:
+            await self.scheduler.acquire(lane, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject(503, "queue_timeout", self._queue_retry_after())
+        if must_wait:
+            metrics.observe("admission_queue_wait_seconds", time.monotonic() - queued_at)
+        self._publish()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.scheduler.release(lane)
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.monotonic() - started)
+            self._publish()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "saturated": self.queued >= self.max_queue,
+            "estimated_wait_seconds": round(self._queue_retry_after(), 3) if self.in_flight >= self.max_concurrent else 0.0,
+            "lanes": self.scheduler.stats()
+        }
@@ -0,0 +1,115 @@
+from typing import Dict, Any, Optional, Tuple, Union
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import re
+import zlib
+from app.utils.metrics import metrics
+from app.config import ARTIFACT_DIR, ARTIFACT_MEMORY_BYTES, ARTIFACT_COMPRESS_MIN_BYTES, ARTIFACT_DURABLE
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+class ArtifactStore:
+    """Generated artifacts (scripts, email drafts) stored once under the sha256 of their content.
+
+    Storing identical content again returns the same digest without a second copy. Content
+    of at least `compress_min_bytes` is zlib-compressed when that makes it smaller. Up to
+    `max_memory_bytes` are kept in memory; beyond that the least recently used artifacts
+    spill to files in `directory` and are read back on demand. With `durable`, every
+    artifact is also written to disk when stored, so records persisted elsewhere still
+    resolve after a restart.
+    """
+
+    def __init__(self, directory: str, max_memory_bytes: int = 64 * 1024 * 1024, compress_min_bytes: int = 1024, durable: bool = False):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.compress_min_bytes = compress_min_bytes
+        self.durable = durable
+        # digest -> (compressed, stored bytes), least recently used first
+        self._memory: "OrderedDict[str, Tuple[bool, bytes]]" = OrderedDict()
+        self.memory_bytes = 0
+        self.spilled = 0
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def _path(self, digest: str, compressed: bool) -> str:
+        return os.path.join(self.directory, f"{digest}.z" if compressed else digest)
+
+    def _write(self, digest: str, compressed: bool, data: bytes) -> None:
+        path = self._path(digest, compressed)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, digest: str) -> Optional[Tuple[bool, bytes]]:
+        for compressed in (True, False):
+            try:
+                with open(self._path(digest, compressed), "rb") as f:
+                    return compressed, f.read()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _remember(self, digest: str, compressed: bool, data: bytes) -> None:
+        self._memory[digest] = (compressed, data)
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            old_digest, (old_compressed, old_data) = self._memory.popitem(last=False)
+            self.memory_bytes -= len(old_data)
+            try:
+                self._write(old_digest, old_compressed, old_data)
+                self.spilled += 1
+            except OSError as e:
+                logging.error(f"[ArtifactStore] Could not spill artifact {old_digest}: {e}")
+        metrics.set_gauge("artifact_memory_bytes", self.memory_bytes)
+
+    def put(self, content: Union[str, bytes]) -> str:
+        """Store `content` and return its digest."""
+        raw = content.encode("utf-8") if isinstance(content, str) else content
+        digest = self.digest(raw)
+        if digest in self._memory:
+            self._memory.move_to_end(digest)
+            metrics.increment("artifact_puts", result="deduplicated")
+            return digest
+        compressed, data = False, raw
+        if len(raw) >= self.compress_min_bytes:
+            packed = zlib.compress(raw)
+            if len(packed) < len(raw):
+                compressed, data = True, packed
+        if self.durable:
+            self._write(digest, compressed, data)
+        self._remember(digest, compressed, data)
+        metrics.increment("artifact_puts", result="stored")
+        return digest
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Content stored under `digest`, or None if there is none."""
+        if not _DIGEST.match(digest or ""):
+            return None
+        entry = self._memory.get(digest)
+        if entry is not None:
+            self._memory.move_to_end(digest)
+        else:
+            entry = self._read(digest)
+            if entry is None:
+                return None
+            self._remember(digest, *entry)
+        compressed, data = entry
+        return zlib.decompress(data) if compressed else data
+
+    def get_text(self, digest: str) -> Optional[str]:
+        content = self.get(digest)
+        return content.decode("utf-8") if content is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_memory": len(self._memory), "memory_bytes": self.memory_bytes, "spilled": self.spilled}
+
+# Process-wide artifact store, shared by all tasks so identical artifacts are kept once
+artifacts = ArtifactStore(ARTIFACT_DIR, ARTIFACT_MEMORY_BYTES, ARTIFACT_COMPRESS_MIN_BYTES, ARTIFACT_DURABLE)
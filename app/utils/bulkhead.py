@@ -0,0 +1,177 @@
+from typing import Dict, Any, Deque, Optional, AsyncIterator
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+from app.utils.admission import TokenBucket
+from app.utils.deadline import call_timeout
+from app.utils.metrics import metrics
+from app.config import BULKHEADS
+
+class BulkheadFull(Exception):
+    """Raised when a call cannot get into its bulkhead in time."""
+
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"Bulkhead {name} rejected call: {reason}")
+        self.name = name
+        self.reason = reason
+
+class Bulkhead:
+    """Concurrency pool and rate budget for one agent's LLM calls.
+
+    At most `max_concurrent` calls run at once and calls start at no more than `rate` per
+    second (bursts up to `burst`). Up to `max_queue` calls wait, in order, for at most
+    `queue_timeout` seconds (less if the request deadline is nearer). Limits can be changed
+    while the pool is in use.
+    """
+
+    SETTINGS = ("max_concurrent", "rate", "burst", "max_queue", "queue_timeout")
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int = 4,
+        rate: float = 5.0,
+        burst: float = 10.0,
+        max_queue: int = 32,
+        queue_timeout: float = 20.0
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.bucket = TokenBucket(rate, burst)
+        self.running = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "rate": self.bucket.rate,
+            "burst": self.bucket.capacity,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout
+        }
+
+    def configure(self, **settings: Any) -> None:
+        unknown = set(settings) - set(self.SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown bulkhead settings: {sorted(unknown)}")
+        if "max_concurrent" in settings:
+            self.max_concurrent = int(settings["max_concurrent"])
+        if "max_queue" in settings:
+            self.max_queue = int(settings["max_queue"])
+        if "queue_timeout" in settings:
+            self.queue_timeout = float(settings["queue_timeout"])
+        if "rate" in settings:
+            self.bucket.rate = float(settings["rate"])
+        if "burst" in settings:
+            self.bucket.capacity = float(settings["burst"])
+            self.bucket.tokens = min(self.bucket.tokens, self.bucket.capacity)
+        logging.info(f"[Bulkhead] {self.name} reconfigured: {self.settings()}")
+        # A raised limit may let queued calls start now
+        self._wake()
+
+    def _reject(self, reason: str) -> BulkheadFull:
+        self.rejected += 1
+        metrics.increment("bulkhead_rejected", agent=self.name, reason=reason)
+        return BulkheadFull(self.name, reason)
+
+    def _wake(self) -> None:
+        while self._waiters and self.running < self.max_concurrent:
+            self.running += 1
+            self._waiters.popleft().set_result(None)
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("bulkhead_running", self.running, agent=self.name)
+        metrics.set_gauge("bulkhead_queued", self.queued, agent=self.name)
+        metrics.set_gauge("bulkhead_saturation", self.running / self.max_concurrent if self.max_concurrent else 1.0, agent=self.name)
+
+    async def _acquire_slot(self, timeout: Optional[float]) -> None:
+        if self.running < self.max_concurrent and not self._waiters:
+            self.running += 1
+            self._publish()
+            return
+        if self.queued >= self.max_queue:
+            raise self._reject("queue_full")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                self._release_slot()
+            else:
+                self._waiters.remove(future)
+                future.cancel()
+                self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("queue_timeout")
+            raise
+
+    def _release_slot(self) -> None:
+        self.running -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        """Hold a slot in this bulkhead for the duration of the block."""
+        started = time.monotonic()
+        timeout = call_timeout(self.queue_timeout, stage=f"{self.name} bulkhead")
+        await self._acquire_slot(timeout)
+        try:
+            # Within the slot, wait for the rate budget rather than failing
+            while True:
+                wait = self.bucket.try_acquire()
+                if not wait:
+                    break
+                if time.monotonic() + wait - started > timeout:
+                    raise self._reject("rate_limited")
+                await asyncio.sleep(wait)
+            metrics.observe("bulkhead_wait_seconds", time.monotonic() - started, agent=self.name)
+            yield
+        finally:
+            self._release_slot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.settings(),
+            "running": self.running,
+            "queued": self.queued,
+            "saturation": round(self.running / self.max_concurrent, 3) if self.max_concurrent else 1.0,
+            "rejected": self.rejected
+        }
+
+class BulkheadRegistry:
+    """Bulkheads by agent name; agents without one are not limited."""
+
+    def __init__(self, config: Dict[str, Dict[str, Any]]):
+        self._bulkheads = {name: Bulkhead(name, **settings) for name, settings in config.items()}
+
+    def get(self, name: str) -> Optional[Bulkhead]:
+        return self._bulkheads.get(name)
+
+    def for_call_site(self, call_site: str) -> Optional[Bulkhead]:
+        """Bulkhead of the agent owning a call site, e.g. "automation" for "automation.verify"."""
+        return self._bulkheads.get(call_site.split(".")[0])
+
+    def configure(self, name: str, **settings: Any) -> Dict[str, Any]:
+        bulkhead = self._bulkheads.get(name)
+        if bulkhead is None:
+            raise KeyError(name)
+        bulkhead.configure(**settings)
+        return bulkhead.snapshot()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: bulkhead.snapshot() for name, bulkhead in self._bulkheads.items()}
+
+# Process-wide bulkheads, shared by every OpenAIProjectClient
+bulkheads = BulkheadRegistry(BULKHEADS)
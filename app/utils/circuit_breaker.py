@@ -0,0 +1,179 @@
+from typing import Dict, Any, Optional
+from collections import deque
+import logging
+import time
+from app.utils.metrics import metrics
+from app.config import (
+    CIRCUIT_WINDOW, CIRCUIT_MIN_CALLS, CIRCUIT_ERROR_THRESHOLD, CIRCUIT_SLOW_CALL_SECONDS,
+    CIRCUIT_SLOW_CALL_THRESHOLD, CIRCUIT_OPEN_SECONDS, CIRCUIT_HALF_OPEN_PROBES
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit is open."""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"Circuit open for model {model}; retry in {retry_after:.0f}s")
+        self.model = model
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Error-rate and latency circuit breaker for one model.
+
+    Outcomes of the last `window` calls are kept. Once at least `min_calls` are recorded, the
+    circuit opens if the share of failures reaches `error_threshold` or the share of calls
+    slower than `slow_call_seconds` reaches `slow_call_threshold`. An open circuit rejects
+    calls for `open_seconds`, then goes half-open and lets `half_open_probes` calls through:
+    if they all succeed the circuit closes, and any failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_threshold: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        slow_call_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 2,
+        clock=time.monotonic
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_threshold = slow_call_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        # (failed, slow) per call
+        self._outcomes: deque = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (self.clock() - self._opened_at))
+
+    def _transition(self, state: str) -> None:
+        logging.warning(f"[CircuitBreaker] {self.name}: {self._state} -> {state}")
+        self._state = state
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        if state == OPEN:
+            self._opened_at = self.clock()
+        elif state == CLOSED:
+            self._outcomes.clear()
+        metrics.increment("circuit_transitions", model=self.name, state=state)
+        metrics.set_gauge("circuit_open", 1 if state == OPEN else 0, model=self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open state this claims a probe slot."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes_started < self.half_open_probes:
+            self._probes_started += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        """Give back a probe slot for a call that ended without saying anything about the model."""
+        if self._state == HALF_OPEN and self._probes_started > self._probes_succeeded:
+            self._probes_started -= 1
+
+    def record_success(self, latency: float) -> None:
+        slow = latency >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            if slow:
+                self._transition(OPEN)
+                return
+            self._probes_succeeded += 1
+            if self._probes_succeeded >= self.half_open_probes:
+                self._transition(CLOSED)
+            return
+        self._record(False, slow)
+
+    def record_failure(self) -> None:
+        if self._state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        self._record(True, False)
+
+    def _record(self, failed: bool, slow: bool) -> None:
+        self._outcomes.append((failed, slow))
+        if self._state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        total = len(self._outcomes)
+        error_rate = sum(1 for f, _ in self._outcomes if f) / total
+        slow_rate = sum(1 for _, s in self._outcomes if s) / total
+        if error_rate >= self.error_threshold or slow_rate >= self.slow_call_threshold:
+            self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls": total,
+            "error_rate": round(sum(1 for f, _ in self._outcomes if f) / total, 3) if total else 0.0,
+            "slow_rate": round(sum(1 for _, s in self._outcomes if s) / total, 3) if total else 0.0,
+            "retry_after_seconds": round(self.retry_after(), 1)
+        }
+
+class CircuitBreakerRegistry:
+    """One circuit breaker per model, created on first use with shared settings."""
+
+    def __init__(self, **settings: Any):
+        self.settings = settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model, **self.settings)
+        return breaker
+
+    def acquire(self, model: str, fallback_model: Optional[str] = None) -> str:
+        """Model to call: `model` if its circuit allows it, else `fallback_model`.
+
+        Raises CircuitOpenError when neither can take the call.
+        """
+        breaker = self.get(model)
+        if breaker.allow():
+            return model
+        if fallback_model and fallback_model != model and self.get(fallback_model).allow():
+            logging.warning(f"[CircuitBreaker] {model} is open; routing to fallback {fallback_model}")
+            metrics.increment("circuit_fallbacks", model=model, fallback=fallback_model)
+            return fallback_model
+        metrics.increment("circuit_rejections", model=model)
+        raise CircuitOpenError(model, breaker.retry_after())
+
+    def reset(self) -> None:
+        self._breakers.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {model: breaker.snapshot() for model, breaker in sorted(self._breakers.items())}
+
+# Process-wide breakers, shared by every OpenAIProjectClient
+circuit_breakers = CircuitBreakerRegistry(
+    window=CIRCUIT_WINDOW,
+    min_calls=CIRCUIT_MIN_CALLS,
+    error_threshold=CIRCUIT_ERROR_THRESHOLD,
+    slow_call_seconds=CIRCUIT_SLOW_CALL_SECONDS,
+    slow_call_threshold=CIRCUIT_SLOW_CALL_THRESHOLD,
+    open_seconds=CIRCUIT_OPEN_SECONDS,
+    half_open_probes=CIRCUIT_HALF_OPEN_PROBES
+)
@@ -0,0 +1,213 @@
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from bisect import bisect_right
+import hashlib
+from app.utils.metrics import metrics
+from app.config import COMMAND_LEXER_CACHE_SIZE
+
+# Statement keywords that open or continue a block rather than run a command
+CONTROL_KEYWORDS = {
+    "if", "elseif", "else", "elif", "for", "foreach", "while", "until", "do", "switch", "try",
+    "catch", "finally", "function", "filter", "param", "begin", "process", "end", "then",
+    "fi", "done", "esac", "case", "in", "trap"
+}
+# Bash keywords that may prefix a command on the same line ("then az vm start ...")
+PREFIX_KEYWORDS = {"then", "do", "else"}
+# Tokens after which a line break does not end the command
+CONTINUATION_OPERATORS = {"|", "||", "&&"}
+ASSIGNMENT_OPERATORS = {"=", "+=", "-=", "*=", "/="}
+
+def script_dialect(language: Optional[str]) -> str:
+    """Lexer dialect for a script language: "bash" for shell and Azure CLI scripts, else "powershell"."""
+    return "bash" if (language or "").strip().lower() in ("bash", "sh", "shell", "azure cli", "azure-cli", "az") else "powershell"
+
+def lex_script(code: str, dialect: str = "powershell") -> List[Dict[str, Any]]:
+    """Split a PowerShell or shell script into commands in a single pass.
+
+    Each command is {"text", "verb", "args", "pipeline", "span", "line"}: `text` is the
+    command with its line continuations joined, `pipeline` the verb of each pipeline stage,
+    `span` the (start, end) character offsets in `code` and `line` the 1-based line it
+    starts on. Backtick and backslash line continuations, trailing pipes and `&&`/`||`,
+    quoted strings, here-strings, parenthesised expressions and script-block arguments all
+    stay within one command; strings, expressions and blocks that span lines keep their
+    line breaks in `text` and `args`.
+    Comments and block keywords (`if`, `foreach`, `}` ...) are dropped; the commands inside
+    the blocks are returned.
+    """
+    powershell = dialect == "powershell"
+    escape = "`" if powershell else "\\"
+    continuation = ("`", "\\") if powershell else ("\\",)
+    newlines = [i for i, c in enumerate(code) if c == "\n"]
+    commands: List[Dict[str, Any]] = []
+    tokens: List[Tuple[int, int]] = []
+    token_start: Optional[int] = None
+    depth = 0
+    quote: Optional[str] = None
+    n = len(code)
+    i = 0
+
+    def end_token(pos: int) -> None:
+        nonlocal token_start
+        if token_start is not None:
+            tokens.append((token_start, pos))
+            token_start = None
+
+    def end_command() -> None:
+        words = [code[start:end] for start, end in tokens]
+        spans = list(tokens)
+        tokens.clear()
+        while words and words[0].lower() in PREFIX_KEYWORDS and len(words) > 1:
+            words.pop(0)
+            spans.pop(0)
+        if not words or words[0].lower() in CONTROL_KEYWORDS:
+            return
+        # For "$vms = Get-AzVM ..." the verb is the command being run, not the variable
+        verb_index = 2 if len(words) > 2 and words[1] in ASSIGNMENT_OPERATORS and words[2][:1].isalpha() else 0
+        pipeline = [words[verb_index]] + [words[k + 1] for k in range(len(words) - 1) if words[k] == "|"]
+        start, end = spans[0][0], spans[-1][1]
+        commands.append({
+            "text": " ".join(words),
+            "verb": words[verb_index],
+            "args": words[verb_index + 1:],
+            "pipeline": pipeline,
+            "span": (start, end),
+            "line": bisect_right(newlines, start - 1) + 1
+        })
+
+    while i < n:
+        c = code[i]
+        nxt = code[i + 1] if i + 1 < n else ""
+        if quote is not None:
+            if len(quote) == 2:
+                # Here-string: only a terminator at the start of a line closes it
+                if c == "\n" and code.startswith(quote, i + 1):
+                    quote = None
+                    i += 3
+                    continue
+            elif c == escape and quote == '"' and nxt:
+                i += 2
+                continue
+            elif c == quote:
+                quote = None
+            i += 1
+            continue
+        if c in continuation and (nxt == "\n" or (nxt == "\r" and code[i + 2:i + 3] == "\n")):
+            # Line continuation: the command goes on on the next line
+            end_token(i)
+            i += 2 if nxt == "\n" else 3
+            continue
+        if c == escape and nxt and nxt != "\n":
+            if token_start is None:
+                token_start = i
+            i += 2
+            continue
+        if c in "'\"":
+            if token_start is None:
+                token_start = i
+            quote = c
+            i += 1
+            continue
+        if powershell and c == "@" and nxt in ("'", '"'):
+            line_end = code.find("\n", i + 2)
+            if line_end != -1 and not code[i + 2:line_end].strip():
+                if token_start is None:
+                    token_start = i
+                quote = nxt + "@"
+                i = line_end
+                continue
+        if c == "#" and token_start is None:
+            # Comment to the end of the line (inside a word, # is an ordinary character)
+            line_end = code.find("\n", i)
+            i = n if line_end == -1 else line_end
+            continue
+        if powershell and c == "<" and nxt == "#" and token_start is None:
+            close = code.find("#>", i + 2)
+            i = n if close == -1 else close + 2
+            continue
+        if depth:
+            # Inside (...), [...] or a script block; line breaks belong to the token
+            if c in "({[":
+                depth += 1
+            elif c in ")}]":
+                depth -= 1
+            i += 1
+            continue
+        if c in " \t\r":
+            end_token(i)
+        elif c == "\n":
+            end_token(i)
+            if not (tokens and code[tokens[-1][0]:tokens[-1][1]] in CONTINUATION_OPERATORS):
+                end_command()
+        elif c == ";":
+            end_token(i)
+            end_command()
+        elif c in "|&" and (c == "|" or nxt == "&"):
+            end_token(i)
+            width = 2 if nxt == c else 1
+            tokens.append((i, i + width))
+            i += width
+            continue
+        elif c == "{" and token_start is None:
+            if not tokens or code[tokens[0][0]:tokens[0][1]].lower() in CONTROL_KEYWORDS:
+                # Opens a statement block: its header is not a command, its body is
+                end_command()
+            else:
+                # A script-block argument, e.g. Where-Object { ... }
+                token_start = i
+                depth = 1
+        elif c == "}":
+            # Closes a statement block
+            end_token(i)
+            end_command()
+        else:
+            if token_start is None:
+                token_start = i
+            if c in "([{":
+                # (...), [...] and ${...} / @{...} attached to a word
+                depth = 1
+        i += 1
+    end_token(n)
+    end_command()
+    return commands
+
+class CommandLexer:
+    """lex_script with results cached by script hash, so every consumer shares one parse.
+
+    Cached command lists are shared; callers must not modify them.
+    """
+
+    def __init__(self, cache_size: int = COMMAND_LEXER_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def script_hash(code: str, dialect: str = "powershell") -> str:
+        return hashlib.sha256(f"{dialect}\0{code}".encode("utf-8")).hexdigest()
+
+    def lex(self, code: str, language: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Structured commands of a script in `language` (PowerShell when not given)."""
+        if not code:
+            return []
+        dialect = script_dialect(language)
+        key = self.script_hash(code, dialect)
+        commands = self._cache.get(key)
+        if commands is not None:
+            self._cache.move_to_end(key)
+            metrics.increment("command_lexer_cache", result="hit")
+            return commands
+        metrics.increment("command_lexer_cache", result="miss")
+        commands = self._cache[key] = lex_script(code, dialect)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return commands
+
+    def command_texts(self, code: str, language: Optional[str] = None) -> List[str]:
+        """The text of each command of a script.
+
+        Line continuations are joined, but a multi-line string, expression or script-block
+        argument keeps its line breaks, so a text can span several lines.
+        """
+        return [command["text"] for command in self.lex(code, language)]
+
+# Process-wide lexer cache, shared by the automation agent and the graph
+command_lexer = CommandLexer()
@@ -0,0 +1,141 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+from app.utils.metrics import metrics
+from app.config import COMPRESSION_MIN_BYTES, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY, COMPRESSION_CACHE_SIZE
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
+# Content types worth compressing; everything else (images, archives) is sent as is
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+def available_encodings() -> Tuple[str, ...]:
+    """Encodings this server can produce, most preferred first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for an Accept-Encoding header, or None for an uncompressed response."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    best, best_weight = None, 0.0
+    for coding in available_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        # Ties go to the earlier (better) encoding
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def response_etag(etag: str, accept_encoding: Optional[str], size: int, minimum_size: int = COMPRESSION_MIN_BYTES) -> str:
+    """The ETag a JSON response of `size` bytes carries once CompressionMiddleware has handled it.
+
+    A 304 sends this, so it names the same validator as the full response would.
+    """
+    if etag.startswith("W/") or size < minimum_size or negotiate_encoding(accept_encoding or "") is None:
+        return etag
+    return f"W/{etag}"
+
+def compress(body: bytes, encoding: str, gzip_level: int = COMPRESSION_GZIP_LEVEL, brotli_quality: int = COMPRESSION_BROTLI_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    # Fixed mtime so the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+class CompressionMiddleware:
+    """Compress JSON and text responses with the best encoding the client accepts.
+
+    Bodies under `minimum_size` and streamed responses are sent unchanged. Compressed
+    bodies of responses with a strong ETag (finished tasks, artifacts) are cached, since
+    the same ETag always means the same bytes. Compression turns the ETag weak, so
+    conditional requests still match while caches can tell the encodings apart.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_BYTES,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+        cache_size: int = COMPRESSION_CACHE_SIZE
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        streaming = False
+
+        async def send_compressed(message):
+            nonlocal start, streaming
+            if streaming or message["type"] not in ("http.response.start", "http.response.body"):
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start = message
+            elif message.get("more_body", False):
+                # Streamed responses go out as they are produced
+                streaming = True
+                await send(start)
+                await send(message)
+            else:
+                body = self._encode(start, message.get("body", b""), encoding)
+                await send(start)
+                await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _encode(self, start, body: bytes, encoding: str) -> bytes:
+        headers = MutableHeaders(raw=start["headers"])
+        content_type = headers.get("content-type", "")
+        if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+            return body
+        headers.add_vary_header("Accept-Encoding")
+        if len(body) < self.minimum_size:
+            return body
+
+        etag = headers.get("etag")
+        key = (etag, encoding) if etag and not etag.startswith("W/") else None
+        compressed = self._cache.get(key) if key else None
+        if compressed is not None:
+            self._cache.move_to_end(key)
+        else:
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            if key:
+                self._cache[key] = compressed
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        metrics.increment("response_bytes_uncompressed", len(body), encoding=encoding)
+        metrics.increment("response_bytes_compressed", len(compressed), encoding=encoding)
+
+        headers["content-encoding"] = encoding
+        headers["content-length"] = str(len(compressed))
+        if etag and not etag.startswith("W/"):
+            headers["etag"] = f"W/{etag}"
+        return compressed
@@ -0,0 +1,41 @@
+from typing import List, Tuple
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+class ContextBuilder:
+    """Upstream stage outputs rendered into one prompt section that fits `max_tokens`.
+
+    When the sections do not all fit, the budget is shared out evenly: sections smaller
+    than their share stay whole and the rest are truncated, so a long script cannot crowd
+    out the diagnosis and the prompt stays the same size however large the inputs get.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self._sections: List[Tuple[str, str]] = []
+
+    def add(self, title: str, text: str) -> "ContextBuilder":
+        if text and text.strip():
+            self._sections.append((title, text.strip()))
+        return self
+
+    def _allocate(self) -> List[int]:
+        # Each section costs its heading and the blank line separating it from the next
+        headers = [count_tokens(f"{title}:\n") + count_tokens("\n\n") for title, _ in self._sections]
+        budget = self.max_tokens - sum(headers)
+        sizes = [count_tokens(text) for _, text in self._sections]
+        allocation = [0] * len(sizes)
+        # Serve the smallest sections first so leftover budget flows to the larger ones
+        order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+        for position, i in enumerate(order):
+            share = max(budget, 0) // (len(order) - position)
+            allocation[i] = min(sizes[i], share)
+            budget -= allocation[i]
+        return allocation
+
+    def build(self) -> str:
+        parts = []
+        for (title, text), tokens in zip(self._sections, self._allocate()):
+            text = truncate_to_tokens(text, tokens)
+            if text:
+                parts.append(f"{title}:\n{text}")
+        return "\n\n".join(parts)
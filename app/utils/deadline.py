@@ -0,0 +1,53 @@
+from typing import Optional, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+# Absolute time.monotonic() deadline of the request being processed, if any.
+# Context variables are copied into tasks and threads spawned from the request,
+# so every graph node and LLM call sees the same budget.
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's latency budget is spent."""
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """Run the enclosed block with a deadline `seconds` from now.
+
+    Nested scopes can only tighten an outer deadline. `None` leaves the current deadline unchanged.
+    """
+    current = _deadline.get()
+    if seconds is None:
+        yield current
+        return
+    deadline = time.monotonic() + seconds
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is no deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def check_deadline(stage: str = "request") -> None:
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+def call_timeout(default: Optional[float], stage: str = "LLM call") -> Optional[float]:
+    """Per-call timeout: the smaller of `default` and the remaining request budget."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+    return left if default is None else min(default, left)
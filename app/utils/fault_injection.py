@@ -0,0 +1,106 @@
+from typing import Any, Dict, List, Optional
+from collections import Counter
+from types import SimpleNamespace
+import asyncio
+import random
+from app.config import LLM_FAULT_RATES, LLM_FAULT_SEED, LLM_FAULT_TOKEN_DELAY
+from app.utils.llm_cassette import RecordedResponse
+from app.utils.metrics import metrics
+from app.utils.tokens import count_tokens
+
+# Faults that replace the call with a failure, at most one per call, in this order of precedence
+FAILURES = ("timeout", "rate_limit", "server_error")
+# Faults that alter a successful response; any combination can apply
+DISTORTIONS = ("fenced_json", "truncated_json", "slow_tokens")
+FAULTS = FAILURES + DISTORTIONS
+
+class InjectedFault(Exception):
+    """A provider error raised by the fault injector, with the status code a real one would carry."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(f"{message} (injected)")
+        self.status_code = status_code
+
+class FaultInjector:
+    """Seeded random choice of LLM faults, with a tally of what was injected.
+
+    Each call draws once per fault, in a fixed order, so the same seed and the same
+    sequence of calls always give the same faults.
+    """
+
+    def __init__(self, rates: Dict[str, float] = LLM_FAULT_RATES, seed: int = LLM_FAULT_SEED, token_delay: float = LLM_FAULT_TOKEN_DELAY):
+        self.configure(rates, seed, token_delay)
+
+    def configure(self, rates: Dict[str, float], seed: int = 0, token_delay: float = LLM_FAULT_TOKEN_DELAY) -> None:
+        """Replace the fault probabilities and seed, and clear the tally."""
+        unknown = set(rates) - set(FAULTS)
+        if unknown:
+            raise ValueError(f"Unknown faults: {', '.join(sorted(unknown))}")
+        self.rates = {fault: float(rates.get(fault, 0)) for fault in FAULTS}
+        self.seed = seed
+        self.token_delay = token_delay
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.injected: Counter = Counter()
+
+    def draw(self) -> List[str]:
+        """Faults to apply to the next call."""
+        self.calls += 1
+        rolls = [(fault, self._random.random()) for fault in FAULTS]
+        faults = [fault for fault, roll in rolls if roll < self.rates[fault]]
+        failure = next((fault for fault in faults if fault in FAILURES), None)
+        if failure is not None:
+            # A failed call returns nothing to distort
+            faults = [failure]
+        self.injected.update(faults)
+        for fault in faults:
+            metrics.increment("llm_faults_injected", fault=fault)
+        return faults
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"seed": self.seed, "rates": dict(self.rates), "calls": self.calls, "injected": dict(self.injected)}
+
+class FaultInjectingClient:
+    """Wraps the SDK client's `chat.completions.create` and injects faults into its calls.
+
+    Timeouts hang past the call's own timeout, so the client's timeout handling fires. Rate
+    limits and server errors raise errors with status 429 and 500. Fenced and truncated JSON
+    rewrite the completion text, and slow tokens delay the reply in proportion to its length.
+    """
+
+    def __init__(self, client: Any, injector: "FaultInjector"):
+        self.client = client
+        self.injector = injector
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request: Any) -> Any:
+        faults = self.injector.draw()
+        if "timeout" in faults:
+            await asyncio.sleep((request.get("timeout") or 60) + 1)
+            raise InjectedFault("Request timed out", 408)
+        if "rate_limit" in faults:
+            raise InjectedFault("Rate limit reached for requests", 429)
+        if "server_error" in faults:
+            raise InjectedFault("The server had an error while processing your request", 500)
+
+        response = await self.client.chat.completions.create(**request)
+        if not faults:
+            return response
+        data = response.model_dump()
+        for choice in data.get("choices") or []:
+            message = choice.get("message") or {}
+            content = message.get("content") or ""
+            if "fenced_json" in faults:
+                content = f"```json\n{content}\n```"
+            if "truncated_json" in faults:
+                content = content[:len(content) // 2]
+            message["content"] = content
+        if "slow_tokens" in faults:
+            tokens = (data.get("usage") or {}).get("completion_tokens")
+            if not tokens:
+                tokens = sum(count_tokens((choice.get("message") or {}).get("content") or "") for choice in data.get("choices") or [])
+            await asyncio.sleep(tokens * self.injector.token_delay)
+        return RecordedResponse(data)
+
+# Process-wide injector, so one seed covers the calls of every client
+fault_injector = FaultInjector()
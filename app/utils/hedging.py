@@ -0,0 +1,79 @@
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from collections import deque
+import asyncio
+from app.utils.metrics import percentile
+from app.config import HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MAX_RATE, HEDGE_RATE_WINDOW
+
+class HedgePolicy:
+    """When to send a duplicate of a slow call, and how often that is allowed.
+
+    A hedge fires once a call has run longer than the `pct` percentile of recent latencies
+    (and only when at least `min_samples` are known). At most `max_rate` of the last `window`
+    calls may be hedged, which bounds the extra token spend.
+    """
+
+    def __init__(self, pct: float = 95.0, min_samples: int = 20, max_rate: float = 0.05, window: int = 1000):
+        self.pct = pct
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self._calls: deque = deque(maxlen=window)
+        self._hedged = 0
+
+    def delay(self, latencies: List[float]) -> Optional[float]:
+        """Seconds to wait before hedging, or None when there is too little history."""
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, self.pct)
+
+    def record_call(self, hedged: bool) -> None:
+        if len(self._calls) == self._calls.maxlen and self._calls[0]:
+            self._hedged -= 1
+        self._calls.append(hedged)
+        if hedged:
+            self._hedged += 1
+
+    def hedge_allowed(self) -> bool:
+        calls = max(1, len(self._calls))
+        return (self._hedged + 1) / calls <= self.max_rate
+
+async def hedged_call(
+    make_call: Callable[[], Awaitable[Any]],
+    delay: Optional[float],
+    policy: HedgePolicy
+) -> Tuple[Any, bool]:
+    """Run `make_call`, starting a duplicate if it is still running after `delay` seconds.
+
+    The first successful reply wins and the other attempt is cancelled; an error is only
+    raised once both attempts have failed. Returns `(result, hedged)`.
+    """
+    primary = asyncio.ensure_future(make_call())
+    tasks = [primary]
+    try:
+        if delay is None:
+            result = await primary
+            policy.record_call(False)
+            return result, False
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not policy.hedge_allowed():
+            result = await primary
+            policy.record_call(False)
+            return result, False
+
+        policy.record_call(True)
+        tasks.append(asyncio.ensure_future(make_call()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), True
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+# Process-wide policy so the hedge-rate cap holds across all call sites
+hedge_policy = HedgePolicy(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MAX_RATE, HEDGE_RATE_WINDOW)
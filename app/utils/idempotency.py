@@ -0,0 +1,65 @@
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import time
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused with a different request body."""
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a request body, used to detect key reuse with different content."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class IdempotencyStore:
+    """Remember the outcome of requests by client-supplied idempotency key.
+
+    The first request for a key runs; a retry with the same key and body gets the stored
+    result (or waits for the original if it is still running) without recomputing anything.
+    Keys whose request raised are forgotten so the client can retry. Entries expire after
+    `ttl_seconds`, and at most `max_entries` are kept.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 3600, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry["created"] < self.ttl_seconds:
+                break
+            if not entry["future"].done():
+                # Never drop a running request; try again on the next insert
+                break
+            del self._entries[key]
+
+    async def run(self, key: str, request_fingerprint: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return `(result, replayed)` for the request identified by `key`."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry["created"] >= self.ttl_seconds and entry["future"].done():
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            if entry["fingerprint"] != request_fingerprint:
+                raise IdempotencyConflict(f"Idempotency key {key!r} was already used with a different request")
+            return await asyncio.shield(entry["future"]), True
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._entries[key] = {"fingerprint": request_fingerprint, "future": future, "created": time.monotonic()}
+        self._evict()
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._entries.pop(key, None)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result, False
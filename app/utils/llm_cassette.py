@@ -0,0 +1,139 @@
+from typing import Any, Dict, List, Optional
+from types import SimpleNamespace
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from app.config import LLM_CASSETTE_PATH, LLM_CASSETTE_LATENCY_SCALE
+
+# Request parameters that decide the response; the timeout and similar transport options do not
+REQUEST_KEYS = ("model", "messages", "temperature", "max_tokens", "n")
+
+class CassetteMiss(Exception):
+    """A replayed request that was never recorded."""
+
+    # Not a provider failure, so it does not count against the model's circuit breaker
+    status_code = 404
+
+class RecordedError(Exception):
+    """A provider error recorded on a cassette, raised again on replay."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class RecordedResponse:
+    """A recorded chat completion, with the same `model_dump()` as the SDK's response."""
+
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+
+    def model_dump(self) -> Dict[str, Any]:
+        return copy.deepcopy(self._data)
+
+    def __repr__(self) -> str:
+        return f"RecordedResponse(id={self._data.get('id')!r})"
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Stable hash of the parameters that decide a completion."""
+    canonical = json.dumps({key: request.get(key) for key in REQUEST_KEYS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class Cassette:
+    """LLM exchanges recorded to, and replayed from, a JSON Lines file.
+
+    Each line holds one request, its response (or error) and the latency it took. On replay,
+    requests are matched on their model, messages and sampling parameters; a request made
+    several times gets its recorded responses in order, then the last one again.
+    """
+
+    def __init__(self, path: str = LLM_CASSETTE_PATH, latency_scale: float = LLM_CASSETTE_LATENCY_SCALE):
+        self.path = path
+        self.latency_scale = latency_scale
+        self._exchanges: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self._positions: Dict[str, int] = {}
+
+    def record(self, request: Dict[str, Any], latency: float, response: Optional[Dict[str, Any]] = None, error: Optional[Exception] = None) -> None:
+        exchange = {
+            "key": request_key(request),
+            "request": {key: request.get(key) for key in REQUEST_KEYS},
+            "latency_seconds": round(latency, 6),
+            "recorded_at": time.time()
+        }
+        if error is not None:
+            exchange["error"] = {"message": str(error), "status_code": getattr(error, "status_code", None)}
+        else:
+            exchange["response"] = response
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+
+    def _load(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._exchanges is None:
+            self._exchanges = {}
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self._exchanges.setdefault(exchange["key"], []).append(exchange)
+            logging.info(f"[Cassette] Loaded {sum(map(len, self._exchanges.values()))} exchanges from {self.path}")
+        return self._exchanges
+
+    async def replay(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """The recorded response to `request`, after its recorded latency times `latency_scale`."""
+        key = request_key(request)
+        recorded = self._load().get(key)
+        if not recorded:
+            raise CassetteMiss(f"No recorded exchange for {request.get('model')} request {key[:12]} in {self.path}")
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        exchange = recorded[min(position, len(recorded) - 1)]
+        if self.latency_scale > 0:
+            await asyncio.sleep(exchange["latency_seconds"] * self.latency_scale)
+        if "error" in exchange:
+            raise RecordedError(exchange["error"]["message"], exchange["error"]["status_code"])
+        return exchange["response"]
+
+    def rewind(self) -> None:
+        """Start every request's responses from the first one again."""
+        self._positions.clear()
+
+class CassetteClient:
+    """Stands in for the SDK client's `chat.completions.create` in record or replay mode.
+
+    In record mode calls go to `client` and each exchange is appended to the cassette; in
+    replay mode they are answered from the cassette and `client` is not needed.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str, client: Any = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and client is None:
+            raise ValueError("Recording needs a client to record from")
+        self.cassette = cassette
+        self.mode = mode
+        self.client = client
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request: Any) -> Any:
+        if self.mode == "replay":
+            return RecordedResponse(await self.cassette.replay(request))
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(**request)
+        except asyncio.CancelledError:
+            # Timed out or lost a hedge: there is no outcome to record
+            raise
+        except Exception as e:
+            self.cassette.record(request, time.perf_counter() - start, error=e)
+            raise
+        self.cassette.record(request, time.perf_counter() - start, response=response.model_dump())
+        return response
+
+# Process-wide cassette, so every client shares one file and one replay position per request
+llm_cassette = Cassette()
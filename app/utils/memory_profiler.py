@@ -0,0 +1,93 @@
+from typing import Dict, Any, List, Optional, Set
+import itertools
+import sys
+import tracemalloc
+from app.config import MEMORY_PROFILING, MEMORY_PROFILING_FRAMES
+
+# Allocations made by the profiler itself are not interesting
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+def deep_sizeof(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Bytes held by `obj` and the containers and strings it references, each counted once."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+def task_footprint(tasks: Dict[str, Dict[str, Any]], sample: int = 500) -> Dict[str, Any]:
+    """Estimated memory held by task records, measured on the `sample` most recent ones."""
+    if not tasks:
+        return {"tasks": 0, "sampled": 0, "per_task_bytes": 0, "estimated_total_bytes": 0}
+    start = max(len(tasks) - sample, 0)
+    records = list(itertools.islice(tasks.values(), start, None))
+    # One `seen` set, so keys and values shared between records are counted once
+    seen: Set[int] = set()
+    per_task = sum(deep_sizeof(record, seen) for record in records) / len(records)
+    return {
+        "tasks": len(tasks),
+        "finished": sum(1 for record in tasks.values() if "end_time" in record),
+        "sampled": len(records),
+        "per_task_bytes": round(per_task),
+        "estimated_total_bytes": round(per_task * len(tasks))
+    }
+
+class MemoryProfiler:
+    """Allocation-site memory report backed by tracemalloc.
+
+    Tracing only starts when `enabled`, since it slows every allocation and keeps
+    `frames` stack frames per live block.
+    """
+
+    GROUPINGS = ("lineno", "filename", "traceback")
+
+    def __init__(self, enabled: bool = MEMORY_PROFILING, frames: int = MEMORY_PROFILING_FRAMES):
+        self.enabled = enabled
+        self.frames = frames
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def top_allocations(self, limit: int = 20, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """Largest live allocations grouped by source line, file or full traceback."""
+        if group_by not in self.GROUPINGS:
+            raise ValueError(f"Unknown grouping: {group_by}")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        sites = []
+        for stat in snapshot.statistics(group_by)[:limit]:
+            frame = stat.traceback[0]
+            site = {"size_bytes": stat.size, "count": stat.count}
+            if group_by == "filename":
+                site["site"] = frame.filename
+            else:
+                site["site"] = f"{frame.filename}:{frame.lineno}"
+            if group_by == "traceback":
+                site["traceback"] = stat.traceback.format()
+            sites.append(site)
+        return sites
+
+    def report(self, tasks: Dict[str, Dict[str, Any]], limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_bytes": current,
+            "peak_traced_bytes": peak,
+            "task_footprint": task_footprint(tasks),
+            "top_allocations": self.top_allocations(limit, group_by)
+        }
+
+# Process-wide profiler; main starts it when MEMORY_PROFILING is set
+memory_profiler = MemoryProfiler()
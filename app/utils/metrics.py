@@ -0,0 +1,90 @@
+from typing import Dict, Any, List, Tuple
+from collections import defaultdict, deque
+import math
+import threading
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class MetricsRegistry:
+    """In-process counters, gauges and timing summaries exposed on /api/v1/metrics.
+
+    Series are keyed by name plus labels, e.g. `llm_latency_seconds{call_site=writer,model=gpt-4o}`.
+    Summaries keep a bounded window of recent samples for percentiles.
+    """
+
+    def __init__(self, window: int = 512):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._summaries: Dict[str, Dict[str, Any]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            self._counters[_key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = {"count": 0, "sum": 0.0, "max": 0.0, "recent": deque(maxlen=self.window)}
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+            summary["recent"].append(value)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def recent(self, name: str, **labels) -> List[float]:
+        """Recent samples of a summary, oldest first."""
+        with self._lock:
+            summary = self._summaries.get(_key(name, labels))
+            return list(summary["recent"]) if summary else []
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            summaries = {}
+            for key, summary in self._summaries.items():
+                recent = list(summary["recent"])
+                summaries[key] = {
+                    "count": summary["count"],
+                    "sum": round(summary["sum"], 6),
+                    "mean": round(summary["sum"] / summary["count"], 6),
+                    "max": round(summary["max"], 6),
+                    "p50": round(percentile(recent, 50), 6),
+                    "p95": round(percentile(recent, 95), 6),
+                    "p99": round(percentile(recent, 99), 6)
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+# Process-wide registry
+metrics = MetricsRegistry()
@@ -0,0 +1,43 @@
+from typing import Dict, Any, Optional
+import json
+import logging
+from app.config import MODEL_ROUTING, MODEL_ROUTING_FILE
+
+class ModelRouting:
+    """Resolve model, temperature, max_tokens and timeout for an LLM call site.
+
+    Call sites are dotted names such as "automation.verify". Settings are merged from
+    "default", then the agent ("automation"), then the full call site, so an entry only
+    needs the fields it changes.
+    """
+
+    def __init__(self, table: Dict[str, Dict[str, Any]], overrides_file: Optional[str] = None):
+        self.table = {site: dict(settings) for site, settings in table.items()}
+        if overrides_file:
+            self.load_overrides(overrides_file)
+
+    def load_overrides(self, path: str) -> None:
+        with open(path) as f:
+            overrides = json.load(f)
+        for site, settings in overrides.items():
+            self.table.setdefault(site, {}).update(settings)
+        logging.info(f"[ModelRouting] Loaded overrides for {sorted(overrides)} from {path}")
+
+    def resolve(self, call_site: str = "default", escalate: bool = False) -> Dict[str, Any]:
+        settings = dict(self.table.get("default", {}))
+        parts = call_site.split(".")
+        for i in range(1, len(parts) + 1):
+            settings.update(self.table.get(".".join(parts[:i]), {}))
+        if escalate and settings.get("escalation_model"):
+            settings["model"] = settings["escalation_model"]
+            settings["tier"] = "escalated"
+        else:
+            settings["tier"] = "primary"
+        return settings
+
+    def can_escalate(self, call_site: str) -> bool:
+        settings = self.resolve(call_site)
+        return bool(settings.get("escalation_model")) and settings["escalation_model"] != settings["model"]
+
+# Process-wide routing table
+model_routing = ModelRouting(MODEL_ROUTING, MODEL_ROUTING_FILE)
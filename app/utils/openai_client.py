@@ -1,40 +1,148 @@
-from typing import Dict, Any, List
-from openai import AsyncOpenAI
-from app.config import OPENAI_API_KEY
+from typing import Dict, Any, List, Optional
+from app.config import OPENAI_API_KEY, LLM_FALLBACK_MODEL, LLM_CASSETTE_MODE, LLM_FAULT_INJECTION
+from app.utils.bulkhead import bulkheads
+from app.utils.circuit_breaker import circuit_breakers
+from app.utils.deadline import DeadlineExceeded, call_timeout
+from app.utils.fault_injection import FaultInjectingClient, fault_injector
+from app.utils.hedging import hedge_policy, hedged_call
+from app.utils.llm_cassette import CassetteClient, llm_cassette
+from app.utils.metrics import metrics
+from app.utils.model_routing import model_routing
+from app.utils.tokens import count_tokens
+import asyncio
 import logging
+import time
+
+def _is_provider_failure(error: Exception) -> bool:
+    """Whether an API error says the provider is unhealthy, as opposed to a bad request."""
+    status = getattr(error, "status_code", None)
+    return status is None or status >= 500 or status in (408, 409, 429)
 
 class OpenAIProjectClient:
-    def __init__(self, api_key: str = OPENAI_API_KEY):
-        self.client = AsyncOpenAI(api_key=api_key)
+    def __init__(self, api_key: str = OPENAI_API_KEY, cassette_mode: str = LLM_CASSETTE_MODE, inject_faults: bool = LLM_FAULT_INJECTION):
+        if cassette_mode == "replay":
+            # Answered from the recorded cassette, so no provider client is needed
+            self.client = CassetteClient(llm_cassette, "replay")
+        else:
+            # Imported here so that importing the app does not pay for the SDK
+            from openai import AsyncOpenAI
+            self.client = AsyncOpenAI(api_key=api_key)
+            if cassette_mode == "record":
+                self.client = CassetteClient(llm_cassette, "record", self.client)
+        if inject_faults:
+            # Outermost, so recorded cassettes hold the provider's real answers
+            self.client = FaultInjectingClient(self.client, fault_injector)
 
     async def create_chat_completion(
         self,
         messages: List[Dict[str, str]],
-        model: str = "gpt-3.5-turbo",
-        temperature: float = 0.7,
-        max_tokens: int = 1000
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        n: int = 1,
+        call_site: str = "default",
+        escalate: bool = False,
+        timeout: Optional[float] = None,
+        hedge: Optional[bool] = None
     ) -> Dict[str, Any]:
-        """Create a chat completion using the OpenAI API."""
-        try:
-            response = await self.client.chat.completions.create(
+        """Create a chat completion using the OpenAI API.
+
+        Unset parameters come from the model routing table entry for `call_site`; `escalate`
+        switches to that entry's escalation model. `n` > 1 samples several completions in a
+        single request; they are returned as separate choices.
+
+        The call never outlives the current request deadline: the remaining budget caps the
+        timeout, and DeadlineExceeded is raised when it runs out.
+
+        Each model has a circuit breaker. While it is open the call goes to the configured
+        fallback model, or fails fast with CircuitOpenError if there is none.
+
+        With `hedge` (default: the call site's "hedge" setting), a duplicate request is sent
+        if the first has not answered within the recent tail latency for this call site and
+        model; the first reply wins and the other is cancelled.
+
+        Calls from each agent go through that agent's bulkhead (see app.utils.bulkhead), so
+        one agent's backlog cannot use up the capacity the others need.
+        """
+        bulkhead = bulkheads.for_call_site(call_site)
+        if bulkhead is None:
+            return await self._create_chat_completion(messages, model, temperature, max_tokens, n, call_site, escalate, timeout, hedge)
+        async with bulkhead.acquire():
+            return await self._create_chat_completion(messages, model, temperature, max_tokens, n, call_site, escalate, timeout, hedge)
+
+    async def _create_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        n: int,
+        call_site: str,
+        escalate: bool,
+        timeout: Optional[float],
+        hedge: Optional[bool]
+    ) -> Dict[str, Any]:
+        settings = model_routing.resolve(call_site, escalate=escalate)
+        timeout = call_timeout(timeout or settings.get("timeout"), stage=f"{call_site} LLM call")
+        model = circuit_breakers.acquire(
+            model or settings["model"], settings.get("fallback_model") or LLM_FALLBACK_MODEL
+        )
+        breaker = circuit_breakers.get(model)
+        labels = {"call_site": call_site, "model": model, "tier": settings["tier"]}
+        hedge = settings.get("hedge", False) if hedge is None else hedge
+        hedge_delay = hedge_policy.delay(metrics.recent("llm_latency_seconds", **labels)) if hedge else None
+        
+        def make_call():
+            return self.client.chat.completions.create(
                 model=model,
                 messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
+                temperature=settings["temperature"] if temperature is None else temperature,
+                max_tokens=max_tokens or settings["max_tokens"],
+                n=n,
+                timeout=timeout
+            )
+        
+        start = time.perf_counter()
+        try:
+            response, hedged = await asyncio.wait_for(
+                hedged_call(make_call, hedge_delay, hedge_policy),
+                timeout=timeout
             )
+            if hedged:
+                metrics.increment("llm_hedges", **labels)
             logging.info(f"OpenAI API raw response: {response}")
-            return response.model_dump()
+            result = response.model_dump()
+        except asyncio.TimeoutError:
+            metrics.increment("llm_timeouts", **labels)
+            # Re-check so a call cut short by the request deadline reports it as such;
+            # that says nothing about the model, so it does not count against the circuit
+            try:
+                call_timeout(None, stage=f"{call_site} LLM call")
+            except DeadlineExceeded:
+                breaker.release()
+                raise
+            breaker.record_failure()
+            raise Exception(f"Error creating chat completion: timed out after {timeout:.1f}s")
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
         except Exception as e:
+            metrics.increment("llm_errors", **labels)
+            if _is_provider_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.release()
             logging.error(f"Error creating chat completion: {str(e)}")
             raise Exception(f"Error creating chat completion: {str(e)}")
+        latency = time.perf_counter() - start
+        breaker.record_success(latency)
+        metrics.increment("llm_calls", **labels)
+        metrics.observe("llm_latency_seconds", latency, **labels)
+        usage = result.get("usage") or {}
+        metrics.increment("llm_prompt_tokens", usage.get("prompt_tokens") or 0, **labels)
+        metrics.increment("llm_completion_tokens", usage.get("completion_tokens") or 0, **labels)
+        return result
 
     async def count_tokens(self, text: str) -> int:
-        """Count tokens in a text string."""
-        try:
-            response = await self.client.tokens.count(
-                text=text
-            )
-            return response.usage.total_tokens
-        except Exception as e:
-            # If tokenizer endpoint fails, estimate tokens (rough approximation)
-            return len(text.split()) * 1.3 
\ No newline at end of file
+        """Count tokens in a text string (locally; there is no tokenizer endpoint)."""
+        return count_tokens(text)
@@ -0,0 +1,175 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import Counter
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from starlette.datastructures import Headers
+from app.config import REQUEST_PROFILING, REQUEST_PROFILING_DIR, REQUEST_PROFILING_INTERVAL, REQUEST_PROFILING_MAX_SECONDS
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+def _frame_file(filename: str) -> str:
+    """Short file name for a frame: relative to the project or to site-packages."""
+    _, marker, rest = filename.rpartition("site-packages" + os.sep)
+    if marker:
+        return rest
+    cwd = os.getcwd() + os.sep
+    return filename[len(cwd):] if filename.startswith(cwd) else filename
+
+class SamplingProfiler:
+    """Wall-clock sampling of one thread's Python stack from a background thread.
+
+    Every `interval` seconds the sampler reads the target thread's current frame and
+    records its stack, root first, with the time elapsed since the previous sample. The
+    target runs untouched in between, so the overhead is one stack walk per sample.
+    Sampling stops by itself after `max_seconds`.
+    """
+
+    def __init__(self, thread_id: int, interval: float = REQUEST_PROFILING_INTERVAL, max_seconds: float = REQUEST_PROFILING_MAX_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        # (name, file, first line) per distinct function, and samples as indexes into it
+        self.frames: List[Tuple[str, str, int]] = []
+        self._frame_index: Dict[Any, int] = {}
+        self.samples: List[Tuple[Tuple[int, ...], float]] = []
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self) -> None:
+        last = self.started_at
+        deadline = self.started_at + self.max_seconds
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples.append((self._stack(frame), now - last))
+            last = now
+            if now >= deadline:
+                logging.warning(f"[Profiler] Stopped sampling after {self.max_seconds}s")
+                break
+
+    def _stack(self, frame) -> Tuple[int, ...]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            index = self._frame_index.get(code)
+            if index is None:
+                index = len(self.frames)
+                self.frames.append((code.co_name, _frame_file(code.co_filename), code.co_firstlineno))
+                self._frame_index[code] = index
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def collapsed(self) -> str:
+        """Samples in the collapsed-stack format read by flamegraph.pl and speedscope."""
+        names = [f"{name} ({file}:{line})" for name, file, line in self.frames]
+        counts = Counter(stack for stack, _ in self.samples)
+        return "".join(f"{';'.join(names[i] for i in stack)} {count}\n" for stack, count in counts.most_common())
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """Samples as a speedscope profile, weighted by the time each one stands for."""
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "Agentic AI request profiler",
+            "shared": {"frames": [{"name": function, "file": file, "line": line} for function, file, line in self.frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": [list(stack) for stack, _ in self.samples],
+                "weights": [weight for _, weight in self.samples]
+            }]
+        }
+
+class ProfilingMiddleware:
+    """Profile single requests sent with an `X-Profile: 1` header.
+
+    The event loop thread is sampled for as long as the request runs, serialization and
+    compression included, and the profile is written to `directory` as
+    `<id>.speedscope.json` and `<id>.collapsed.txt`. The ID is returned in the
+    `X-Profile-Id` response header. Requests are only profiled when `enabled`, when
+    `authorize` accepts their X-Admin-Token, and one at a time, since the sampler sees
+    everything running on the loop.
+    """
+
+    def __init__(
+        self,
+        app,
+        authorize: Callable[[Optional[str]], bool],
+        enabled: bool = REQUEST_PROFILING,
+        directory: str = REQUEST_PROFILING_DIR,
+        interval: float = REQUEST_PROFILING_INTERVAL,
+        max_seconds: float = REQUEST_PROFILING_MAX_SECONDS
+    ):
+        self.app = app
+        self.authorize = authorize
+        self.enabled = enabled
+        self.directory = directory
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") != "1" or not self.authorize(headers.get("x-admin-token")):
+            await self.app(scope, receive, send)
+            return
+        if self._active:
+            logging.info(f"[Profiler] Not profiling {scope['path']}: another request is being profiled")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message["headers"]) + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        self._active = True
+        profiler = SamplingProfiler(threading.get_ident(), self.interval, self.max_seconds)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            self._active = False
+            self._write(profile_id, f"{scope['method']} {scope['path']}", profiler)
+
+    def _write(self, profile_id: str, name: str, profiler: SamplingProfiler) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, profile_id)
+            with open(f"{base}.speedscope.json", "w", encoding="utf-8") as f:
+                json.dump(profiler.speedscope(name), f)
+            with open(f"{base}.collapsed.txt", "w", encoding="utf-8") as f:
+                f.write(profiler.collapsed())
+            logging.info(f"[Profiler] {name}: {len(profiler.samples)} samples over {profiler.duration:.3f}s written to {base}.*")
+        except OSError as e:
+            logging.error(f"[Profiler] Could not write profile {profile_id}: {e}")
@@ -0,0 +1,65 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+
+def _cancelling() -> bool:
+    """Whether the current task has been asked to cancel (Python 3.11+; False before)."""
+    task = asyncio.current_task()
+    return bool(task is not None and getattr(task, "cancelling", lambda: 0)())
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the work; callers that arrive while it is
+    in flight wait for and share its result. Followers being cancelled does not affect the
+    leader, and the key is released as soon as the leader finishes. If the leader is
+    cancelled, its followers do not share that: one of them runs the work instead.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    def leader(self, key: str) -> Optional[str]:
+        """Owner of the in-flight call for `key`, if any."""
+        flight = self._flights.get(key)
+        return flight[0] if flight else None
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, owner: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Tuple[Any, Optional[str]]:
+        """Run `fn` unless a call for `key` is already in flight.
+
+        Returns `(result, leader)` where `leader` is the owner of the call that produced the
+        result, or None if this caller ran it itself. A follower waits at most `timeout`
+        seconds and then gets asyncio.TimeoutError; the leader carries on regardless.
+        """
+        loop = asyncio.get_running_loop()
+        expires = None if timeout is None else loop.time() + timeout
+        while key in self._flights:
+            leader, future = self._flights[key]
+            left = None if expires is None else max(0.0, expires - loop.time())
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout=left), leader
+            except asyncio.CancelledError:
+                if not future.cancelled() or _cancelling():
+                    raise
+                # The leader was cancelled, not this caller: take the work over (or join
+                # whichever follower already has)
+
+        future = loop.create_future()
+        # Mark exceptions as retrieved so a leader failure with no followers is not logged as lost
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._flights[key] = (owner, future)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, None
+        finally:
+            del self._flights[key]
@@ -0,0 +1,99 @@
+from typing import Any, Dict, Iterable, Optional, Set
+import asyncio
+from app.utils.metrics import metrics
+
+class Subscription:
+    """One subscriber's filters and its queue of pending events."""
+
+    def __init__(self, max_pending: int = 1000):
+        self.task_ids: Set[str] = set()
+        self.statuses: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    def push(self, event: Dict[str, Any]) -> None:
+        # A subscriber that stops reading loses its oldest events rather than stalling publishers
+        if self.queue.full():
+            self.queue.get_nowait()
+            metrics.increment("subscription_events_dropped")
+        self.queue.put_nowait(event)
+
+class SubscriptionHub:
+    """Fan task status changes out to subscribers by task ID or by status.
+
+    Subscribers are indexed by the task IDs and statuses they follow, so publishing an event
+    only touches the subscribers it is for, however many tasks exist. Status subscribers get
+    events for tasks entering and leaving their status.
+    """
+
+    def __init__(self, max_pending: int = 1000):
+        self.max_pending = max_pending
+        self._by_task: Dict[str, Set[Subscription]] = {}
+        self._by_status: Dict[str, Set[Subscription]] = {}
+        self._last_status: Dict[str, str] = {}
+
+    def subscribe(self) -> Subscription:
+        return Subscription(self.max_pending)
+
+    def update(
+        self,
+        subscription: Subscription,
+        task_ids: Iterable[str] = (),
+        statuses: Iterable[str] = (),
+        add: bool = True
+    ) -> None:
+        """Add (or with `add=False`, remove) task IDs and statuses a subscription follows."""
+        for index, own, keys in ((self._by_task, subscription.task_ids, task_ids), (self._by_status, subscription.statuses, statuses)):
+            for key in keys:
+                if add:
+                    index.setdefault(key, set()).add(subscription)
+                    own.add(key)
+                else:
+                    subscribers = index.get(key)
+                    if subscribers is not None:
+                        subscribers.discard(subscription)
+                        if not subscribers:
+                            del index[key]
+                    own.discard(key)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.update(subscription, list(subscription.task_ids), list(subscription.statuses), add=False)
+
+    def publish(self, task_id: str, task_record: Dict[str, Any]) -> None:
+        """Coordinator listener: push an event when a task's status changes."""
+        status = task_record["status"]
+        previous = self._last_status.get(task_id)
+        if status == previous:
+            return
+        self._last_status[task_id] = status
+        targets = set(self._by_task.get(task_id, ()))
+        targets.update(self._by_status.get(status, ()))
+        if previous is not None:
+            targets.update(self._by_status.get(previous, ()))
+        if not targets:
+            return
+        event = {
+            "type": "task",
+            "task_id": task_id,
+            "status": status,
+            "previous_status": previous,
+            "version": task_record.get("version")
+        }
+        for subscription in targets:
+            subscription.push(event)
+        metrics.increment("subscription_events_sent", len(targets))
+
+    def forget(self, task_id: str) -> None:
+        """Drop state kept for a task that no longer exists."""
+        self._last_status.pop(task_id, None)
+
+    def snapshot_event(self, task_id: str, task_record: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Current state of a task, sent when a client starts following it."""
+        if task_record is None:
+            return {"type": "task", "task_id": task_id, "status": None, "previous_status": None, "version": None}
+        return {
+            "type": "task",
+            "task_id": task_id,
+            "status": task_record["status"],
+            "previous_status": None,
+            "version": task_record.get("version")
+        }
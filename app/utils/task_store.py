@@ -0,0 +1,104 @@
+from typing import Any, Dict, Optional
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import os
+import re
+from app.utils.serialization import dumps_bytes
+
+_TASK_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+class TaskStore:
+    """Task records persisted as one JSON file per task in `directory`.
+
+    Writes go to a temporary file that then replaces the record, so a crash mid-write
+    leaves the previous version intact. `save_later` and `delete_later` keep the file I/O
+    off the event loop: the record is encoded at once and written by a background worker
+    in a thread, and only the latest version of a task still waiting to be written is kept.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # task_id -> encoded record to write, or None to delete it, in the order first queued
+        self._pending: "OrderedDict[str, Optional[bytes]]" = OrderedDict()
+        self._worker: Optional[asyncio.Task] = None
+
+    def _path(self, task_id: str) -> str:
+        if not _TASK_ID.match(task_id):
+            raise ValueError(f"Invalid task ID: {task_id!r}")
+        return os.path.join(self.directory, f"{task_id}.json")
+
+    def save(self, task_id: str, record: Dict[str, Any]) -> None:
+        self._write(self._path(task_id), dumps_bytes(record))
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, task_id: str) -> None:
+        self._remove(self._path(task_id))
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def save_later(self, task_id: str, record: Dict[str, Any]) -> None:
+        """Queue `record` to be written in the background (synchronously outside an event loop)."""
+        self._schedule(task_id, dumps_bytes(record))
+
+    def delete_later(self, task_id: str) -> None:
+        """Queue the removal of `task_id`'s record, after any write still pending for it."""
+        self._schedule(task_id, None)
+
+    def _schedule(self, task_id: str, data: Optional[bytes]) -> None:
+        path = self._path(task_id)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._apply(path, data)
+            return
+        self._pending[task_id] = data
+        if self._worker is None:
+            self._worker = loop.create_task(self._drain())
+
+    def _apply(self, path: str, data: Optional[bytes]) -> None:
+        if data is None:
+            self._remove(path)
+        else:
+            self._write(path, data)
+
+    async def _drain(self) -> None:
+        try:
+            while self._pending:
+                task_id, data = self._pending.popitem(last=False)
+                try:
+                    await asyncio.to_thread(self._apply, self._path(task_id), data)
+                except OSError as e:
+                    logging.error(f"[TaskStore] Failed to persist task {task_id}: {e}")
+        finally:
+            self._worker = None
+
+    async def flush(self) -> None:
+        """Wait until every queued write and removal has been applied."""
+        while self._worker is not None:
+            await asyncio.shield(self._worker)
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        records = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    record = json.load(f)
+                records[record["task_id"]] = record
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"[TaskStore] Skipping unreadable task file {path}: {e}")
+        return records
@@ -0,0 +1,48 @@
+import logging
+import math
+
+# Average characters per token for English text and code with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """The tiktoken encoding, loaded once; None when tiktoken or its data is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            # Imported here so that importing the app does not pay for it
+            import tiktoken
+        except ImportError:  # optional: token counts are estimated from the text length instead
+            return None
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # The encoding is downloaded on first use; offline hosts estimate instead
+            logging.warning(f"[Tokens] tiktoken encoding unavailable, estimating token counts: {e}")
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in `text`, counted locally without an API call."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = " ...[truncated]") -> str:
+    """Cut `text` so it fits in `max_tokens`, including `marker` when anything was cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(marker)
+    if budget <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        head = encoding.decode(encoding.encode(text, disallowed_special=())[:budget])
+    else:
+        head = text[:budget * CHARS_PER_TOKEN]
+    return head.rstrip() + marker
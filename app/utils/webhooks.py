@@ -0,0 +1,153 @@
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import asyncio
+import ipaddress
+import logging
+import random
+import socket
+from app.utils.metrics import metrics
+from app.utils.serialization import dumps_bytes
+from app.config import (
+    WEBHOOK_BATCH_WINDOW, WEBHOOK_MAX_BATCH, WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_BACKOFF_SECONDS, WEBHOOK_TIMEOUT, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_ALLOWED_HOSTS
+)
+
+# Instance metadata endpoints, refused by name as well as by address
+METADATA_HOSTS = {"metadata", "metadata.google.internal", "metadata.goog", "instance-data", "instance-data.ec2.internal"}
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if getattr(ip, "ipv4_mapped", None) is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+async def check_callback_url(url: str, allowed_hosts: List[str] = WEBHOOK_ALLOWED_HOSTS) -> None:
+    """Raise ValueError unless `url` is a callback this service may POST to.
+
+    Guards against server-side request forgery: with an allowlist, only its hosts are
+    accepted; otherwise the host must resolve, and only to public addresses.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").rstrip(".").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError("callback_url must be an http(s) URL with a host")
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise ValueError(f"callback_url host {host} is not in WEBHOOK_ALLOWED_HOSTS")
+        return
+    if host in METADATA_HOSTS:
+        raise ValueError(f"callback_url host {host} is a metadata endpoint")
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"callback_url host {host} does not resolve")
+    blocked = sorted({info[4][0] for info in infos if not _is_public(info[4][0])})
+    if blocked:
+        raise ValueError(f"callback_url host {host} resolves to a non-public address ({', '.join(blocked)})")
+
+class WebhookDispatcher:
+    """Deliver task notifications to callback URLs in the background.
+
+    Notifications are queued per host and drained by one worker per host, so a slow or
+    failing receiver only delays its own deliveries. A worker waits `batch_window` seconds
+    for a burst to accumulate, then POSTs up to `max_batch` notifications per URL as one
+    `{"events": [...]}` body. Connection errors, 5xx, 408 and 429 are retried with
+    exponential backoff and jitter, up to `max_attempts` times. All deliveries share one
+    pooled HTTP client.
+    """
+
+    def __init__(
+        self,
+        batch_window: float = WEBHOOK_BATCH_WINDOW,
+        max_batch: int = WEBHOOK_MAX_BATCH,
+        max_attempts: int = WEBHOOK_MAX_ATTEMPTS,
+        backoff_seconds: float = WEBHOOK_BACKOFF_SECONDS,
+        timeout: float = WEBHOOK_TIMEOUT,
+        max_connections: int = WEBHOOK_MAX_CONNECTIONS
+    ):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._queues: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            # Imported here so that importing the app does not pay for the HTTP client
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    def enqueue(self, url: str, payload: Dict[str, Any]) -> None:
+        """Queue `payload` for delivery to `url`; must be called from the event loop."""
+        host = urlsplit(url).netloc
+        self._queues.setdefault(host, []).append((url, payload))
+        metrics.increment("webhook_enqueued")
+        if host not in self._workers:
+            self._workers[host] = asyncio.get_running_loop().create_task(self._drain(host))
+
+    async def _drain(self, host: str) -> None:
+        try:
+            while True:
+                # Let a burst for this host accumulate into one batch
+                await asyncio.sleep(self.batch_window)
+                pending = self._queues.get(host)
+                if not pending:
+                    break
+                batch, self._queues[host] = pending[:self.max_batch], pending[self.max_batch:]
+                by_url: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+                for url, payload in batch:
+                    by_url.setdefault(url, []).append(payload)
+                await asyncio.gather(*(self._deliver(url, events) for url, events in by_url.items()))
+        finally:
+            self._queues.pop(host, None)
+            del self._workers[host]
+
+    async def _deliver(self, url: str, events: List[Dict[str, Any]]) -> bool:
+        import httpx
+        body = dumps_bytes({"events": events})
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = await self._get_client().post(url, content=body, headers={"Content-Type": "application/json"})
+                if response.status_code < 300:
+                    metrics.increment("webhook_delivered", len(events))
+                    metrics.increment("webhook_requests")
+                    return True
+                error = f"HTTP {response.status_code}"
+                retryable = response.status_code >= 500 or response.status_code in (408, 429)
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+                retryable = True
+            if not retryable or attempt == self.max_attempts:
+                break
+            metrics.increment("webhook_retries")
+            delay = self.backoff_seconds * 2 ** (attempt - 1)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        logging.warning(f"[Webhooks] Giving up on {len(events)} event(s) for {url}: {error}")
+        metrics.increment("webhook_failed", len(events))
+        return False
+
+    async def flush(self) -> None:
+        """Wait until everything queued so far has been delivered or given up on."""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    async def aclose(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush pending deliveries (for at most `timeout` seconds) and close the HTTP client."""
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            for worker in list(self._workers.values()):
+                worker.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,13 +1,13 @@
 from typing import Dict, Any, List
-import openai
 from app.config import OPENAI_API_KEY
+from app.utils.openai_client import OpenAIProjectClient
+from app.utils.tokens import count_tokens
 
 class ContextPruner:
     """MCP (Model Context Pruning) for efficient context management."""
     
     def __init__(self):
-        self.model = "gpt-3.5-turbo"
-        self.client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+        self.client = OpenAIProjectClient(OPENAI_API_KEY)
     
     async def prune_context(self, context: Dict[str, Any], max_tokens: int = 4000) -> Dict[str, Any]:
         """Prune the context to fit within token limits while preserving essential information."""
@@ -24,13 +24,8 @@ class ContextPruner:
         return await self._prune_context(context, max_tokens)
     
     async def _count_tokens(self, text: str) -> int:
-        """Count the number of tokens in the text."""
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": text}],
-            max_tokens=1
-        )
-        return response.usage.total_tokens
+        """Count the number of tokens in the text (locally, without an LLM call)."""
+        return count_tokens(text)
     
     def _dict_to_string(self, data: Dict[str, Any]) -> str:
         """Convert dictionary to string representation."""
@@ -60,19 +55,17 @@ Focus on preserving:
 Return a JSON object with the same structure but with pruned content."""
 
         # Get LLM's analysis
-        response = await self.client.chat.completions.create(
-            model=self.model,
+        response = await self.client.create_chat_completion(
             messages=[
                 {"role": "system", "content": "You are a context pruning expert."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3,
-            max_tokens=2000
+            call_site="context_pruner"
         )
 
         try:
             # Parse the pruned context
-            pruned_context = eval(response.choices[0].message.content)
+            pruned_context = eval(response["choices"][0]["message"]["content"])
             
             # Verify token count
             pruned_str = self._dict_to_string(pruned_context)
@@ -121,19 +114,17 @@ Please identify and preserve only the information relevant to the {agent_type}'s
 Remove any irrelevant details while maintaining the essential context."""
 
         # Get LLM's optimization
-        response = await self.client.chat.completions.create(
-            model=self.model,
+        response = await self.client.create_chat_completion(
             messages=[
                 {"role": "system", "content": "You are a context optimization expert."},
                 {"role": "user", "content": prompt}
             ],
-            temperature=0.3,
-            max_tokens=2000
+            call_site="context_pruner"
         )
 
         try:
             # Parse the optimized context
-            optimized_context = eval(response.choices[0].message.content)
+            optimized_context = eval(response["choices"][0]["message"]["content"])
             return optimized_context
             
         except Exception as e:
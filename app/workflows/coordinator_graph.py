@@ -1,25 +1,17 @@
-from typing import Dict, Any, List, TypedDict, Annotated, Tuple
+from typing import Dict, Any, List, Optional, Callable, TypedDict, Annotated, Tuple
 import operator
-from langgraph.graph import StateGraph, END, Graph
 from dotenv import load_dotenv
 import os
-import openai
 from app.config import OPENAI_API_KEY
 import json
-from app.agents.diagnostic import DiagnosticAgent
-from app.agents.automation import AutomationAgent
-from app.agents.writer import WriterAgent
+from app.agents.registry import get_agent
 from app.workflows.task_router import TaskRouter
+from app.utils.deadline import DeadlineExceeded
+from app.utils.command_lexer import command_lexer
 import time
 import logging
 
 load_dotenv()
-openai.api_key = OPENAI_API_KEY
-
-# Initialize agents
-diagnostic_agent = DiagnosticAgent()
-automation_agent = AutomationAgent()
-writer_agent = WriterAgent()
 
 # Define the state schema
 class WorkflowState(TypedDict):
@@ -32,6 +24,25 @@ class WorkflowState(TypedDict):
     errors: List[str]
     results: Dict[str, Any]
     commands: List[str]
+    completed_stages: List[str]
+
+# Nodes of CoordinatorGraph in execution order
+PIPELINE_NODES = ["analyze_task", "execute_diagnostic", "execute_automation", "execute_writer", "merge_results"]
+
+# State kept in a checkpoint; everything else is derived again when the run resumes
+CHECKPOINT_KEYS = ("status", "analysis", "diagnosis", "script", "email_draft", "errors", "commands", "completed_stages")
+
+def checkpoint_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact copy of a workflow state to persist after a node completes."""
+    return {key: state[key] for key in CHECKPOINT_KEYS if state.get(key) is not None}
+
+def resume_point(state: Dict[str, Any]) -> str:
+    """First pipeline node the state has not completed yet."""
+    completed = set(state.get("completed_stages") or [])
+    for node in PIPELINE_NODES:
+        if node not in completed:
+            return node
+    return PIPELINE_NODES[-1]
 
 def analyze_request_prompt(task: str) -> List[Dict[str, str]]:
     return [
@@ -45,19 +56,26 @@ def analyze_request_prompt(task: str) -> List[Dict[str, str]]:
         {"role": "user", "content": f"""Analyze the following IT request and determine which specialized agents are needed:\nRequest: {task}\n\nReturn a JSON object with:\n{{\n  \"required_agents\": [\"diagnostic\", \"automation\", \"writer\"],\n  \"steps\": [\n    {{\n      \"agent\": \"agent_name\",\n      \"action\": \"action_description\",\n      \"priority\": 1\n    }}\n  ],\n  \"summary\": \"Brief description of the plan\"\n}}\n\nGuidelines:\n1. If the task mentions Azure CLI, scripts, or automation, ALWAYS include 'automation'\n2. If the task involves communication or documentation, ALWAYS include 'writer'\n3. If the task requires analysis or diagnosis, ALWAYS include 'diagnostic'\n4. Include ALL agents that could be relevant to the task\n5. Only exclude agents if they are completely irrelevant to the task"""}
     ]
 
+_client = None
+
+def _get_client():
+    """Shared LLM client for the module-level nodes, created on first use."""
+    global _client
+    if _client is None:
+        from app.utils.openai_client import OpenAIProjectClient
+        _client = OpenAIProjectClient(OPENAI_API_KEY)
+    return _client
+
 async def analyze_request(state: WorkflowState) -> WorkflowState:
     """Analyze the request to determine required agents and steps."""
     try:
         task = state["task"]
         messages = analyze_request_prompt(task)
-        client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await _get_client().create_chat_completion(
             messages=messages,
-            max_tokens=500,
-            temperature=0.7
+            call_site="router"
         )
-        result_text = response.choices[0].message.content.strip()
+        result_text = response["choices"][0]["message"]["content"].strip()
         analysis = json.loads(result_text)
         state["analysis"] = analysis
         return state
@@ -70,7 +88,7 @@ async def execute_diagnostic(state: WorkflowState) -> WorkflowState:
     try:
         if "diagnostic" not in state["analysis"]["required_agents"]:
             return state
-        result = await diagnostic_agent.execute({"task": state["task"]})
+        result = await get_agent("diagnostic").execute({"task": state["task"]})
         state["diagnosis"] = result.get("diagnosis")
         return state
     except Exception as e:
@@ -83,7 +101,7 @@ async def execute_automation(state: WorkflowState) -> WorkflowState:
     try:
         if "automation" not in state["analysis"]["required_agents"]:
             return state
-        result = await automation_agent.execute({"task": state["task"]})
+        result = await get_agent("automation").execute({"task": state["task"]})
         logging.info(f"[CoordinatorGraph] Automation agent result: {json.dumps(result, indent=2)}")
         state["script"] = result.get("script")
         # If the script is an Azure CLI or similar, extract commands
@@ -91,7 +109,7 @@ async def execute_automation(state: WorkflowState) -> WorkflowState:
             state["commands"] = result["commands"]
         elif state["script"] and state["script"].get("code") and state["script"].get("language", "").lower() in ["azure cli", "bash", "powershell"]:
             # Try to extract commands from code if possible (for CLI tasks)
-            state["commands"] = [line.strip() for line in state["script"]["code"].splitlines() if line.strip()]
+            state["commands"] = command_lexer.command_texts(state["script"]["code"], state["script"].get("language"))
         logging.info(f"[CoordinatorGraph] State after automation: {json.dumps(state, indent=2)}")
         return state
     except Exception as e:
@@ -105,7 +123,7 @@ async def execute_writer(state: WorkflowState) -> WorkflowState:
         if "writer" not in state["analysis"]["required_agents"]:
             return state
         # Pass diagnosis and script as context
-        result = await writer_agent.execute({
+        result = await get_agent("writer").execute({
             "task": state["task"],
             "diagnosis": state.get("diagnosis"),
             "script": state.get("script")
@@ -123,8 +141,8 @@ async def merge_results(state: WorkflowState) -> WorkflowState:
         commands = state.get("commands", [])
         script = state.get("script", {}) or {}
         if not commands and script.get("code"):
-            script_lines = script["code"].splitlines()
-            commands = [line.strip() for line in script_lines if line.strip() and not line.strip().startswith('#')]
+            # Usually a cache hit: the automation agent lexed the same script
+            commands = command_lexer.command_texts(script["code"], script.get("language"))
             logging.info(f"[CoordinatorGraph] Extracted commands from script: {json.dumps(commands, indent=2)}")
         
         # Ensure email_draft is a string
@@ -182,8 +200,9 @@ async def merge_results(state: WorkflowState) -> WorkflowState:
         state["status"] = "failed"
         return state
 
-def create_coordinator_graph() -> StateGraph:
+def create_coordinator_graph() -> "StateGraph":
     """Create the coordinator workflow graph."""
+    from langgraph.graph import StateGraph, END
     workflow = StateGraph(WorkflowState)
     
     # Add nodes
@@ -212,13 +231,32 @@ def create_coordinator_graph() -> StateGraph:
 
 class CoordinatorGraph:
     def __init__(self):
-        self.diagnostic_agent = DiagnosticAgent()
-        self.automation_agent = AutomationAgent()
-        self.writer_agent = WriterAgent()
         self.task_router = TaskRouter()
+        self._graph = None
+    
+    # Agents are shared with the module-level nodes and only built on first use
+    @property
+    def diagnostic_agent(self):
+        return get_agent("diagnostic")
+    
+    @property
+    def automation_agent(self):
+        return get_agent("automation")
+    
+    @property
+    def writer_agent(self):
+        return get_agent("writer")
+    
+    @property
+    def graph(self) -> "Graph":
+        """The compiled workflow graph, built once on first use."""
+        if self._graph is None:
+            self._graph = self.create_graph()
+        return self._graph
         
-    def create_graph(self) -> Graph:
+    def create_graph(self) -> "Graph":
         """Create the main workflow graph."""
+        from langgraph.graph import StateGraph, END
         # Initialize the graph
         workflow = StateGraph(WorkflowState)
         
@@ -236,15 +274,15 @@ class CoordinatorGraph:
         workflow.add_edge("execute_writer", "merge_results")
         workflow.add_edge("merge_results", END)
         
-        # Set the entry point
-        workflow.set_entry_point("analyze_task")
+        # Start at the first node a resumed run has not completed ("analyze_task" for a new one)
+        workflow.set_conditional_entry_point(resume_point, {node: node for node in PIPELINE_NODES})
         
         return workflow.compile()
     
     async def _analyze_task(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze the task and determine required agents."""
-        task = state["task"]
-        analysis = self.task_router.analyze_task(task)
+        # Reuse the routing decision the caller already made, if any
+        analysis = state.get("analysis") or self.task_router.analyze_task(state["task"])
         
         return {
             **state,
@@ -260,6 +298,8 @@ class CoordinatorGraph:
                 result = await self.diagnostic_agent.execute({"task": state["task"]})
                 logging.info(f"[CoordinatorGraph] Diagnostic agent result: {json.dumps(result, indent=2)}")
                 return {**state, "diagnosis": result.get("diagnosis")}
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 logging.error(f"[CoordinatorGraph] Error in _execute_diagnostic: {e}", exc_info=True)
                 state["errors"] = state.get("errors", []) + [f"Error in execute_diagnostic: {str(e)}"]
@@ -301,6 +341,8 @@ class CoordinatorGraph:
                 })
                 logging.info(f"[CoordinatorGraph] Writer agent result: {json.dumps(result, indent=2)}")
                 return {**state, "email_draft": result.get("email_draft")}
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 logging.error(f"[CoordinatorGraph] Error in _execute_writer: {e}", exc_info=True)
                 state["errors"] = state.get("errors", []) + [f"Error in execute_writer: {str(e)}"]
@@ -308,23 +350,45 @@ class CoordinatorGraph:
         logging.info(f"[CoordinatorGraph] SKIP _execute_writer (not required)")
         return state
     
-    async def execute(self, task: str, task_id: str) -> Dict[str, Any]:
-        """Execute the workflow for a given task."""
+    async def execute(
+        self,
+        task: str,
+        task_id: str,
+        analysis: Optional[Dict[str, Any]] = None,
+        on_state: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        checkpoint: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Execute the workflow for a given task.
+
+        `on_state(node, state)` is called with the full state after each node completes, so a
+        caller that cancels the run (e.g. on a deadline) still has every finished stage.
+        Passing a `checkpoint` (see checkpoint_state) resumes after its completed stages
+        instead of starting over.
+        """
         # Create initial state
         initial_state = {
             "task": task,
             "status": "in_progress",
-            "analysis": {},
+            "analysis": analysis or {},
             "diagnosis": None,
             "script": None,
             "email_draft": None,
             "errors": [],
             "results": {},
-            "commands": []
+            "commands": [],
+            "completed_stages": []
         }
+        if checkpoint:
+            initial_state.update(checkpoint)
+            logging.info(f"[CoordinatorGraph] Resuming task {task_id} at {resume_point(initial_state)}")
         
-        # Create and run the graph
-        graph = self.create_graph()
-        final_state = await graph.ainvoke(initial_state)
+        # Run the compiled graph, tracking the state after each node
+        final_state = initial_state
+        async for update in self.graph.astream(initial_state, stream_mode="updates"):
+            for node, node_state in update.items():
+                completed_stages = list(final_state.get("completed_stages") or []) + [node]
+                final_state = {**final_state, **(node_state or {}), "completed_stages": completed_stages}
+                if on_state is not None:
+                    on_state(node, final_state)
         
         return final_state 
\ No newline at end of file
@@ -1,150 +1,229 @@
-from typing import Dict, Any, List, TypedDict, Annotated, Union
-from langgraph.graph import StateGraph, END
-from app.agents.diagnostic import DiagnosticAgent, DiagnosisResult
-import openai
+from typing import Dict, Any, List, TypedDict, Union
+import asyncio
+import logging
+import re
+import time
+from app.agents.registry import get_agent
+from app.agents.diagnostic import UNPARSED_ROOT_CAUSE
+
+# Stated solution confidence ("High"/"Medium"/"Low" or a number) mapped onto 0..1
+CONFIDENCE_LEVELS = {"high": 0.9, "medium": 0.6, "low": 0.3}
 
 class DiagnosticState(TypedDict):
     """State for diagnostic workflow."""
     task: str
     task_id: str
     current_stage: str
-    diagnosis: Union[DiagnosisResult, None]
+    diagnosis: Union[Dict[str, Any], None]
+    candidates: List[Dict[str, Any]]
+    confidence: float
+    votes: int
+    rounds: int
+    tokens_used: int
+    started_at: float
     error: Union[str, None]
-    recursion_count: int
+
+def solution_confidence(solution: Any) -> float:
+    """Return a solution's stated confidence as a float between 0 and 1."""
+    if not isinstance(solution, dict):
+        return 0.0
+    value = solution.get("confidence")
+    if isinstance(value, (int, float)):
+        value = float(value)
+        return value / 100 if value > 1 else max(value, 0.0)
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in CONFIDENCE_LEVELS:
+            return CONFIDENCE_LEVELS[value]
+        try:
+            return solution_confidence({"confidence": float(value.rstrip("%"))})
+        except ValueError:
+            return 0.0
+    return 0.0
+
+def stated_confidence(diagnosis: Dict[str, Any]) -> float:
+    """Best stated solution confidence of a diagnosis, or 0 if it proposes none."""
+    solutions = diagnosis.get("solutions") or []
+    return max((solution_confidence(s) for s in solutions), default=0.0)
+
+def _root_cause_terms(diagnosis: Dict[str, Any]) -> frozenset:
+    text = str(diagnosis.get("root_cause", "")).lower()
+    return frozenset(word for word in re.findall(r"[a-z0-9]+", text) if len(word) > 2)
+
+def _similar(a: frozenset, b: frozenset, threshold: float = 0.5) -> bool:
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= threshold
+
+def vote_diagnoses(candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Group candidates by root cause and pick the one the most samples agree on.
+
+    Confidence blends how many samples agree with the winner and the winner's own stated
+    confidence, so a lone "High" answer out of three disagreeing samples does not pass.
+    Samples that could not be parsed take no part in the vote or the agreement.
+    """
+    candidates = [
+        c for c in candidates
+        if isinstance(c, dict) and c.get("root_cause") and c.get("root_cause") != UNPARSED_ROOT_CAUSE
+    ]
+    if not candidates:
+        return {"diagnosis": None, "confidence": 0.0, "votes": 0}
+    clusters: List[List[Dict[str, Any]]] = []
+    cluster_terms: List[frozenset] = []
+    for candidate in candidates:
+        terms = _root_cause_terms(candidate)
+        for i, representative in enumerate(cluster_terms):
+            if _similar(terms, representative):
+                clusters[i].append(candidate)
+                break
+        else:
+            clusters.append([candidate])
+            cluster_terms.append(terms)
+    winner = max(
+        clusters,
+        key=lambda cluster: (len(cluster), max(stated_confidence(c) for c in cluster))
+    )
+    diagnosis = max(winner, key=stated_confidence)
+    agreement = len(winner) / len(candidates)
+    confidence = 0.5 * agreement + 0.5 * stated_confidence(diagnosis)
+    return {"diagnosis": diagnosis, "confidence": round(confidence, 3), "votes": len(winner)}
 
 class DiagnosticGraph:
-    """Graph for diagnostic workflow."""
-    
-    def __init__(self):
-        self.agent = DiagnosticAgent()
-        self.max_recursions = 5
-    
-    def create_graph(self) -> StateGraph:
+    """Graph for diagnostic workflow.
+
+    Each round samples several candidate diagnoses in a single LLM request and votes between
+    everything sampled so far. The graph stops as soon as the winning diagnosis clears
+    `confidence_threshold`, or when the round, token or latency budget is spent.
+    """
+
+    def __init__(
+        self,
+        confidence_threshold: float = 0.75,
+        samples_per_round: int = 3,
+        max_rounds: int = 2,
+        max_tokens: int = 4000,
+        max_seconds: float = 30.0,
+        tokens_per_sample: int = 500
+    ):
+        self.confidence_threshold = confidence_threshold
+        self.samples_per_round = samples_per_round
+        self.max_rounds = max_rounds
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.tokens_per_sample = tokens_per_sample
+        self._graph = None
+
+    @property
+    def agent(self):
+        return get_agent("diagnostic")
+
+    @property
+    def graph(self):
+        """The compiled workflow graph, built once on first use."""
+        if self._graph is None:
+            self._graph = self.create_graph()
+        return self._graph
+
+    def create_graph(self):
         """Create the diagnostic workflow graph."""
+        from langgraph.graph import StateGraph, END
         workflow = StateGraph(DiagnosticState)
-        workflow.add_node("initial_analysis", self._initial_analysis)
-        workflow.add_node("deep_analysis", self._deep_analysis)
-        workflow.add_node("solution_generation", self._solution_generation)
-        workflow.add_node("confidence_check", self._confidence_check)
+        workflow.add_node("sample_candidates", self._sample_candidates)
+        workflow.add_node("vote", self._vote)
         workflow.add_node("finalize_diagnosis", self._finalize_diagnosis)
+        workflow.add_edge("sample_candidates", "vote")
         workflow.add_conditional_edges(
-            "initial_analysis",
-            self._should_deep_analyze,
+            "vote",
+            self._should_sample_again,
             {
-                True: "deep_analysis",
-                False: "solution_generation"
+                True: "sample_candidates",
+                False: "finalize_diagnosis"
             }
         )
-        workflow.add_conditional_edges(
-            "confidence_check",
-            self._is_confidence_sufficient,
-            {
-                True: "finalize_diagnosis",
-                False: "deep_analysis"
-            }
-        )
-        workflow.add_edge("deep_analysis", "solution_generation")
-        workflow.add_edge("solution_generation", "confidence_check")
         workflow.add_edge("finalize_diagnosis", END)
-        workflow.set_entry_point("initial_analysis")
+        workflow.set_entry_point("sample_candidates")
         return workflow.compile()
 
-    async def _increment_recursion(self, state: DiagnosticState) -> DiagnosticState:
-        count = state.get("recursion_count", 0) + 1
-        return {**state, "recursion_count": count}
+    def _remaining_seconds(self, state: DiagnosticState) -> float:
+        return self.max_seconds - (time.monotonic() - state["started_at"])
 
-    async def _initial_analysis(self, state: DiagnosticState) -> DiagnosticState:
-        state = await self._increment_recursion(state)
-        try:
-            diagnosis = await self.agent.execute({"task": state["task"]})
-            return {**state, "current_stage": "initial_analysis", "diagnosis": diagnosis, "error": None}
-        except Exception as e:
-            return {**state, "current_stage": "initial_analysis", "error": str(e)}
+    def _round_token_cost(self) -> int:
+        return self.samples_per_round * self.tokens_per_sample
 
-    async def _deep_analysis(self, state: DiagnosticState) -> DiagnosticState:
-        state = await self._increment_recursion(state)
+    async def _sample_candidates(self, state: DiagnosticState) -> DiagnosticState:
+        rounds = state["rounds"] + 1
+        remaining = self._remaining_seconds(state)
+        if remaining <= 0:
+            return {**state, "current_stage": "sample_candidates", "rounds": rounds, "error": "Latency budget exhausted"}
         try:
-            context = {
-                "task": state["task"],
-                "initial_diagnosis": state["diagnosis"]
-            }
-            diagnosis = await self.agent.execute(context)
-            return {**state, "current_stage": "deep_analysis", "diagnosis": diagnosis, "error": None}
-        except Exception as e:
-            return {**state, "current_stage": "deep_analysis", "error": str(e)}
-
-    async def _solution_generation(self, state: DiagnosticState) -> DiagnosticState:
-        state = await self._increment_recursion(state)
-        try:
-            context = {
-                "task": state["task"],
-                "diagnosis": state["diagnosis"]
-            }
-            diagnosis = await self.agent.execute(context)
-            return {**state, "current_stage": "solution_generation", "diagnosis": diagnosis, "error": None}
+            sample = await asyncio.wait_for(
+                self.agent.sample_diagnoses(
+                    state["task"],
+                    n=self.samples_per_round,
+                    max_tokens=self.tokens_per_sample
+                ),
+                timeout=remaining
+            )
+        except asyncio.TimeoutError:
+            return {**state, "current_stage": "sample_candidates", "rounds": rounds, "error": "Latency budget exhausted"}
         except Exception as e:
-            return {**state, "current_stage": "solution_generation", "error": str(e)}
+            logging.error(f"[DiagnosticGraph] Sampling failed: {e}", exc_info=True)
+            return {**state, "current_stage": "sample_candidates", "rounds": rounds, "error": str(e)}
+        return {
+            **state,
+            "current_stage": "sample_candidates",
+            "rounds": rounds,
+            "candidates": state["candidates"] + sample["candidates"],
+            "tokens_used": state["tokens_used"] + sample["tokens"],
+            "error": None
+        }
 
-    async def _confidence_check(self, state: DiagnosticState) -> DiagnosticState:
-        state = await self._increment_recursion(state)
-        try:
-            context = {
-                "task": state["task"],
-                "diagnosis": state["diagnosis"]
-            }
-            diagnosis = await self.agent.execute(context)
-            return {**state, "current_stage": "confidence_check", "diagnosis": diagnosis, "error": None}
-        except Exception as e:
-            return {**state, "current_stage": "confidence_check", "error": str(e)}
+    async def _vote(self, state: DiagnosticState) -> DiagnosticState:
+        outcome = vote_diagnoses(state["candidates"])
+        logging.info(
+            f"[DiagnosticGraph] Round {state['rounds']}: confidence {outcome['confidence']} "
+            f"({outcome['votes']}/{len(state['candidates'])} votes, {state['tokens_used']} tokens)"
+        )
+        if outcome["diagnosis"] is None:
+            return {**state, "current_stage": "vote"}
+        return {
+            **state,
+            "current_stage": "vote",
+            "diagnosis": outcome["diagnosis"],
+            "confidence": outcome["confidence"],
+            "votes": outcome["votes"]
+        }
 
     async def _finalize_diagnosis(self, state: DiagnosticState) -> DiagnosticState:
-        state = await self._increment_recursion(state)
-        try:
-            context = {
-                "task": state["task"],
-                "diagnosis": state["diagnosis"]
-            }
-            diagnosis = await self.agent.execute(context)
-            return {**state, "current_stage": "finalize_diagnosis", "diagnosis": diagnosis, "error": None}
-        except Exception as e:
-            return {**state, "current_stage": "finalize_diagnosis", "error": str(e)}
+        # A diagnosis from an earlier round outlives a budget error in a later one
+        error = state.get("error") if state.get("diagnosis") is None else None
+        return {**state, "current_stage": "finalize_diagnosis", "error": error}
 
-    def _should_deep_analyze(self, state: DiagnosticState) -> bool:
-        # If recursion count exceeded, force solution generation
-        if state.get("recursion_count", 0) >= self.max_recursions:
-            return False
+    def _should_sample_again(self, state: DiagnosticState) -> bool:
         if state.get("error"):
             return False
-        diagnosis = state.get("diagnosis")
-        if not diagnosis:
-            return True
-        return getattr(diagnosis, "complexity", "low") == "high" or getattr(diagnosis, "risk_level", "low") == "high"
-
-    def _is_confidence_sufficient(self, state: DiagnosticState) -> bool:
-        # If recursion count exceeded, force finalize
-        if state.get("recursion_count", 0) >= self.max_recursions:
-            return True
-        if state.get("error"):
-            return True
-        diagnosis = state.get("diagnosis")
-        if not diagnosis:
+        if state.get("diagnosis") is not None and state["confidence"] >= self.confidence_threshold:
+            return False
+        if state["rounds"] >= self.max_rounds:
+            return False
+        if state["tokens_used"] + self._round_token_cost() > self.max_tokens:
             return False
-        # Defensive: if solutions missing, finalize
-        solutions = getattr(diagnosis, "solutions", [])
-        if not solutions:
-            return True
-        return all(getattr(sol, "confidence", 1.0) >= 0.8 for sol in solutions)
+        return self._remaining_seconds(state) > 0
 
     async def execute(self, task: str, task_id: str) -> Dict[str, Any]:
         """Execute the diagnostic workflow."""
         state = {
             "task": task,
             "task_id": task_id,
-            "current_stage": "initial_analysis",
+            "current_stage": "sample_candidates",
             "diagnosis": None,
-            "error": None,
-            "recursion_count": 0
+            "candidates": [],
+            "confidence": 0.0,
+            "votes": 0,
+            "rounds": 0,
+            "tokens_used": 0,
+            "started_at": time.monotonic(),
+            "error": None
         }
-        graph = self.create_graph()
-        final_state = await graph.ainvoke(state)
-        return final_state 
\ No newline at end of file
+        final_state = await self.graph.ainvoke(state)
+        return final_state
@@ -1,26 +1,34 @@
 import dspy
-from typing import Dict, Any, List
-from .task_router import TaskType
-from app.utils.openai_client import OpenAIProjectClient
-from app.config import OPENAI_API_KEY
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from .task_router import TaskType, TaskRouter, normalize_request
+from app.config import OPENAI_API_KEY, DSPY_PROGRAM_PATH, ROUTER_CACHE_SIZE
+from app.utils.model_routing import model_routing
+from app.utils.bulkhead import bulkheads
+
+KNOWN_AGENTS = ["diagnostic", "automation", "writer"]
 
 class TaskAnalysis(dspy.Signature):
     """Analyze a task to determine its type and requirements."""
     task: str = dspy.InputField(desc="The task to analyze")
     task_type: str = dspy.OutputField(desc="The type of task (simple, complex, or critical)")
-    required_agents: List[str] = dspy.OutputField(desc="List of required agents for the task")
+    required_agents: List[str] = dspy.OutputField(desc="List of required agents for the task: diagnostic, automation, writer")
     risk_level: str = dspy.OutputField(desc="The risk level of the task (low, medium, or high)")
     complexity: str = dspy.OutputField(desc="The complexity of the task (low or high)")
 
 class TaskAnalyzer(dspy.Module):
     """Analyze tasks using chain of thought."""
-    
+
     def __init__(self):
         super().__init__()
-        self.analyzer = dspy.ChainOfThought("task -> task_type, required_agents, risk_level, complexity")
-    
-    async def forward(self, task: str) -> Dict[str, Any]:
-        """Analyze a task and return its properties."""
+        self.analyzer = dspy.ChainOfThought(TaskAnalysis)
+
+    def forward(self, task: str) -> Dict[str, Any]:
+        """Analyze a task and return its properties (blocking; run it off the event loop)."""
         result = self.analyzer(task=task)
         return {
             "task_type": result.task_type,
@@ -29,61 +37,100 @@ class TaskAnalyzer(dspy.Module):
             "complexity": result.complexity
         }
 
+def normalize_agents(agents: Any) -> List[str]:
+    """Map LLM agent names ("DiagnosticAgent", "Automation", ...) onto graph node names."""
+    if isinstance(agents, str):
+        agents = re.split(r"[,\s]+", agents)
+    names = []
+    for agent in agents or []:
+        name = str(agent).lower().replace("agent", "").strip(" '\"[]")
+        if name in KNOWN_AGENTS and name not in names:
+            names.append(name)
+    # Keep graph order stable regardless of the order the LLM listed them in
+    return [agent for agent in KNOWN_AGENTS if agent in names]
+
 class DSPyRouter:
     """Route tasks using DSPy for analysis."""
-    
-    def __init__(self):
-        # Initialize DSPy with our custom client
-        self.client = OpenAIProjectClient(api_key=OPENAI_API_KEY)
-        dspy.configure(lm=self.client)
-        
-        # Create task analyzer
+
+    def __init__(self, program_path: str = DSPY_PROGRAM_PATH, cache_size: int = ROUTER_CACHE_SIZE):
+        settings = model_routing.resolve("router")
+        self.lm = dspy.LM(
+            f"openai/{settings['model']}",
+            api_key=OPENAI_API_KEY,
+            temperature=settings["temperature"],
+            max_tokens=settings["max_tokens"]
+        )
+        # The LM is passed per call with dspy.context rather than set globally with
+        # dspy.configure, which only the thread that first configured dspy may do
+        self.program_path = program_path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.fallback_router = TaskRouter()
+
+        # Create task analyzer, reusing the compiled program from disk when available
         self.analyzer = TaskAnalyzer()
-    
+        if program_path and os.path.exists(program_path):
+            self.analyzer.load(program_path)
+            logging.info(f"[DSPyRouter] Loaded compiled program from {program_path}")
+
+    def compile(self, trainset: List["dspy.Example"], max_bootstrapped_demos: int = 4) -> None:
+        """Compile the analyzer with few-shot demos and save it so later startups just load it."""
+        def metric(example, prediction, trace=None):
+            return (
+                str(prediction.task_type).lower() == example.task_type
+                and normalize_agents(prediction.required_agents) == normalize_agents(example.required_agents)
+            )
+        optimizer = dspy.BootstrapFewShot(metric=metric, max_bootstrapped_demos=max_bootstrapped_demos)
+        with dspy.context(lm=self.lm):
+            self.analyzer = optimizer.compile(TaskAnalyzer(), trainset=trainset)
+        if self.program_path:
+            os.makedirs(os.path.dirname(self.program_path) or ".", exist_ok=True)
+            self.analyzer.save(self.program_path)
+            logging.info(f"[DSPyRouter] Saved compiled program to {self.program_path}")
+        self._cache.clear()
+
+    def _analyze(self, task: str) -> Dict[str, Any]:
+        with dspy.context(lm=self.lm):
+            return self.analyzer(task=task)
+
     async def analyze_task(self, task: str) -> Dict[str, Any]:
         """Analyze a task using DSPy and return the analysis."""
+        key = normalize_request(task)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return dict(cached)
         try:
-            # Get analysis from DSPy
-            analysis = await self.analyzer(task)
-            
-            # Map task type to enum
-            task_type_map = {
-                "simple": TaskType.SIMPLE,
-                "complex": TaskType.COMPLEX,
-                "critical": TaskType.CRITICAL
-            }
-            
+            # DSPy calls are synchronous; keep them off the event loop. They share the
+            # router's bulkhead with the other routing calls.
+            async with bulkheads.get("router").acquire():
+                analysis = await asyncio.to_thread(self._analyze, task)
+
             # Convert task type to string
-            task_type_str = analysis["task_type"].lower()
-            if task_type_str not in task_type_map:
+            task_type_str = str(analysis["task_type"]).strip().lower()
+            if task_type_str not in {t.value for t in TaskType}:
                 task_type_str = "simple"  # Default to simple if unknown
-            
-            # Determine if approval is required
-            requires_approval = self.should_require_approval(analysis)
-            
-            # Return structured output
-            return {
+
+            required_agents = normalize_agents(analysis["required_agents"]) or ["diagnostic"]
+            result = {
                 "task_type": task_type_str,
-                "required_agents": analysis["required_agents"],
-                "risk_level": analysis["risk_level"],
-                "complexity": analysis["complexity"],
-                "requires_approval": requires_approval
+                "required_agents": required_agents,
+                "risk_level": str(analysis["risk_level"]).strip().lower(),
+                "complexity": str(analysis["complexity"]).strip().lower()
             }
+            # Determine if approval is required
+            result["requires_approval"] = self.should_require_approval(result)
         except Exception as e:
-            # Return default analysis on error
-            return {
-                "task_type": "simple",
-                "required_agents": ["DiagnosticAgent"],
-                "risk_level": "low",
-                "complexity": "low",
-                "requires_approval": False
-            }
-    
+            # Fall back to the keyword router, marked as such; failures are not cached so the
+            # next call retries
+            logging.warning(f"[DSPyRouter] Analysis failed, using keyword routing: {e}")
+            return {**self.fallback_router.analyze_task(task), "router": "keyword"}
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return dict(result)
+
     def should_require_approval(self, analysis: Dict[str, Any]) -> bool:
         """Determine if task requires approval based on analysis."""
-        return (
-            analysis["risk_level"] == "high" or
-            analysis["complexity"] == "high" or
-            "admin" in analysis["required_agents"].lower() or
-            "root" in analysis["required_agents"].lower()
-        ) 
\ No newline at end of file
+        return analysis["risk_level"] == "high" or analysis["task_type"] == TaskType.CRITICAL.value
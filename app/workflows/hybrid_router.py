@@ -0,0 +1,55 @@
+from typing import Dict, Any, Optional
+import logging
+from app.config import ROUTER_LLM_ENABLED, ROUTER_MIN_MARGIN
+from .task_router import TaskRouter
+
+class HybridRouter:
+    """Two-stage task router.
+
+    The keyword `TaskRouter` decides every request whose winning task type leads the
+    runner-up by at least `min_margin` keyword matches. Only the remaining, ambiguous
+    requests are sent to the DSPy analyzer, which is constructed on first use.
+    """
+
+    def __init__(
+        self,
+        task_router: Optional[TaskRouter] = None,
+        min_margin: int = ROUTER_MIN_MARGIN,
+        llm_enabled: bool = ROUTER_LLM_ENABLED
+    ):
+        self.task_router = task_router or TaskRouter()
+        self.min_margin = min_margin
+        self.llm_enabled = llm_enabled
+        self._llm_router = None
+
+    @property
+    def llm_router(self):
+        if self._llm_router is None:
+            from .dspy_router import DSPyRouter
+            self._llm_router = DSPyRouter()
+        return self._llm_router
+
+    def is_confident(self, analysis: Dict[str, Any]) -> bool:
+        return analysis.get("margin", 0) >= self.min_margin
+
+    async def analyze_task(self, task: str) -> Dict[str, Any]:
+        """Analyze a task, consulting the LLM only when the keyword scores are too close to call."""
+        analysis = self.task_router.analyze_task(task)
+        if not self.llm_enabled or self.is_confident(analysis):
+            return {**analysis, "router": "keyword"}
+        try:
+            llm_analysis = await self.llm_router.analyze_task(task)
+        except Exception as e:
+            logging.warning(f"[HybridRouter] LLM analyzer unavailable, using keyword routing: {e}")
+            return {**analysis, "router": "keyword"}
+        if llm_analysis.get("router") == "keyword":
+            # The analyzer failed and answered with its own keyword fallback
+            logging.warning("[HybridRouter] LLM analysis failed, using keyword routing")
+            return {**analysis, "router": "keyword"}
+        return {
+            **analysis,
+            **llm_analysis,
+            # Keyword approval rules are a safety floor the LLM cannot lower
+            "requires_approval": analysis["requires_approval"] or llm_analysis.get("requires_approval", False),
+            "router": "dspy"
+        }
@@ -1,5 +1,10 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from enum import Enum
+import re
+
+def normalize_request(task: str) -> str:
+    """Key for treating requests as identical: case- and whitespace-insensitive."""
+    return re.sub(r"\s+", " ", task.strip().lower())
 
 class TaskType(Enum):
     SIMPLE = "simple"
@@ -27,28 +32,35 @@ class TaskRouter:
             "admin", "root", "system", "security"
         ]
     
-    def determine_task_type(self, task: str) -> TaskType:
-        """Determine the type of task based on keywords and complexity."""
+    def score_task(self, task: str) -> Dict[TaskType, int]:
+        """Count keyword matches for each task type."""
         task = task.lower()
-        
-        # Count keyword matches for each type
-        simple_score = sum(1 for kw in self.simple_keywords if kw in task)
-        complex_score = sum(1 for kw in self.complex_keywords if kw in task)
-        critical_score = sum(1 for kw in self.critical_keywords if kw in task)
-        
-        # Return the type with highest score
-        scores = {
-            TaskType.SIMPLE: simple_score,
-            TaskType.COMPLEX: complex_score,
-            TaskType.CRITICAL: critical_score
+        return {
+            TaskType.SIMPLE: sum(1 for kw in self.simple_keywords if kw in task),
+            TaskType.COMPLEX: sum(1 for kw in self.complex_keywords if kw in task),
+            TaskType.CRITICAL: sum(1 for kw in self.critical_keywords if kw in task)
         }
-        
-        return max(scores.items(), key=lambda x: x[1])[0]
+    
+    def classify(self, task: str) -> Tuple[TaskType, int]:
+        """Return the winning task type and its lead over the runner-up.
+
+        A margin of 0 means the keywords did not separate the types (including no matches at all).
+        """
+        scores = self.score_task(task)
+        ranked = sorted(scores.values(), reverse=True)
+        task_type = max(scores.items(), key=lambda x: x[1])[0]
+        return task_type, ranked[0] - ranked[1]
+    
+    def determine_task_type(self, task: str) -> TaskType:
+        """Determine the type of task based on keywords and complexity."""
+        return self.classify(task)[0]
     
     def get_required_agents(self, task: str) -> List[str]:
         """Determine which agents are required for the task."""
-        task_type = self.determine_task_type(task)
-        
+        return self.agents_for_type(self.determine_task_type(task))
+    
+    def agents_for_type(self, task_type: TaskType) -> List[str]:
+        """Agents that handle a task of the given type."""
         if task_type == TaskType.CRITICAL:
             return ["diagnostic", "automation", "writer"]
         elif task_type == TaskType.COMPLEX:
@@ -106,11 +118,12 @@ class TaskRouter:
     
     def analyze_task(self, task: str) -> Dict[str, Any]:
         """Analyze the task and return a complete analysis."""
-        task_type = self.determine_task_type(task)
+        task_type, margin = self.classify(task)
         
         return {
             "task_type": task_type.value,
-            "required_agents": self.get_required_agents(task),
+            "margin": margin,
+            "required_agents": self.agents_for_type(task_type),
             "requires_approval": self.should_require_approval(task),
             "complexity": "high" if task_type in [TaskType.COMPLEX, TaskType.CRITICAL] else "low",
             "risk_level": "high" if task_type == TaskType.CRITICAL else "medium" if task_type == TaskType.COMPLEX else "low"
@@ -0,0 +1,78 @@
+"""
+Measure the cold import cost of the API using `python -X importtime`.
+
+Usage:
+    python scripts/bench_import_time.py [--module app.main] [--top 15] [--budget-ms 1500]
+
+Exits non-zero if a module that should only be loaded lazily (dspy, langgraph, ...)
+is imported at startup, or if the total import time exceeds the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+project_root = Path(__file__).parent.parent
+
+# Modules that must not be imported until a request actually needs them
+LAZY_MODULES = ["dspy", "litellm", "langgraph", "openai"]
+
+def measure_imports(module: str) -> List[Tuple[str, int, int]]:
+    """Import `module` in a fresh interpreter and return (name, self_us, cumulative_us) rows."""
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-import-benchmark")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def find_lazy_violations(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Return the cumulative import time of every lazy module that was imported eagerly."""
+    violations = {}
+    for name, _, cumulative_us in rows:
+        if name in LAZY_MODULES:
+            violations[name] = cumulative_us
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="Module to import")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to print")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if total import time exceeds this")
+    args = parser.parse_args()
+
+    rows = measure_imports(args.module)
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+    print(f"Imported {len(rows)} modules for '{args.module}' in {total_ms:.1f} ms")
+    print(f"\n{'cumulative ms':>14}  {'self ms':>8}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    failed = False
+    violations = find_lazy_violations(rows)
+    if violations:
+        failed = True
+        print("\nModules that should be imported lazily:")
+        for name, cumulative_us in violations.items():
+            print(f"  {name}: {cumulative_us / 1000:.1f} ms")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failed = True
+        print(f"\nTotal import time {total_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Measure task response size on the wire and serialization CPU per response.
+
+Usage:
+    python scripts/bench_responses.py [--iterations 2000] [--script-lines 200]
+
+Builds one finished task with a realistic diagnosis, script and email draft, then compares
+the previous path (FastAPI encoding the full response model on every request, uncompressed)
+with field projection, cached serialization and gzip/brotli compression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+from unittest.mock import patch
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+os.environ.setdefault("OPENAI_API_KEY", "sk-response-benchmark")
+
+from fastapi.encoders import jsonable_encoder
+from app.coordinator import Coordinator
+from app.utils.compression import available_encodings, compress
+
+def build_task(script_lines: int) -> Tuple[Coordinator, str]:
+    """A coordinator holding one completed task with a script of `script_lines` lines."""
+    coordinator = Coordinator()
+    code = "\n".join(
+        f"Get-AzVM -ResourceGroupName rg-{i % 7} -Name vm-{i:04d} -Status | "
+        f"Where-Object {{ $_.PowerState -eq 'VM running' }} | Stop-AzVM -Force"
+        for i in range(script_lines)
+    )
+    results = {
+        "diagnosis": {
+            "root_cause": "CPU saturation from an unbounded antivirus scan on vm-web-01",
+            "evidence": [f"Perfmon sample {i}: MsMpEng.exe at {90 + i % 10}% CPU" for i in range(20)],
+            "solutions": [{"title": f"Mitigation {i}", "confidence": "High", "steps": ["Schedule scans off-peak"]} for i in range(5)]
+        },
+        "script": {"language": "powershell", "code": code, "lint_passed": True},
+        "email_draft": "Hello team,\n\n" + "The CPU incident is resolved; details follow. " * 60,
+        "commands": []
+    }
+
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        return {"status": "completed", "analysis": analysis, "errors": [], "results": results}
+
+    async def run() -> str:
+        with patch.object(coordinator.coordinator_graph, "execute", side_effect=fake_execute):
+            response = await coordinator.execute_task("Generate a script to stop running VMs")
+        return response.task_id
+
+    return coordinator, asyncio.run(run())
+
+def cpu_microseconds(fn: Callable[[], bytes], iterations: int) -> Tuple[float, bytes]:
+    """Average process CPU time of `fn` in microseconds, and its last output."""
+    body = fn()
+    started = time.process_time()
+    for _ in range(iterations):
+        body = fn()
+    return (time.process_time() - started) / iterations * 1e6, body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Responses per measurement")
+    parser.add_argument("--script-lines", type=int, default=200, help="Lines in the generated script")
+    args = parser.parse_args()
+
+    coordinator, task_id = build_task(args.script_lines)
+    fields = ("commands", "status", "task_id")
+
+    def before() -> bytes:
+        # What the endpoint did before: encode the full model and dump it on every request
+        response = coordinator._task_response(task_id)
+        return json.dumps(jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def uncached(selected: Optional[Tuple[str, ...]]) -> Callable[[], bytes]:
+        def serialize() -> bytes:
+            coordinator._response_cache.clear()
+            return coordinator.get_task_bytes(task_id, fields=selected)[0]
+        return serialize
+
+    rows: List[Tuple[str, float, bytes]] = []
+    rows.append(("before: full model, encoded per request",) + cpu_microseconds(before, args.iterations))
+    rows.append(("full, serialized (cache miss)",) + cpu_microseconds(uncached(None), args.iterations))
+    rows.append(("full, cached bytes",) + cpu_microseconds(lambda: coordinator.get_task_bytes(task_id)[0], args.iterations))
+    rows.append(("fields=task_id,status,commands (cache miss)",) + cpu_microseconds(uncached(fields), args.iterations))
+
+    full_body = coordinator.get_task_bytes(task_id)[0]
+    projected_body = coordinator.get_task_bytes(task_id, fields=fields)[0]
+    for encoding in available_encodings():
+        rows.append((f"full, {encoding} (uncached)",) + cpu_microseconds(lambda: compress(full_body, encoding), args.iterations))
+        rows.append((f"fields=..., {encoding} (uncached)",) + cpu_microseconds(lambda: compress(projected_body, encoding), args.iterations))
+
+    print(f"Task response benchmark: {args.script_lines}-line script, {args.iterations} iterations per row")
+    print(f"(brotli {'available' if 'br' in available_encodings() else 'not installed; pip install brotli to compare'})\n")
+    print(f"{'bytes on wire':>14}  {'CPU us/resp':>12}  representation")
+    baseline = len(rows[0][2])
+    for name, cpu_us, body in rows:
+        print(f"{len(body):>14,}  {cpu_us:>12.1f}  {name}  ({len(body) / baseline:.1%} of before)")
+    print("\nCompressed bodies of finished tasks are cached per ETag, so repeat requests only pay the cached-bytes cost.")
+
+if __name__ == "__main__":
+    main()
@@ -43,7 +43,7 @@ async def capture_examples():
         print("\nExample 1: Investigate high CPU usage on server")
         task1 = "Investigate high CPU usage on server"
         task1_id = str(uuid.uuid4())
-        analysis1 = router.analyze_task(task1)
+        analysis1 = await router.analyze_task(task1)
         print("Analysis:", analysis1)
         
         # Execute diagnostic workflow
@@ -54,7 +54,7 @@ async def capture_examples():
         print("\nExample 2: Automate backup script")
         task2 = "Automate backup script for database"
         task2_id = str(uuid.uuid4())
-        analysis2 = router.analyze_task(task2)
+        analysis2 = await router.analyze_task(task2)
         print("Analysis:", analysis2)
         
         # Execute full workflow
@@ -65,7 +65,7 @@ async def capture_examples():
         print("\nExample 3: Draft incident report email")
         task3 = "Draft incident report email for recent outage"
         task3_id = str(uuid.uuid4())
-        analysis3 = router.analyze_task(task3)
+        analysis3 = await router.analyze_task(task3)
         print("Analysis:", analysis3)
         
         # Context pruning
@@ -0,0 +1,37 @@
+"""
+Compile the DSPy task analyzer with few-shot examples and save it to DSPY_PROGRAM_PATH.
+
+The API loads the saved program at startup instead of rebuilding it. Re-run this after
+changing the TaskAnalysis signature or the examples below.
+"""
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+import dspy
+from app.config import DSPY_PROGRAM_PATH
+from app.workflows.dspy_router import DSPyRouter
+
+EXAMPLES = [
+    ("Check the status of the backup job on fs01", "simple", ["diagnostic"]),
+    ("Why is the VPN slow for remote users?", "complex", ["diagnostic", "automation", "writer"]),
+    ("Generate a PowerShell script to collect perfmon logs and email the team", "complex", ["diagnostic", "automation", "writer"]),
+    ("Reboot the production SQL cluster tonight", "critical", ["diagnostic", "automation", "writer"]),
+    ("Users report Outlook keeps asking for a password", "complex", ["diagnostic", "automation", "writer"]),
+    ("Delete stale user accounts from Azure AD", "critical", ["diagnostic", "automation", "writer"]),
+]
+
+def main():
+    trainset = [
+        dspy.Example(task=task, task_type=task_type, required_agents=agents).with_inputs("task")
+        for task, task_type, agents in EXAMPLES
+    ]
+    router = DSPyRouter()
+    router.compile(trainset)
+    print(f"Saved compiled router to {DSPY_PROGRAM_PATH}")
+
+if __name__ == "__main__":
+    main()
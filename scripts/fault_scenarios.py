@@ -0,0 +1,213 @@
+"""
+Run the full pipeline offline under injected LLM faults and report how it copes.
+
+Usage:
+    python scripts/fault_scenarios.py [--tasks 10] [--seed 7] [--timeout 1.0] [--scenario NAME ...]
+                                      [--cassette cassettes/llm.jsonl]
+
+Each scenario sets the fault injector's probabilities (see app.utils.fault_injection) and
+sends the same tasks through the coordinator one at a time. The tasks run against a
+simulated provider that gives a valid answer for each agent's prompt. With --cassette they
+run against a recorded cassette instead (see LLM_CASSETTE_MODE).
+
+For each scenario the report shows:
+- task latency;
+- LLM calls, the agents' retries (including escalations to a stronger model) and the
+  calls their circuit breakers failed fast;
+- the faults injected;
+- the final statuses, with "degraded" counting completed tasks that carry a fallback result
+  (unparsed diagnosis, failed lint, missing script or email).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.append(project_root)
+
+SCENARIOS: Dict[str, Dict[str, float]] = {
+    "baseline": {},
+    "rate_limits": {"rate_limit": 0.2},
+    "server_errors": {"server_error": 0.2},
+    "timeouts": {"timeout": 0.1},
+    "truncated_json": {"truncated_json": 0.3},
+    "fenced_json": {"fenced_json": 0.5},
+    "slow_tokens": {"slow_tokens": 0.3},
+    "mixed": {"timeout": 0.03, "rate_limit": 0.05, "server_error": 0.05, "truncated_json": 0.1, "fenced_json": 0.2, "slow_tokens": 0.1},
+}
+
+TASKS = [
+    "Diagnose high CPU usage on vm-web-01, write a PowerShell script to fix it and draft an email to the team",
+    "Create an Azure CLI script to stop idle VMs and email a summary",
+    "Investigate why the web app is slow and notify the team by email",
+    "Analyze disk space alerts on the file server and write a cleanup script",
+    "Generate a script to list VMs",
+]
+
+DIAGNOSIS = {
+    "root_cause": "Antivirus full scan scheduled during business hours saturates the CPU",
+    "evidence": ["MsMpEng.exe at 95% CPU", "Scan schedule set to 10:00 daily"],
+    "solutions": [{"title": "Move the scan window off-peak", "confidence": "High"}]
+}
+SCRIPT = "az vm list -o table\naz vm run-command invoke -g rg-web -n vm-web-01 --command-id RunPowerShellScript --scripts \"Get-Process | Sort-Object CPU -Descending | Select-Object -First 5\""
+VERIFICATION = {
+    "syntax_check": True, "security_check": True, "lint_score": 9, "lint_issues": [],
+    "verification_steps": ["Run in a test subscription"], "expected_output": "Top CPU processes"
+}
+EMAIL = "Hello team,\n\nThe CPU incident on vm-web-01 was caused by a daytime antivirus scan. The scan now runs off-peak.\n\nRegards"
+PLAN = {"required_agents": ["diagnostic", "automation", "writer"], "steps": [], "summary": "Diagnose, remediate and notify"}
+
+class SimulatedProvider:
+    """Stands in for AsyncOpenAI: a valid answer for each agent's prompt after a short, seeded latency."""
+
+    def __init__(self, api_key: str = None, latency: float = 0.02):
+        self.latency = latency
+        self._random = random.Random(0)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model: str, messages: List[Dict[str, str]], n: int = 1, **kwargs: Any):
+        from app.utils.llm_cassette import RecordedResponse
+        system = messages[0]["content"]
+        if "diagnostician" in system:
+            content = json.dumps(DIAGNOSIS)
+        elif "script verifier" in system:
+            content = json.dumps(VERIFICATION)
+        elif "script writer" in system:
+            content = json.dumps({"script": SCRIPT})
+        elif "technical writer" in system:
+            content = json.dumps({"email": EMAIL})
+        else:
+            content = json.dumps(PLAN)
+        await asyncio.sleep(self.latency * self._random.uniform(0.5, 1.5))
+        tokens = len(content) // 4
+        return RecordedResponse({
+            "id": f"sim-{self._random.getrandbits(32):08x}",
+            "model": model,
+            "choices": [{"index": i, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"} for i in range(n)],
+            "usage": {"prompt_tokens": 200, "completion_tokens": tokens * n, "total_tokens": 200 + tokens * n}
+        })
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+def degraded(response) -> bool:
+    """Whether a completed task carries a fallback result instead of a real one."""
+    from app.agents.diagnostic import UNPARSED_ROOT_CAUSE
+    diagnosis = response.diagnosis or {}
+    script = response.script or {}
+    return (
+        diagnosis.get("root_cause") == UNPARSED_ROOT_CAUSE
+        or str(diagnosis.get("root_cause", "")).startswith("Error in diagnosis")
+        or not script.get("code")
+        or script.get("lint_passed") is False
+        or not response.email_draft
+    )
+
+def counter_total(counters: Dict[str, float], name: str) -> int:
+    """Sum of a counter over all its labels."""
+    return int(sum(value for key, value in counters.items() if key == name or key.startswith(name + "{")))
+
+async def run_scenario(name: str, rates: Dict[str, float], tasks: List[str], seed: int) -> Dict[str, Any]:
+    from app.coordinator import Coordinator
+    from app.utils.circuit_breaker import circuit_breakers
+    from app.utils.fault_injection import fault_injector
+    from app.utils.metrics import metrics
+
+    # Every scenario starts from closed circuits and the same seed
+    circuit_breakers.reset()
+    fault_injector.configure(rates, seed)
+    coordinator = Coordinator()
+    before = metrics.snapshot()["counters"]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    for task in tasks:
+        started = time.perf_counter()
+        response = await coordinator.execute_task(task, require_approval=False)
+        latencies.append(time.perf_counter() - started)
+        status = response.status
+        if status == "completed" and degraded(response):
+            status = "degraded"
+        statuses[status] += 1
+    injected = fault_injector.snapshot()
+    after = metrics.snapshot()["counters"]
+    return {
+        "name": name,
+        "tasks": len(tasks),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "max": max(latencies),
+        "llm_calls": injected["calls"],
+        "retries": counter_total(after, "agent_retries") - counter_total(before, "agent_retries"),
+        "fast_fails": counter_total(after, "circuit_rejections") - counter_total(before, "circuit_rejections"),
+        "injected": injected["injected"],
+        "statuses": statuses
+    }
+
+async def run(args) -> None:
+    from app.utils.bulkhead import bulkheads
+    from app.utils.model_routing import model_routing
+    # Short LLM timeouts, so injected timeouts cost seconds rather than the production budget
+    for settings in model_routing.table.values():
+        settings["timeout"] = args.timeout
+    # Lift the agents' LLM rate budgets, so latency reflects the faults rather than the budget
+    for agent in bulkheads.snapshot():
+        bulkheads.configure(agent, rate=1000.0, burst=1000.0)
+
+    tasks = [TASKS[i % len(TASKS)] for i in range(args.tasks)]
+    names = args.scenario or list(SCENARIOS)
+    if "baseline" not in names:
+        names = ["baseline"] + names
+    # One untimed task first, so the first scenario does not pay for loading the agents
+    await run_scenario("warm-up", {}, tasks[:1], args.seed)
+    results = []
+    for name in names:
+        print(f"Running {name} ...", file=sys.stderr)
+        results.append(await run_scenario(name, SCENARIOS[name], tasks, args.seed))
+
+    print(f"\nFault scenarios: {args.tasks} tasks each, seed {args.seed}, LLM timeout {args.timeout}s")
+    print("(retries = agent retries and escalations; fast-fails = calls refused by an open circuit;")
+    print(" degraded = completed with a fallback result)\n")
+    print(f"{'scenario':<15} {'p50 s':>7} {'p95 s':>7} {'max s':>7} {'calls':>6} {'retries':>8} {'fast-fails':>10}  {'statuses':<40} faults injected")
+    for result in results:
+        statuses = ", ".join(f"{status} {count}" for status, count in result["statuses"].most_common())
+        injected = ", ".join(f"{fault} {count}" for fault, count in sorted(result["injected"].items())) or "-"
+        print(
+            f"{result['name']:<15} {result['p50']:>7.2f} {result['p95']:>7.2f} {result['max']:>7.2f} "
+            f"{result['llm_calls']:>6} {result['retries']:>8} {result['fast_fails']:>10}  {statuses:<40} {injected}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=10, help="Tasks per scenario")
+    parser.add_argument("--seed", type=int, default=7, help="Fault injector seed")
+    parser.add_argument("--timeout", type=float, default=1.0, help="LLM call timeout in seconds")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--cassette", help="Replay this recorded cassette instead of the simulated provider")
+    args = parser.parse_args()
+
+    # Configuration is read when the app is imported, so set it up first
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fault-scenarios")
+    os.environ["LLM_FAULT_INJECTION"] = "true"
+    # The DSPy router's LLM calls do not go through the client layer; route by keyword
+    os.environ["ROUTER_LLM_ENABLED"] = "false"
+    if args.cassette:
+        os.environ["LLM_CASSETTE_MODE"] = "replay"
+        os.environ["LLM_CASSETTE_PATH"] = args.cassette
+        os.environ.setdefault("LLM_CASSETTE_LATENCY_SCALE", "1")
+        asyncio.run(run(args))
+        return
+    with patch("openai.AsyncOpenAI", SimulatedProvider):
+        asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -41,9 +41,13 @@ def run_examples():
     # Wait for completion
     task_id_a = response_a.json()["task_id"]
     max_retries = 5
+    last_status = None
     for i in range(max_retries):
-        status = client.get(f"/api/v1/tasks/{task_id_a}")
+        # Long-poll: the server holds the request until the status changes
+        params = {"wait": 30, "since_status": last_status} if last_status else {}
+        status = client.get(f"/api/v1/tasks/{task_id_a}", params=params)
         status_data = status.json()
+        last_status = status_data.get("status")
         if status_data.get("status") == "completed":
             print("\nFinal Status:")
             print_json(status_data)
@@ -52,7 +56,6 @@ def run_examples():
             print("\nTask Failed:")
             print_json(status_data)
             break
-        time.sleep(1)
     
     # Example B: Approval Flow
     print_section("Example B: Approval Flow")
@@ -76,9 +79,13 @@ def run_examples():
     
     # Wait for completion
     max_retries = 5
+    last_status = None
     for i in range(max_retries):
-        status = client.get(f"/api/v1/tasks/{task_id_b}")
+        # Long-poll: the server holds the request until the status changes
+        params = {"wait": 30, "since_status": last_status} if last_status else {}
+        status = client.get(f"/api/v1/tasks/{task_id_b}", params=params)
         status_data = status.json()
+        last_status = status_data.get("status")
         if status_data.get("status") == "completed":
             print("\nFinal Status:")
             print_json(status_data)
@@ -87,7 +94,6 @@ def run_examples():
             print("\nTask Failed:")
             print_json(status_data)
             break
-        time.sleep(1)
 
 if __name__ == "__main__":
     run_examples() 
\ No newline at end of file
@@ -6,7 +6,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         "fastapi",
-        "uvicorn",
+        "uvicorn[standard]",
         "pydantic",
         "python-dotenv",
         "openai",
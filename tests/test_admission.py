@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from app.utils.admission import AdmissionController, AdmissionRejected, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def _controller(**overrides):
+    settings = dict(
+        global_rate=100, global_burst=100, client_rate=100, client_burst=100,
+        max_concurrent=1, max_queue=1, queue_timeout=1.0
+    )
+    settings.update(overrides)
+    return AdmissionController(**settings)
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.try_acquire() == 0
+
+def test_client_rate_limit_is_per_client():
+    """One client exhausting its burst gets 429 while others are still admitted."""
+    controller = _controller(client_rate=0.1, client_burst=2)
+    controller.check_rate("a")
+    controller.check_rate("a")
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.check_rate("a")
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+    controller.check_rate("b")
+
+@pytest.mark.asyncio
+async def test_overflow_is_rejected_fast_with_503():
+    """With the slot taken and the queue full, the next request fails immediately."""
+    controller = _controller(max_concurrent=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.admit("a"):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    queued = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert controller.stats()["in_flight"] == 1
+    assert controller.stats()["queued"] == 1
+    assert controller.stats()["saturated"]
+    with pytest.raises(AdmissionRejected) as exc:
+        async with controller.admit("c"):
+            pass
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+    release.set()
+    await asyncio.gather(holder, queued)
+    assert controller.stats()["in_flight"] == 0
@@ -0,0 +1,65 @@
+import json
+import pytest
+from unittest.mock import patch
+from app.coordinator import Coordinator
+from app.utils.artifacts import ArtifactStore
+
+SCRIPT = "Get-AzVM -Status |\n    Where-Object { $_.PowerState -eq 'VM running' }\n" * 50
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    digest = store.put(SCRIPT)
+    assert store.put(SCRIPT.encode("utf-8")) == digest
+    assert store.stats()["in_memory"] == 1
+    # Large, repetitive content is kept compressed
+    assert store.memory_bytes < len(SCRIPT) / 4
+    assert store.get_text(digest) == SCRIPT
+    assert store.get("0" * 64) is None
+    assert store.get("../etc/passwd") is None
+
+def test_least_recently_used_spill_to_disk_and_read_back(tmp_path):
+    store = ArtifactStore(str(tmp_path), max_memory_bytes=100, compress_min_bytes=10_000)
+    first = store.put("a" * 80)
+    second = store.put("b" * 80)
+    assert store.spilled == 1
+    assert store.stats()["in_memory"] == 1
+    # Reading it back makes it recent again, so the other one spills
+    assert store.get_text(first) == "a" * 80
+    assert store.spilled == 2
+    assert store.get_text(second) == "b" * 80
+
+@pytest.mark.asyncio
+async def test_task_records_reference_artifacts_by_digest():
+    coordinator = Coordinator()
+    results = {
+        "script": {"language": "powershell", "code": SCRIPT, "lint_passed": True},
+        "email_draft": "VMs listed.",
+        "commands": ["Get-AzVM -Status | Where-Object { $_.PowerState -eq 'VM running' }"] * 50
+    }
+
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        return {"status": "completed", "analysis": analysis, "errors": [], "results": results}
+
+    with patch.object(coordinator.coordinator_graph, "execute", side_effect=fake_execute):
+        first = await coordinator.execute_task("Generate a script to list VMs")
+        second = await coordinator.execute_task("Generate a script to list running VMs")
+
+    assert first.script["code"] == SCRIPT
+    assert first.commands == results["commands"]
+    assert first.artifacts == second.artifacts
+    stored = coordinator.tasks[first.task_id]["result"]
+    assert "code" not in stored["script"]
+    assert "email_draft" not in stored and "commands" not in stored
+
+    full = json.loads(coordinator.get_task_bytes(first.task_id)[0])
+    assert full["email_draft"] == "VMs listed."
+    body, etag = coordinator.get_task_bytes(first.task_id, inline_artifacts=False)
+    by_reference = json.loads(body)
+    assert "code" not in by_reference["script"]
+    assert by_reference["email_draft"] is None
+    assert by_reference["artifacts"]["script"] == full["artifacts"]["script"]
+    # Commands are not an artifact: they are rebuilt from the script in every representation
+    assert by_reference["commands"] == full["commands"] == results["commands"]
+    projected = json.loads(coordinator.get_task_bytes(first.task_id, inline_artifacts=False, fields=("commands", "status", "task_id"))[0])
+    assert projected["commands"] == results["commands"]
+    assert etag != coordinator.task_etag(first.task_id)
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.utils.bulkhead import Bulkhead, BulkheadFull, BulkheadRegistry
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_queues_then_rejects():
+    bulkhead = Bulkhead("automation", max_concurrent=1, rate=100, burst=100, max_queue=1, queue_timeout=0.05)
+    release = asyncio.Event()
+
+    async def hold():
+        async with bulkhead.acquire():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert bulkhead.snapshot()["saturation"] == 1.0
+    with pytest.raises(BulkheadFull) as exc:
+        async with bulkhead.acquire():
+            pass
+    assert exc.value.reason == "queue_full"
+    with pytest.raises(BulkheadFull):
+        await queued
+    release.set()
+    await holder
+    assert (bulkhead.running, bulkhead.queued) == (0, 0)
+
+@pytest.mark.asyncio
+async def test_raising_the_limit_at_runtime_starts_queued_calls():
+    bulkhead = Bulkhead("writer", max_concurrent=1, rate=100, burst=100, max_queue=4, queue_timeout=1.0)
+    release = asyncio.Event()
+    started = []
+
+    async def hold(i):
+        async with bulkhead.acquire():
+            started.append(i)
+            await release.wait()
+
+    tasks = [asyncio.create_task(hold(i)) for i in range(3)]
+    await asyncio.sleep(0.01)
+    assert started == [0]
+    bulkhead.configure(max_concurrent=3)
+    await asyncio.sleep(0.01)
+    assert sorted(started) == [0, 1, 2]
+    release.set()
+    await asyncio.gather(*tasks)
+
+@pytest.mark.asyncio
+async def test_pools_are_independent():
+    registry = BulkheadRegistry({
+        "automation": {"max_concurrent": 1, "max_queue": 0, "queue_timeout": 1.0},
+        "diagnostic": {"max_concurrent": 1, "max_queue": 0, "queue_timeout": 1.0}
+    })
+    assert registry.for_call_site("automation.verify") is registry.get("automation")
+    assert registry.for_call_site("context_pruner") is None
+    async with registry.get("automation").acquire():
+        # A saturated automation pool does not hold up diagnosis
+        async with registry.for_call_site("diagnostic.sample").acquire():
+            pass
+    with pytest.raises(KeyError):
+        registry.configure("unknown", max_concurrent=2)
+
+@pytest.mark.asyncio
+async def test_rate_budget_delays_calls():
+    bulkhead = Bulkhead("router", max_concurrent=4, rate=20, burst=1, max_queue=4, queue_timeout=1.0)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(3):
+        async with bulkhead.acquire():
+            pass
+    assert loop.time() - start >= 0.09
+
+def test_changing_limits_requires_the_admin_token():
+    from app.main import app, bulkheads
+    client = TestClient(app)
+    before = bulkheads.get("writer").settings()
+    assert client.put("/api/v1/bulkheads/writer", json={"max_concurrent": 1}).status_code == 403
+    assert client.put("/api/v1/bulkheads/writer", json={"max_concurrent": 1}, headers={"X-Admin-Token": "guess"}).status_code == 403
+    assert bulkheads.get("writer").settings() == before
+    with patch("app.main.ADMIN_TOKEN", "secret"):
+        response = client.put("/api/v1/bulkheads/writer", json={"max_concurrent": before["max_concurrent"]}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
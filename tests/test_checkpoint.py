@@ -0,0 +1,86 @@
+import time
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+from app.coordinator import Coordinator
+from app.agents.diagnostic import DiagnosticAgent
+from app.agents.automation import AutomationAgent
+from app.agents.writer import WriterAgent
+from app.utils.task_store import TaskStore
+from app.workflows.coordinator_graph import checkpoint_state, resume_point
+
+def test_resume_point_skips_completed_stages():
+    assert resume_point({}) == "analyze_task"
+    assert resume_point({"completed_stages": ["analyze_task", "execute_diagnostic"]}) == "execute_automation"
+
+def test_checkpoint_keeps_only_resumable_state():
+    state = {"task": "t", "task_id": "1", "diagnosis": {"root_cause": "x"}, "script": None, "completed_stages": ["analyze_task"]}
+    assert checkpoint_state(state) == {"diagnosis": {"root_cause": "x"}, "completed_stages": ["analyze_task"]}
+
+def test_task_store_round_trip(tmp_path):
+    store = TaskStore(str(tmp_path))
+    store.save("abc-123", {"task_id": "abc-123", "status": "in_progress"})
+    (tmp_path / "broken.json").write_text("{not json")
+    assert TaskStore(str(tmp_path)).load_all() == {"abc-123": {"task_id": "abc-123", "status": "in_progress"}}
+    store.delete("abc-123")
+    assert store.load_all() == {}
+    with pytest.raises(ValueError):
+        store.save("../escape", {})
+
+@pytest.mark.asyncio
+async def test_task_store_writes_behind_the_event_loop(tmp_path):
+    """Queued writes land in order, keeping only the latest version of each task."""
+    store = TaskStore(str(tmp_path))
+    for version in range(1, 4):
+        store.save_later("abc-123", {"task_id": "abc-123", "version": version})
+    store.save_later("gone-1", {"task_id": "gone-1"})
+    store.delete_later("gone-1")
+    assert len(store._pending) == 2
+    await store.flush()
+    assert store.load_all() == {"abc-123": {"task_id": "abc-123", "version": 3}}
+
+@pytest.mark.asyncio
+async def test_interrupted_task_resumes_after_checkpoint(tmp_path):
+    """A restarted run continues at the first unfinished node without calling finished agents again."""
+    checkpoint = {
+        "analysis": {"required_agents": ["diagnostic", "automation"], "task_type": "complex"},
+        "diagnosis": {"root_cause": "Disk full", "evidence": [], "solutions": []},
+        "errors": [],
+        "completed_stages": ["analyze_task", "execute_diagnostic"]
+    }
+    TaskStore(str(tmp_path)).save("resume-1", {
+        "task_id": "resume-1",
+        "task": "Diagnose the disk alert and generate a script to clean temp files",
+        "status": "in_progress",
+        "start_time": time.time(),
+        "analysis": checkpoint["analysis"],
+        "version": 3,
+        "checkpoint": checkpoint
+    })
+    script = {"language": "bash", "code": "rm -rf /tmp/*", "description": "Clean temp files"}
+    admitted = []
+
+    @asynccontextmanager
+    async def admit(task_id):
+        admitted.append(task_id)
+        yield
+
+    with patch("app.coordinator.TASK_STORE_DIR", str(tmp_path)), \
+            patch.object(DiagnosticAgent, "execute", new_callable=AsyncMock) as mock_diagnostic, \
+            patch.object(AutomationAgent, "execute", new_callable=AsyncMock) as mock_automation, \
+            patch.object(WriterAgent, "execute", new_callable=AsyncMock):
+        mock_automation.return_value = {"status": "success", "script": script}
+        coordinator = Coordinator()
+        assert await coordinator.resume_tasks(admit) == 1
+        record = await coordinator.wait_for_task("resume-1", timeout=10, since_status="in_progress")
+        await coordinator.store.flush()
+    # The resumed run took an execution slot like any other
+    assert admitted == ["resume-1"]
+    mock_diagnostic.assert_not_awaited()
+    mock_automation.assert_awaited_once()
+    assert record["status"] == "completed"
+    assert record["result"]["diagnosis"]["root_cause"] == "Disk full"
+    assert record["completed_stages"][:2] == ["analyze_task", "execute_diagnostic"]
+    assert record["checkpoint"] is None
+    # The finished record was persisted too
+    assert TaskStore(str(tmp_path)).load_all()["resume-1"]["status"] == "completed"
@@ -0,0 +1,59 @@
+import pytest
+from app.utils.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def _breaker(clock, **overrides):
+    settings = dict(window=10, min_calls=4, error_threshold=0.5, slow_call_seconds=5.0,
+                    slow_call_threshold=0.8, open_seconds=30.0, half_open_probes=2, clock=clock)
+    settings.update(overrides)
+    return CircuitBreaker("gpt-test", **settings)
+
+def test_opens_on_error_rate_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(2):
+        breaker.record_success(0.5)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 30.0
+    assert breaker.state == "half_open"
+    # Only the configured number of probes get through
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success(0.5)
+    breaker.record_success(0.5)
+    assert breaker.state == "closed"
+
+def test_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = _breaker(clock, min_calls=1)
+    breaker.record_failure()
+    clock.now = 30.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.retry_after() == pytest.approx(30.0)
+
+def test_opens_on_slow_calls():
+    breaker = _breaker(FakeClock())
+    for _ in range(4):
+        breaker.record_success(6.0)
+    assert breaker.state == "open"
+
+def test_registry_falls_back_then_fails_fast():
+    clock = FakeClock()
+    registry = CircuitBreakerRegistry(min_calls=1, open_seconds=30.0, clock=clock)
+    registry.get("primary").record_failure()
+    assert registry.acquire("primary", fallback_model="backup") == "backup"
+    with pytest.raises(CircuitOpenError):
+        registry.acquire("primary")
+    assert registry.snapshot()["primary"]["state"] == "open"
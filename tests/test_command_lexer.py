@@ -0,0 +1,55 @@
+from app.utils.command_lexer import CommandLexer, lex_script
+
+POWERSHELL = '''# Stop idle VMs
+$vms = Get-AzVM -Status |
+    Where-Object { $_.Tags["idle"] -eq "true" }
+foreach ($vm in $vms) {
+    Stop-AzVM -Name $vm.Name `
+        -ResourceGroupName $vm.ResourceGroupName -Force
+}
+$report = @"
+Stopped VMs; see "portal"
+"@
+az vm list --resource-group rg1 \\
+    --query "[].name" -o tsv; Write-Host 'it''s done'
+'''
+
+def test_powershell_continuations_pipelines_and_here_strings():
+    commands = lex_script(POWERSHELL)
+    assert [command["verb"] for command in commands] == ["Get-AzVM", "Stop-AzVM", "$report", "az", "Write-Host"]
+    pipeline = commands[0]
+    assert pipeline["pipeline"] == ["Get-AzVM", "Where-Object"]
+    assert pipeline["line"] == 2
+    assert commands[1]["text"] == "Stop-AzVM -Name $vm.Name -ResourceGroupName $vm.ResourceGroupName -Force"
+    assert commands[1]["args"][-1] == "-Force"
+    assert 'see "portal"' in commands[2]["text"]
+    assert commands[3]["text"] == 'az vm list --resource-group rg1 --query "[].name" -o tsv'
+    assert commands[4]["args"] == ["'it''s done'"]
+    start, end = commands[3]["span"]
+    assert POWERSHELL[start:end].startswith("az vm list") and POWERSHELL[start:end].endswith("tsv")
+
+def test_bash_blocks_and_escapes():
+    script = '''for vm in $(az vm list --query "[].name" -o tsv); do
+  az vm stop --name "$vm" \\
+     --resource-group "${RG}" && echo "stopped \\"$vm\\""
+done
+if [ -f marker ]; then rm marker; fi
+'''
+    commands = lex_script(script, "bash")
+    assert [command["text"] for command in commands] == [
+        'az vm stop --name "$vm" --resource-group "${RG}" && echo "stopped \\"$vm\\""',
+        "rm marker"
+    ]
+
+def test_parse_is_cached_by_script_hash():
+    lexer = CommandLexer(cache_size=1)
+    first = lexer.lex(POWERSHELL, "powershell")
+    assert lexer.lex(POWERSHELL, "powershell") is first
+    # Same code in another dialect is a different parse
+    assert lexer.lex(POWERSHELL, "bash") is not first
+    assert lexer.lex(POWERSHELL, "powershell") is not first
+    assert lexer.command_texts("") == []
+
+def test_multi_line_script_block_keeps_its_line_breaks():
+    texts = CommandLexer().command_texts("Get-AzVM | ForEach-Object {\n    $_.Name\n}\n")
+    assert texts == ["Get-AzVM | ForEach-Object {\n    $_.Name\n}"]
@@ -0,0 +1,42 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.agents.writer import WriterAgent
+from app.utils.context_builder import ContextBuilder
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+DIAGNOSIS = {
+    "root_cause": "Disk full on vm-web-01",
+    "evidence": ["/var at 100%", "Log rotation disabled"],
+    "solutions": [{"title": "Clean temp files", "confidence": "High"}]
+}
+
+def test_truncate_to_tokens_fits_budget():
+    text = "word " * 1000
+    truncated = truncate_to_tokens(text, 50)
+    assert count_tokens(truncated) <= 50
+    assert truncated.endswith("[truncated]")
+    assert truncate_to_tokens("short", 50) == "short"
+
+def test_small_sections_stay_whole_and_large_ones_are_cut():
+    huge_script = "\n".join(f"Remove-Item C:\\temp\\file{i}.log" for i in range(5000))
+    context = ContextBuilder(300).add("Diagnosis", "Root Cause: Disk full").add("Script", huge_script).build()
+    assert count_tokens(context) <= 300
+    assert "Root Cause: Disk full" in context
+    assert "Remove-Item C:\\temp\\file0.log" in context
+    assert "file4999" not in context
+
+@pytest.mark.asyncio
+async def test_writer_prompt_includes_diagnosis_and_script_within_budget():
+    script = {"language": "powershell", "code": "Remove-Item C:\\temp\\*\n" * 20000, "lint_passed": True}
+    writer = WriterAgent()
+    with patch.object(writer.client, "create_chat_completion", new_callable=AsyncMock) as mock_llm, \
+            patch("app.agents.writer.WRITER_CONTEXT_TOKENS", 400):
+        mock_llm.return_value = {"choices": [{"message": {"content": json.dumps({"email": "Disk cleaned."})}}]}
+        result = await writer.execute({"task": "Email the team about the disk alert", "diagnosis": DIAGNOSIS, "script": script})
+    assert result["status"] == "success"
+    prompt = mock_llm.call_args.kwargs["messages"][1]["content"]
+    assert "Disk full on vm-web-01" in prompt
+    assert "Clean temp files (Confidence: High)" in prompt
+    assert "Script Validation: Passed" in prompt
+    assert count_tokens(prompt) < 500
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.coordinator import Coordinator
+from app.agents.diagnostic import DiagnosticAgent
+from app.agents.automation import AutomationAgent
+from app.agents.writer import WriterAgent
+from app.agents.registry import get_agent
+from app.utils.deadline import DeadlineExceeded, call_timeout, deadline_scope, remaining
+
+def test_nested_scope_only_tightens():
+    """An inner scope cannot extend the budget of the outer one."""
+    with deadline_scope(0.5):
+        with deadline_scope(60):
+            assert remaining() <= 0.5
+        assert call_timeout(30) <= 0.5
+    assert remaining() is None
+    assert call_timeout(30) == 30
+
+def test_call_timeout_raises_when_budget_spent():
+    with deadline_scope(0):
+        with pytest.raises(DeadlineExceeded):
+            call_timeout(30)
+
+@pytest.mark.asyncio
+async def test_deadline_returns_partial_result():
+    """A slow stage is cancelled at the deadline and finished stages are returned."""
+    async def slow_automation(task):
+        await asyncio.sleep(5)
+        return {"status": "success"}
+
+    diagnosis = {"diagnosis": {"root_cause": "Disk full", "evidence": [], "solutions": []}, "status": "success"}
+    with patch.object(DiagnosticAgent, "execute", new_callable=AsyncMock) as mock_diagnostic, \
+            patch.object(AutomationAgent, "execute", side_effect=slow_automation), \
+            patch.object(WriterAgent, "execute", new_callable=AsyncMock) as mock_writer:
+        mock_diagnostic.return_value = diagnosis
+        coordinator = Coordinator()
+        # Build the graph and agents up front so their one-off import cost is not billed to the deadline
+        coordinator.coordinator_graph.graph
+        for agent in ("diagnostic", "automation", "writer"):
+            get_agent(agent)
+        response = await coordinator.execute_task(
+            "Diagnose the disk alert and generate a script to clean temp files",
+            deadline_seconds=0.5
+        )
+    assert response.status == "partial"
+    assert response.diagnosis["root_cause"] == "Disk full"
+    assert "execute_diagnostic" in response.completed_stages
+    assert "execute_automation" not in response.completed_stages
+    assert response.duration_seconds < 2
+    mock_writer.assert_not_awaited()
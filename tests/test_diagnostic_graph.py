@@ -0,0 +1,62 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.agents.diagnostic import DiagnosticAgent, UNPARSED_ROOT_CAUSE
+from app.workflows.diagnostic_graph import DiagnosticGraph, solution_confidence, vote_diagnoses
+
+def _diagnosis(root_cause, confidence="High"):
+    return {
+        "root_cause": root_cause,
+        "evidence": [],
+        "solutions": [{"title": "Fix it", "confidence": confidence}]
+    }
+
+def test_solution_confidence_reads_dicts():
+    """Confidence comes from dict keys, whether stated as a level, a fraction or a percentage."""
+    assert solution_confidence({"confidence": "High"}) == 0.9
+    assert solution_confidence({"confidence": 0.42}) == 0.42
+    assert solution_confidence({"confidence": "80%"}) == 0.8
+    assert solution_confidence({"title": "no confidence"}) == 0.0
+
+def test_vote_prefers_majority_root_cause():
+    """The root cause most samples agree on wins, even against a more confident outlier."""
+    outcome = vote_diagnoses([
+        _diagnosis("Runaway antivirus scan saturating CPU", "Medium"),
+        _diagnosis("Antivirus scan saturating the CPU", "Medium"),
+        _diagnosis("Faulty memory module", "High"),
+    ])
+    assert "antivirus" in outcome["diagnosis"]["root_cause"].lower()
+    assert outcome["votes"] == 2
+    assert 0 < outcome["confidence"] < 1
+
+def test_unparseable_samples_do_not_vote():
+    """Parse failures cannot outvote a real diagnosis, nor count towards agreement."""
+    unparsed = {"root_cause": UNPARSED_ROOT_CAUSE, "evidence": [], "solutions": []}
+    outcome = vote_diagnoses([unparsed, dict(unparsed), _diagnosis("Disk full on the data volume", "Medium")])
+    assert outcome["diagnosis"]["root_cause"] == "Disk full on the data volume"
+    assert outcome["votes"] == 1
+    assert outcome["confidence"] == 0.8
+    assert vote_diagnoses([dict(unparsed) for _ in range(3)]) == {"diagnosis": None, "confidence": 0.0, "votes": 0}
+
+@pytest.mark.asyncio
+async def test_graph_exits_after_one_confident_round():
+    """A unanimous, confident first round finalizes without another LLM request."""
+    sample = {"candidates": [_diagnosis("Disk full on C:")] * 3, "tokens": 600}
+    with patch.object(DiagnosticAgent, "sample_diagnoses", new_callable=AsyncMock) as mock_sample:
+        mock_sample.return_value = sample
+        state = await DiagnosticGraph(confidence_threshold=0.8).execute("Server out of space", "t1")
+    assert mock_sample.await_count == 1
+    assert state["current_stage"] == "finalize_diagnosis"
+    assert state["diagnosis"]["root_cause"] == "Disk full on C:"
+    assert state["tokens_used"] == 600
+
+@pytest.mark.asyncio
+async def test_graph_stops_at_token_budget():
+    """Low-confidence rounds stop sampling once the token budget cannot fit another round."""
+    sample = {"candidates": [_diagnosis("Network issue", "Low"), _diagnosis("Bad driver", "Low")], "tokens": 1000}
+    with patch.object(DiagnosticAgent, "sample_diagnoses", new_callable=AsyncMock) as mock_sample:
+        mock_sample.return_value = sample
+        graph = DiagnosticGraph(max_rounds=5, max_tokens=1500, samples_per_round=2, tokens_per_sample=500)
+        state = await graph.execute("Intermittent outages", "t2")
+    assert mock_sample.await_count == 1
+    assert state["confidence"] < graph.confidence_threshold
+    assert state["diagnosis"] is not None
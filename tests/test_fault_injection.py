@@ -0,0 +1,69 @@
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from app.agents.diagnostic import DiagnosticAgent
+from app.utils.fault_injection import FaultInjector, FaultInjectingClient, FAILURES
+from app.utils.llm_cassette import RecordedResponse
+from app.utils.metrics import metrics
+from app.utils.openai_client import OpenAIProjectClient
+
+CONTENT = json.dumps({"root_cause": "Disk full", "evidence": [], "solutions": []})
+
+def provider():
+    async def create(**request):
+        return RecordedResponse({"choices": [{"message": {"role": "assistant", "content": CONTENT}}], "usage": {"completion_tokens": 5}})
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+def client_with(injector: FaultInjector) -> OpenAIProjectClient:
+    client = OpenAIProjectClient(cassette_mode="replay")
+    client.client = FaultInjectingClient(provider(), injector)
+    return client
+
+async def ask(client: OpenAIProjectClient, timeout: float = 5.0) -> str:
+    # A model of its own, so circuit breaker state left by other tests does not apply
+    response = await client.create_chat_completion(
+        messages=[{"role": "user", "content": "diagnose"}], model="fault-test-model", call_site="default", timeout=timeout
+    )
+    return response["choices"][0]["message"]["content"]
+
+def test_same_seed_gives_the_same_faults():
+    rates = {"rate_limit": 0.2, "server_error": 0.2, "fenced_json": 0.3, "slow_tokens": 0.3}
+    first, second = FaultInjector(rates, seed=3), FaultInjector(rates, seed=3)
+    draws = [first.draw() for _ in range(200)]
+    assert draws == [second.draw() for _ in range(200)]
+    # A failed call is never also distorted
+    assert all(len(faults) == 1 for faults in draws if set(faults) & set(FAILURES))
+    assert 20 < first.injected["rate_limit"] < 60
+    assert first.snapshot()["calls"] == 200
+
+    with pytest.raises(ValueError):
+        FaultInjector({"gremlins": 1.0})
+
+@pytest.mark.asyncio
+async def test_distortions_rewrite_the_completion():
+    client = client_with(FaultInjector({"fenced_json": 1.0}))
+    assert await ask(client) == f"```json\n{CONTENT}\n```"
+
+    client = client_with(FaultInjector({"truncated_json": 1.0, "slow_tokens": 1.0}, token_delay=0.001))
+    assert await ask(client) == CONTENT[:len(CONTENT) // 2]
+
+@pytest.mark.asyncio
+async def test_failures_surface_as_provider_errors():
+    with pytest.raises(Exception, match="Rate limit reached"):
+        await ask(client_with(FaultInjector({"rate_limit": 1.0})))
+    with pytest.raises(Exception, match="server had an error"):
+        await ask(client_with(FaultInjector({"server_error": 1.0})))
+    # An injected timeout hangs until the client's own timeout gives up on it
+    with pytest.raises(Exception, match="timed out after 0.1s"):
+        await ask(client_with(FaultInjector({"timeout": 1.0})), timeout=0.1)
+
+@pytest.mark.asyncio
+async def test_escalations_are_counted_as_retries():
+    agent = DiagnosticAgent()
+    truncated = {"choices": [{"message": {"role": "assistant", "content": CONTENT[:10]}}]}
+    before = metrics.counter("agent_retries", agent="diagnostic", reason="escalation")
+    with patch.object(agent.client, "create_chat_completion", new=AsyncMock(return_value=truncated)) as create:
+        await agent.execute({"task": "diagnose"})
+    assert create.await_count == 2
+    assert metrics.counter("agent_retries", agent="diagnostic", reason="escalation") == before + 1
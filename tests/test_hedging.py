@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from app.utils.hedging import HedgePolicy, hedged_call
+
+def _slow_then_fast():
+    """Call factory whose first call hangs and later calls answer quickly."""
+    calls = {"started": 0, "cancelled": 0}
+
+    async def make_call():
+        calls["started"] += 1
+        attempt = calls["started"]
+        try:
+            await asyncio.sleep(10 if attempt == 1 else 0.01)
+        except asyncio.CancelledError:
+            calls["cancelled"] += 1
+            raise
+        return f"reply-{attempt}"
+    return make_call, calls
+
+def test_delay_needs_history():
+    policy = HedgePolicy(pct=90, min_samples=5)
+    assert policy.delay([1.0] * 4) is None
+    assert policy.delay([0.1 * i for i in range(1, 11)]) == pytest.approx(0.9)
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_slow_call_is_cancelled():
+    policy = HedgePolicy(max_rate=1.0)
+    make_call, calls = _slow_then_fast()
+    result, hedged = await hedged_call(make_call, 0.02, policy)
+    await asyncio.sleep(0)
+    assert (result, hedged) == ("reply-2", True)
+    assert calls == {"started": 2, "cancelled": 1}
+
+@pytest.mark.asyncio
+async def test_hedge_rate_is_capped():
+    policy = HedgePolicy(max_rate=0.5, window=4)
+    for _ in range(3):
+        policy.record_call(False)
+    policy.record_call(True)
+    make_call, calls = _slow_then_fast()
+    # A second hedge in the last 4 calls is within 50%, a third is not
+    assert policy.hedge_allowed()
+    policy.record_call(True)
+    assert not policy.hedge_allowed()
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(hedged_call(make_call, 0.01, policy), timeout=0.05)
+    assert calls["started"] == 1
+
+@pytest.mark.asyncio
+async def test_error_only_when_both_attempts_fail():
+    policy = HedgePolicy(max_rate=1.0)
+    attempts = 0
+
+    async def make_call():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.03 if attempts == 1 else 0.01)
+        raise RuntimeError(f"failure {attempts}")
+
+    with pytest.raises(RuntimeError):
+        await hedged_call(make_call, 0.01, policy)
+    assert attempts == 2
@@ -0,0 +1,71 @@
+import asyncio
+import dspy
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.workflows.dspy_router import DSPyRouter
+from app.workflows.hybrid_router import HybridRouter
+
+def _router_with_llm(llm_analysis):
+    router = HybridRouter(min_margin=1, llm_enabled=True)
+    router._llm_router = MagicMock()
+    router._llm_router.analyze_task = AsyncMock(return_value=llm_analysis)
+    return router
+
+@pytest.mark.asyncio
+async def test_confident_request_skips_llm():
+    """A clear keyword winner is routed without calling the LLM analyzer."""
+    router = _router_with_llm({})
+    analysis = await router.analyze_task("Diagnose and generate a script to monitor disk usage")
+    assert analysis["router"] == "keyword"
+    assert analysis["required_agents"] == ["diagnostic", "automation", "writer"]
+    router._llm_router.analyze_task.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_ambiguous_request_uses_llm_without_lowering_approval():
+    """Requests with no keyword lead go to the LLM, but keyword approval rules still apply."""
+    router = _router_with_llm({
+        "task_type": "complex",
+        "required_agents": ["diagnostic", "writer"],
+        "risk_level": "medium",
+        "complexity": "high",
+        "requires_approval": False
+    })
+    analysis = await router.analyze_task("Lock the shared mailbox")
+    assert analysis["router"] == "dspy"
+    assert analysis["required_agents"] == ["diagnostic", "writer"]
+    assert analysis["requires_approval"] is True
+
+@pytest.mark.asyncio
+async def test_llm_failure_falls_back_to_keywords():
+    """An unavailable analyzer falls back to recognised graph agent names."""
+    router = HybridRouter(min_margin=1, llm_enabled=True)
+    router._llm_router = MagicMock()
+    router._llm_router.analyze_task = AsyncMock(side_effect=RuntimeError("provider down"))
+    analysis = await router.analyze_task("Printer on floor 3")
+    assert analysis["router"] == "keyword"
+    assert analysis["required_agents"] == ["diagnostic"]
+
+@pytest.mark.asyncio
+async def test_analyzer_keyword_fallback_is_labelled_keyword():
+    """An analyzer that caught its own failure and used keyword routing is not labelled dspy."""
+    # Built off the thread that first configured dspy, as a lazily created router may be
+    llm_router = await asyncio.to_thread(DSPyRouter, program_path=None)
+    llm_router.analyzer = MagicMock(side_effect=RuntimeError("provider down"))
+    router = HybridRouter(min_margin=1, llm_enabled=True)
+    router._llm_router = llm_router
+    analysis = await router.analyze_task("Printer on floor 3")
+    assert analysis["router"] == "keyword"
+    assert analysis["required_agents"] == ["diagnostic"]
+
+@pytest.mark.asyncio
+async def test_analyzer_runs_with_the_router_lm():
+    """The router's LM applies to its own calls without replacing dspy's global settings."""
+    llm_router = DSPyRouter(program_path=None)
+    seen = []
+    llm_router.analyzer = MagicMock(side_effect=lambda task: seen.append(dspy.settings.lm) or {
+        "task_type": "simple", "required_agents": ["diagnostic"], "risk_level": "low", "complexity": "low"
+    })
+    analysis = await llm_router.analyze_task("Printer on floor 3")
+    assert seen == [llm_router.lm]
+    assert dspy.settings.lm is not llm_router.lm
+    assert analysis["required_agents"] == ["diagnostic"]
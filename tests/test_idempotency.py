@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.coordinator import Coordinator
+from app.utils.idempotency import IdempotencyStore, IdempotencyConflict, fingerprint
+
+@pytest.mark.asyncio
+async def test_retry_with_same_key_replays_response():
+    store = IdempotencyStore()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"task_id": f"task-{calls}"}
+
+    body = fingerprint({"request": "Restart the VM"})
+    # Concurrent retry waits for the original; a later retry gets the stored result
+    (first, replayed_first), (second, replayed_second) = await asyncio.gather(
+        store.run("key", body, work), store.run("key", body, work)
+    )
+    third, replayed_third = await store.run("key", body, work)
+    assert calls == 1
+    assert first == second == third == {"task_id": "task-1"}
+    assert (replayed_first, replayed_second, replayed_third) == (False, True, True)
+
+@pytest.mark.asyncio
+async def test_key_reuse_with_different_body_conflicts():
+    store = IdempotencyStore()
+
+    async def work():
+        return "ok"
+
+    await store.run("key", fingerprint({"request": "a"}), work)
+    with pytest.raises(IdempotencyConflict):
+        await store.run("key", fingerprint({"request": "b"}), work)
+
+@pytest.mark.asyncio
+async def test_failed_request_can_be_retried():
+    store = IdempotencyStore()
+    attempts = 0
+
+    async def work():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("transient")
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        await store.run("key", "body", work)
+    assert await store.run("key", "body", work) == ("ok", False)
+
+@pytest.mark.asyncio
+async def test_double_approve_executes_once():
+    coordinator = Coordinator()
+    runs = 0
+
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return {"status": "completed", "analysis": analysis, "errors": [], "results": {"commands": []}}
+
+    pending = await coordinator.execute_task("Restart the production database", require_approval=True)
+    assert pending.status == "waiting_approval"
+    with patch.object(coordinator.coordinator_graph, "execute", side_effect=fake_execute):
+        first, second = await asyncio.gather(
+            coordinator.approve_task(pending.task_id),
+            coordinator.approve_task(pending.task_id)
+        )
+        third = await coordinator.approve_task(pending.task_id)
+    assert runs == 1
+    assert first.status == second.status == third.status == "completed"
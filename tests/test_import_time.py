@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+LAZY_MODULES = ["dspy", "litellm", "langgraph", "openai"]
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-import-test")
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=project_root,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+
+def test_app_import_skips_heavy_modules():
+    """Importing the API must not pull in DSPy, LangGraph or the OpenAI SDK."""
+    result = _run("import app.main")
+    assert result.returncode == 0, result.stderr
+    imported = {
+        line.split("|")[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    eager = [name for name in LAZY_MODULES if name in imported]
+    assert not eager, f"Imported at startup: {eager}"
+
+def test_app_import_builds_no_agents():
+    """Agents are constructed on first use, not when the app is imported."""
+    result = _run(
+        "import app.main\n"
+        "from app.agents import registry\n"
+        "assert not registry._instances, list(registry._instances)\n"
+    )
+    assert result.returncode == 0, result.stderr
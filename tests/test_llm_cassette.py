@@ -0,0 +1,71 @@
+import asyncio
+import json
+import time
+import pytest
+from types import SimpleNamespace
+from app.utils.llm_cassette import Cassette, CassetteClient, RecordedResponse
+from app.utils.openai_client import OpenAIProjectClient
+
+class RateLimited(Exception):
+    status_code = 429
+
+def fake_provider(latency: float = 0.0):
+    """SDK-shaped client answering each call with a numbered completion."""
+    calls = []
+
+    async def create(**request):
+        calls.append(request)
+        await asyncio.sleep(latency)
+        if request["messages"][-1]["content"] == "overloaded":
+            raise RateLimited("Rate limit reached")
+        content = f"answer {len(calls)} to {request['messages'][-1]['content']}"
+        return RecordedResponse({"id": f"cmpl-{len(calls)}", "choices": [{"message": {"role": "assistant", "content": content}}]})
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))), calls
+
+def client_with(cassette_client: CassetteClient) -> OpenAIProjectClient:
+    client = OpenAIProjectClient(cassette_mode="replay")
+    client.client = cassette_client
+    return client
+
+async def ask(client: OpenAIProjectClient, content: str) -> str:
+    # A model of its own, so circuit breaker state left by other tests does not apply
+    response = await client.create_chat_completion(
+        messages=[{"role": "user", "content": content}], model="cassette-test-model", call_site="default"
+    )
+    return response["choices"][0]["message"]["content"]
+
+@pytest.mark.asyncio
+async def test_recorded_exchanges_replay_in_order_without_the_provider(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    provider, calls = fake_provider()
+    recorder = client_with(CassetteClient(Cassette(path), "record", provider))
+    recorded = [await ask(recorder, "restart vm"), await ask(recorder, "restart vm"), await ask(recorder, "list vms")]
+    with pytest.raises(Exception, match="Rate limit reached"):
+        await ask(recorder, "overloaded")
+    assert len(calls) == 4
+    with open(path) as f:
+        assert len([json.loads(line) for line in f]) == 4
+
+    player = client_with(CassetteClient(Cassette(path, latency_scale=0), "replay"))
+    replayed = [await ask(player, "restart vm"), await ask(player, "restart vm"), await ask(player, "list vms")]
+    assert replayed == recorded
+    # Past the recorded calls, a request gets its last response again
+    assert await ask(player, "restart vm") == recorded[1]
+    with pytest.raises(Exception, match="Rate limit reached"):
+        await ask(player, "overloaded")
+    with pytest.raises(Exception, match="No recorded exchange"):
+        await ask(player, "never asked")
+    assert len(calls) == 4
+
+@pytest.mark.asyncio
+async def test_replay_scales_recorded_latency(tmp_path):
+    path = str(tmp_path / "llm.jsonl")
+    provider, _ = fake_provider(latency=0.05)
+    await ask(client_with(CassetteClient(Cassette(path), "record", provider)), "restart vm")
+
+    for scale, low, high in ((0, 0, 0.04), (2, 0.1, 0.5)):
+        player = client_with(CassetteClient(Cassette(path, latency_scale=scale), "replay"))
+        started = time.perf_counter()
+        await ask(player, "restart vm")
+        assert low <= time.perf_counter() - started < high
@@ -0,0 +1,37 @@
+import asyncio
+import time
+import pytest
+from app.coordinator import Coordinator
+
+@pytest.mark.asyncio
+async def test_wait_returns_on_status_change():
+    coordinator = Coordinator()
+    pending = await coordinator.execute_task("Restart the production database", require_approval=True)
+
+    async def reject_later():
+        await asyncio.sleep(0.05)
+        await coordinator.reject_task(pending.task_id)
+
+    started = time.monotonic()
+    record, _ = await asyncio.gather(
+        coordinator.wait_for_task(pending.task_id, timeout=5, since_status="waiting_approval"),
+        reject_later()
+    )
+    assert record["status"] == "rejected"
+    assert time.monotonic() - started < 1
+
+@pytest.mark.asyncio
+async def test_wait_times_out_without_change():
+    coordinator = Coordinator()
+    pending = await coordinator.execute_task("Restart the production database", require_approval=True)
+    started = time.monotonic()
+    record = await coordinator.wait_for_task(pending.task_id, timeout=0.05)
+    assert record["status"] == "waiting_approval"
+    assert time.monotonic() - started >= 0.05
+
+@pytest.mark.asyncio
+async def test_wait_returns_immediately_when_status_already_differs():
+    coordinator = Coordinator()
+    pending = await coordinator.execute_task("Restart the production database", require_approval=True)
+    record = await coordinator.wait_for_task(pending.task_id, timeout=5, since_status="in_progress")
+    assert record["status"] == "waiting_approval"
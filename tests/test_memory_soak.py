@@ -0,0 +1,103 @@
+import asyncio
+import gc
+import logging
+import tracemalloc
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.coordinator import Coordinator
+from app.main import app
+from app.utils.memory_profiler import MemoryProfiler, task_footprint
+
+SOAK_TASKS = 2000
+RETAINED_TASKS = 50
+# Retained growth allowed per completed task once the retention window is full; a record,
+# cached response or event kept per task would be well above this
+MAX_RETAINED_BYTES_PER_TASK = 512
+
+SCRIPT = "Get-AzVM -Status |\n    Where-Object { $_.PowerState -eq 'VM running' }\n" * 20
+
+async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+    results = {"script": {"language": "powershell", "code": SCRIPT}, "email_draft": "VMs listed.", "commands": []}
+    return {"status": "completed", "analysis": analysis, "errors": [], "results": results}
+
+@pytest.mark.asyncio
+async def test_retained_memory_per_completed_task_stays_bounded():
+    coordinator = Coordinator()
+    coordinator.max_retained_tasks = RETAINED_TASKS
+
+    async def run_task():
+        response = await coordinator.execute_task("Generate a script to list VMs")
+        assert response.status == "completed"
+        # Touch the per-task caches a polling client would fill
+        coordinator.get_task_bytes(response.task_id)
+        # Let the loop run pending callbacks, as it would between requests
+        await asyncio.sleep(0)
+
+    was_tracing = tracemalloc.is_tracing()
+    # Captured log records and mock call records would be retained by the test itself
+    logging.disable(logging.INFO)
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        with patch.object(coordinator.coordinator_graph, "execute", new=fake_execute):
+            # Fill the retention window and warm every cache first, traced so that evicting
+            # the baseline window is credited against the tasks replacing it
+            for _ in range(RETAINED_TASKS * 4):
+                await run_task()
+            gc.collect()
+            baseline = tracemalloc.take_snapshot()
+            for _ in range(SOAK_TASKS):
+                await run_task()
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+    finally:
+        logging.disable(logging.NOTSET)
+        if not was_tracing:
+            tracemalloc.stop()
+
+    retained = sum(stat.size_diff for stat in after.compare_to(baseline, "filename"))
+    assert retained / SOAK_TASKS < MAX_RETAINED_BYTES_PER_TASK, f"{retained / SOAK_TASKS:.0f} bytes retained per task"
+    assert len(coordinator.tasks) == RETAINED_TASKS
+    assert len(coordinator._response_cache) <= RETAINED_TASKS
+
+@pytest.mark.asyncio
+async def test_finished_tasks_expire_by_age():
+    coordinator = Coordinator()
+    coordinator.retention_seconds = 60
+    with patch.object(coordinator.coordinator_graph, "execute", new=fake_execute):
+        first = await coordinator.execute_task("Generate a script to list VMs")
+        coordinator._finished[first.task_id] -= 120
+        second = await coordinator.execute_task("Generate a script to list VMs")
+    assert first.task_id not in coordinator.tasks
+    assert second.task_id in coordinator.tasks
+    # The newest task is kept even when it is already past the retention age
+    coordinator.retention_seconds = 0
+    coordinator._evict_finished_tasks()
+    assert list(coordinator.tasks) == [second.task_id]
+
+def test_footprint_and_allocation_report():
+    tasks = {str(i): {"task_id": str(i), "status": "completed", "end_time": 1.0, "result": {"commands": ["az vm list"]}} for i in range(10)}
+    footprint = task_footprint(tasks, sample=5)
+    assert footprint["tasks"] == 10 and footprint["sampled"] == 5
+    assert footprint["finished"] == 10
+    assert footprint["estimated_total_bytes"] >= footprint["per_task_bytes"] * 9 > 0
+
+    profiler = MemoryProfiler(enabled=True, frames=1)
+    was_tracing = profiler.tracing
+    profiler.start()
+    try:
+        report = profiler.report(tasks, limit=3)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    assert report["task_footprint"]["tasks"] == 10
+    assert len(report["top_allocations"]) <= 3
+
+def test_memory_endpoint_requires_admin_token():
+    response = TestClient(app).get("/api/v1/admin/memory")
+    assert response.status_code == 403
+    with patch("app.main.ADMIN_TOKEN", "secret"):
+        response = TestClient(app).get("/api/v1/admin/memory", headers={"X-Admin-Token": "secret"})
+    # Allowed, but tracing is off unless MEMORY_PROFILING is set
+    assert response.status_code == (200 if tracemalloc.is_tracing() else 404)
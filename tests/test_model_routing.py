@@ -0,0 +1,36 @@
+import json
+from app.utils.model_routing import ModelRouting
+
+TABLE = {
+    "default": {"model": "small", "temperature": 0.7, "max_tokens": 1000, "timeout": 30.0},
+    "automation": {"temperature": 0.2},
+    "automation.generate": {"escalation_model": "large"},
+    "automation.verify": {"temperature": 0.0, "max_tokens": 400},
+}
+
+def test_settings_merge_from_default_to_call_site():
+    """A call site inherits from its agent entry and the default entry."""
+    routing = ModelRouting(TABLE)
+    verify = routing.resolve("automation.verify")
+    assert verify["model"] == "small"
+    assert verify["temperature"] == 0.0
+    assert verify["max_tokens"] == 400
+    assert verify["timeout"] == 30.0
+    assert routing.resolve("writer")["temperature"] == 0.7
+
+def test_escalation_only_where_configured():
+    """Escalation switches to the stronger model only for call sites that define one."""
+    routing = ModelRouting(TABLE)
+    assert routing.resolve("automation.generate", escalate=True)["model"] == "large"
+    assert routing.resolve("automation.generate", escalate=True)["tier"] == "escalated"
+    assert routing.resolve("automation.verify", escalate=True)["model"] == "small"
+    assert routing.can_escalate("automation.generate")
+    assert not routing.can_escalate("automation.verify")
+
+def test_overrides_file(tmp_path):
+    """Entries from MODEL_ROUTING_FILE override the built-in table."""
+    path = tmp_path / "routing.json"
+    path.write_text(json.dumps({"automation.verify": {"model": "tiny"}}))
+    routing = ModelRouting(TABLE, str(path))
+    assert routing.resolve("automation.verify")["model"] == "tiny"
+    assert routing.resolve("automation.verify")["max_tokens"] == 400
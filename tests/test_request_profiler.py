@@ -0,0 +1,51 @@
+import json
+import threading
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.utils.request_profiler import ProfilingMiddleware, SamplingProfiler
+
+def busy_encode(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        json.dumps({"state": list(range(200))}, indent=2)
+
+def test_sampler_attributes_time_to_the_busy_function():
+    profiler = SamplingProfiler(threading.get_ident(), interval=0.001)
+    profiler.start()
+    busy_encode(0.2)
+    profiler.stop()
+
+    assert len(profiler.samples) > 20
+    # Collapsed lines are "root;...;leaf count", and nearly all time was spent encoding
+    counts = {line.rpartition(" ")[0]: int(line.rpartition(" ")[2]) for line in profiler.collapsed().splitlines()}
+    in_busy = sum(count for stack, count in counts.items() if "busy_encode" in stack)
+    assert in_busy >= 0.8 * len(profiler.samples)
+
+    profile = profiler.speedscope("test")["profiles"][0]
+    assert len(profile["samples"]) == len(profile["weights"]) == len(profiler.samples)
+    assert 0.1 < sum(profile["weights"]) <= profiler.duration
+
+def build_client(tmp_path) -> TestClient:
+    inner = FastAPI()
+
+    @inner.post("/api/v1/execute")
+    async def execute():
+        busy_encode(0.05)
+        return {"status": "completed"}
+
+    inner.add_middleware(ProfilingMiddleware, authorize=lambda token: token == "secret", enabled=True, directory=str(tmp_path), interval=0.001)
+    return TestClient(inner)
+
+def test_only_requests_asking_for_a_profile_with_the_admin_token_are_profiled(tmp_path):
+    client = build_client(tmp_path)
+    assert "x-profile-id" not in client.post("/api/v1/execute").headers
+    assert "x-profile-id" not in client.post("/api/v1/execute", headers={"X-Profile": "1"}).headers
+    assert not list(tmp_path.iterdir())
+
+    response = client.post("/api/v1/execute", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert response.json() == {"status": "completed"}
+    profile_id = response.headers["x-profile-id"]
+    speedscope = json.loads((tmp_path / f"{profile_id}.speedscope.json").read_text())
+    assert speedscope["profiles"][0]["name"] == "POST /api/v1/execute"
+    assert "busy_encode" in (tmp_path / f"{profile_id}.collapsed.txt").read_text()
@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app, coordinator
+from app.utils.compression import negotiate_encoding, available_encodings
+
+SCRIPT = "Get-AzVM -Status | Where-Object { $_.PowerState -eq 'VM running' }\n" * 200
+
+def test_negotiate_encoding_honours_weights():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("*") == available_encodings()[0]
+
+@pytest.fixture
+def finished_task_id():
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        results = {"script": {"language": "powershell", "code": SCRIPT}, "email_draft": "Done.", "commands": []}
+        return {"status": "completed", "analysis": analysis, "errors": [], "results": results}
+
+    client = TestClient(app)
+    with patch.object(coordinator.coordinator_graph, "execute", side_effect=fake_execute):
+        response = client.post("/api/v1/execute?fields=task_id,status", json={"request": "Generate a script to list VMs"})
+    assert response.status_code == 200
+    assert response.json().keys() == {"task_id", "status"}
+    return response.json()["task_id"]
+
+def test_fields_projection_and_compression(finished_task_id):
+    client = TestClient(app)
+    url = f"/api/v1/tasks/{finished_task_id}"
+
+    projected = client.get(url, params={"fields": "task_id,status,commands"}, headers={"Accept-Encoding": "identity"})
+    assert projected.json().keys() == {"task_id", "status", "commands"}
+    assert "content-encoding" not in projected.headers
+
+    full = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert full.headers["content-encoding"] == "gzip"
+    assert full.json()["script"]["code"] == SCRIPT
+    assert int(full.headers["content-length"]) < len(SCRIPT) / 5
+    # The compressed body is served from cache for the same strong ETag
+    again = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert again.content == full.content
+    assert full.headers["etag"].startswith("W/")
+    not_modified = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": full.headers["etag"]})
+    assert not_modified.status_code == 304
+    # The 304 names the same validator the compressed response carries
+    assert not_modified.headers["etag"] == full.headers["etag"]
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert not plain.headers["etag"].startswith("W/")
+    assert client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": full.headers["etag"]}).headers["etag"] == plain.headers["etag"]
+
+    listed = client.get("/api/v1/tasks", params={"fields": "task_id,status"})
+    assert all(task.keys() == {"task_id", "status"} for task in listed.json())
+    assert client.get(url, params={"fields": "task_id,secret"}).status_code == 422
+
+def test_small_responses_are_not_compressed():
+    response = TestClient(app).get("/api/v1/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["vary"]
@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from app.utils.scheduler import PriorityScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+async def _queue(scheduler, order, name, lane):
+    await scheduler.acquire(lane)
+    order.append(name)
+
+@pytest.mark.asyncio
+async def test_higher_lane_goes_first():
+    scheduler = PriorityScheduler(max_concurrent=1)
+    await scheduler.acquire("interactive")
+    order = []
+    waiters = [
+        asyncio.create_task(_queue(scheduler, order, "batch", "batch")),
+        asyncio.create_task(_queue(scheduler, order, "interactive", "interactive")),
+        asyncio.create_task(_queue(scheduler, order, "critical", "critical")),
+    ]
+    await asyncio.sleep(0)
+    for _ in range(3):
+        scheduler.release(order[-1] if order else "interactive")
+        await asyncio.sleep(0.01)
+    await asyncio.gather(*waiters)
+    assert order == ["critical", "interactive", "batch"]
+
+@pytest.mark.asyncio
+async def test_aging_lets_old_batch_work_through():
+    clock = FakeClock()
+    scheduler = PriorityScheduler(max_concurrent=1, aging_seconds=5.0, clock=clock)
+    await scheduler.acquire("interactive")
+    order = []
+    batch = asyncio.create_task(_queue(scheduler, order, "batch", "batch"))
+    await asyncio.sleep(0)
+    # Waited 11s: two lanes of aging puts it ahead of a fresh interactive request
+    clock.now = 11.0
+    interactive = asyncio.create_task(_queue(scheduler, order, "interactive", "interactive"))
+    await asyncio.sleep(0)
+    scheduler.release("interactive")
+    await asyncio.sleep(0.01)
+    assert order == ["batch"]
+    scheduler.release("batch")
+    await asyncio.gather(batch, interactive)
+    assert order == ["batch", "interactive"]
+
+@pytest.mark.asyncio
+async def test_lane_limit_leaves_room_for_other_lanes():
+    scheduler = PriorityScheduler(max_concurrent=3, lane_limits={"batch": 1})
+    await scheduler.acquire("batch")
+    assert not scheduler.can_start("batch")
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.acquire("batch", timeout=0.01)
+    assert scheduler.queued == 0
+    await scheduler.acquire("interactive")
+    assert scheduler.stats()["batch"] == {"running": 1, "queued": 0, "limit": 1}
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from app.coordinator import Coordinator
+from app.utils.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", f"owner-{i}", work) for i in range(5)))
+    assert calls == 1
+    assert [result for result, _ in results] == ["result"] * 5
+    assert [leader for _, leader in results] == [None] + ["owner-0"] * 4
+    assert len(flight) == 0
+
+@pytest.mark.asyncio
+async def test_leader_failure_reaches_followers():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("k", "a", work), flight.do("k", "b", work), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+@pytest.mark.asyncio
+async def test_identical_requests_are_coalesced():
+    """Duplicate submissions keep their own task IDs but run the pipeline once."""
+    coordinator = Coordinator()
+    runs = 0
+
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return {
+            "status": "completed",
+            "analysis": analysis,
+            "errors": [],
+            "results": {"diagnosis": {"root_cause": "Disk full"}, "commands": []}
+        }
+
+    with patch.object(coordinator.coordinator_graph, "execute", side_effect=fake_execute):
+        first, second = await asyncio.gather(
+            coordinator.execute_task("Diagnose disk usage and generate a cleanup script"),
+            coordinator.execute_task("  diagnose DISK usage and generate a cleanup script ")
+        )
+    assert runs == 1
+    assert first.task_id != second.task_id
+    assert second.coalesced_with == first.task_id
+    assert second.status == first.status == "completed"
+    assert second.diagnosis == {"root_cause": "Disk full"}
+    assert coordinator.tasks[first.task_id]["coalesced_task_ids"] == [second.task_id]
+
+@pytest.mark.asyncio
+async def test_follower_wait_is_bounded_by_its_timeout():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.1)
+        return "result"
+
+    leader = asyncio.create_task(flight.do("k", "a", work))
+    await asyncio.sleep(0)
+    with pytest.raises(asyncio.TimeoutError):
+        await flight.do("k", "b", work, timeout=0.01)
+    # The leader is not affected by its follower giving up
+    assert await leader == ("result", None)
+
+@pytest.mark.asyncio
+async def test_requests_with_different_deadlines_are_not_coalesced():
+    coordinator = Coordinator()
+    runs = 0
+
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return {"status": "completed", "analysis": analysis, "errors": [], "results": {"commands": []}}
+
+    with patch.object(coordinator.coordinator_graph, "execute", side_effect=fake_execute):
+        first, second = await asyncio.gather(
+            coordinator.execute_task("Diagnose disk usage and generate a cleanup script", deadline_seconds=30),
+            coordinator.execute_task("Diagnose disk usage and generate a cleanup script", deadline_seconds=5)
+        )
+    assert runs == 2
+    assert first.coalesced_with is None and second.coalesced_with is None
+
+@pytest.mark.asyncio
+async def test_follower_runs_the_work_when_its_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    leader = asyncio.create_task(flight.do("k", "a", work))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(flight.do("k", owner, work)) for owner in ("b", "c")]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # One follower takes over and the other shares its result
+    assert sorted(await asyncio.gather(*followers), key=str) == [("result", "b"), ("result", None)]
+    assert calls == 2
+    assert len(flight) == 0
+
+@pytest.mark.asyncio
+async def test_coalesced_task_finishes_when_its_leader_is_cancelled():
+    coordinator = Coordinator()
+
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        await asyncio.sleep(0.05)
+        return {"status": "completed", "analysis": analysis, "errors": [], "results": {"commands": []}}
+
+    with patch.object(coordinator.coordinator_graph, "execute", new=fake_execute):
+        leader = asyncio.create_task(coordinator.execute_task("Diagnose disk usage and generate a cleanup script"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(coordinator.execute_task("Diagnose disk usage and generate a cleanup script"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        response = await follower
+    assert response.status == "completed"
+    assert response.coalesced_with is None
+    assert coordinator.tasks[response.task_id]["status"] == "completed"
@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.subscriptions import SubscriptionHub
+
+def _drain(subscription):
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+@pytest.mark.asyncio
+async def test_events_reach_only_matching_subscribers():
+    hub = SubscriptionHub()
+    by_task, by_status, other = hub.subscribe(), hub.subscribe(), hub.subscribe()
+    hub.update(by_task, task_ids=["t1"])
+    hub.update(by_status, statuses=["waiting_approval"])
+    hub.update(other, task_ids=["t2"])
+
+    hub.publish("t1", {"status": "waiting_approval", "version": 1})
+    hub.publish("t1", {"status": "waiting_approval", "version": 2})  # no status change
+    hub.publish("t1", {"status": "executing", "version": 3})
+
+    assert [e["status"] for e in _drain(by_task)] == ["waiting_approval", "executing"]
+    # Status subscribers see tasks entering and leaving their status
+    assert [(e["previous_status"], e["status"]) for e in _drain(by_status)] == [(None, "waiting_approval"), ("waiting_approval", "executing")]
+    assert _drain(other) == []
+
+    hub.unsubscribe(by_task)
+    hub.publish("t1", {"status": "completed", "version": 4})
+    assert _drain(by_task) == []
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_events():
+    hub = SubscriptionHub(max_pending=2)
+    subscription = hub.subscribe()
+    hub.update(subscription, task_ids=["t1"])
+    for i, status in enumerate(["in_progress", "executing", "completed"]):
+        hub.publish("t1", {"status": status, "version": i})
+    assert [e["status"] for e in _drain(subscription)] == ["executing", "completed"]
+
+def test_websocket_subscription_receives_status_changes():
+    client = TestClient(app)
+    pending = client.post("/api/v1/execute", json={"request": "Restart the production database", "require_approval": True}).json()
+    with client.websocket_connect("/api/v1/ws") as websocket:
+        websocket.send_json({"action": "subscribe", "task_ids": [pending["task_id"]]})
+        assert websocket.receive_json()["status"] == "waiting_approval"
+        client.post(f"/api/v1/tasks/{pending['task_id']}/reject")
+        event = websocket.receive_json()
+        assert (event["task_id"], event["previous_status"], event["status"]) == (pending["task_id"], "waiting_approval", "rejected")
+
+def test_websocket_sender_failure_is_logged(caplog):
+    client = TestClient(app)
+    with patch("app.main.dumps_bytes", side_effect=TypeError("not serializable")):
+        with client.websocket_connect("/api/v1/ws") as websocket:
+            websocket.send_json({"action": "subscribe", "task_ids": ["unknown-task"]})
+            # The handler keeps serving requests after its sender has failed
+            websocket.send_json({"action": "noop"})
+            assert websocket.receive_json()["type"] == "error"
+    assert any("Event sender failed" in record.getMessage() and "not serializable" in record.getMessage() for record in caplog.records)
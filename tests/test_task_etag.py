@@ -0,0 +1,38 @@
+import json
+import pytest
+from unittest.mock import patch
+from app.coordinator import Coordinator
+from app.utils.serialization import etag_matches
+
+def test_etag_matching_is_weak():
+    assert etag_matches('W/"t-3"', '"t-3"')
+    assert etag_matches('"t-2", "t-3"', 'W/"t-3"')
+    assert etag_matches("*", '"t-3"')
+    assert not etag_matches('"t-2"', '"t-3"')
+
+@pytest.mark.asyncio
+async def test_finished_task_bytes_are_cached_until_it_changes():
+    coordinator = Coordinator()
+
+    async def fake_execute(task, task_id, analysis=None, on_state=None, checkpoint=None):
+        return {"status": "completed", "analysis": analysis, "errors": [], "results": {"commands": ["az vm list"]}}
+
+    with patch.object(coordinator.coordinator_graph, "execute", side_effect=fake_execute):
+        response = await coordinator.execute_task("Generate a script to list VMs")
+    task_id = response.task_id
+
+    body, etag = coordinator.get_task_bytes(task_id)
+    assert not etag.startswith("W/")
+    assert json.loads(body)["commands"] == ["az vm list"]
+    # Served from cache: the very same bytes object
+    assert coordinator.get_task_bytes(task_id)[0] is body
+
+    coordinator._update_task(task_id, coalesced_task_ids=["other"])
+    assert coordinator.task_etag(task_id) != etag
+    assert coordinator.get_task_bytes(task_id)[0] is not body
+
+@pytest.mark.asyncio
+async def test_pending_task_has_weak_etag():
+    coordinator = Coordinator()
+    response = await coordinator.execute_task("Restart the production database", require_approval=True)
+    assert coordinator.task_etag(response.task_id).startswith("W/")
@@ -0,0 +1,111 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.coordinator import Coordinator
+from app.utils.webhooks import WebhookDispatcher, check_callback_url
+
+class Receiver:
+    """Local HTTP receiver that fails the first `failures` requests with 503."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.requests = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                receiver.requests.append((self.path, body))
+                status = 503 if len(receiver.requests) <= receiver.failures else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def receiver():
+    r = Receiver(failures=1)
+    yield r
+    r.close()
+
+@pytest.mark.asyncio
+async def test_burst_is_batched_per_url_and_retried(receiver):
+    dispatcher = WebhookDispatcher(batch_window=0.05, backoff_seconds=0.01)
+    for i in range(3):
+        dispatcher.enqueue(f"{receiver.url}/hooks/a", {"task_id": f"task-{i}", "status": "completed"})
+    dispatcher.enqueue(f"{receiver.url}/hooks/b", {"task_id": "task-3", "status": "waiting_approval"})
+    await dispatcher.aclose()
+
+    delivered = {}
+    for path, body in receiver.requests:
+        delivered.setdefault(path, []).append([event["task_id"] for event in body["events"]])
+    # One request per URL, plus one retry after the receiver's first 503
+    assert len(receiver.requests) == 3
+    assert delivered["/hooks/a"][-1] == ["task-0", "task-1", "task-2"]
+    assert delivered["/hooks/b"][-1] == ["task-3"]
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_attempts():
+    r = Receiver(failures=10)
+    try:
+        dispatcher = WebhookDispatcher(batch_window=0.01, max_attempts=3, backoff_seconds=0.01)
+        dispatcher.enqueue(r.url, {"task_id": "task-0"})
+        await dispatcher.aclose()
+        assert len(r.requests) == 3
+    finally:
+        r.close()
+
+@pytest.mark.asyncio
+async def test_coordinator_notifies_plan_and_final_response():
+    coordinator = Coordinator()
+    sent = []
+    coordinator.webhooks.enqueue = lambda url, payload: sent.append((url, payload["status"], payload["plan"]))
+
+    pending = await coordinator.execute_task(
+        "Restart the production database", require_approval=True, callback_url="http://hooks.local/tasks"
+    )
+    await coordinator.reject_task(pending.task_id)
+    assert [status for _, status, _ in sent] == ["waiting_approval", "rejected"]
+    assert sent[0][2]["steps"]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hooks",
+    "http://localhost/hooks",
+    "http://10.0.0.5/hooks",
+    "http://192.168.1.10/hooks",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://metadata.google.internal/computeMetadata/v1/",
+    "http://[::1]/hooks",
+    "http://[::ffff:10.0.0.1]/hooks",
+    "http://0.0.0.0/hooks",
+    "http://240.0.0.1/hooks",
+])
+async def test_internal_callback_urls_are_refused(url):
+    with pytest.raises(ValueError):
+        await check_callback_url(url, allowed_hosts=[])
+
+@pytest.mark.asyncio
+async def test_callback_allowlist_decides_when_set():
+    await check_callback_url("http://93.184.216.34/hooks", allowed_hosts=[])
+    await check_callback_url("http://hooks.internal:9000/tasks", allowed_hosts=["hooks.internal"])
+    with pytest.raises(ValueError, match="not in WEBHOOK_ALLOWED_HOSTS"):
+        await check_callback_url("http://93.184.216.34/hooks", allowed_hosts=["hooks.internal"])
+
+def test_execute_rejects_internal_callback_url():
+    response = TestClient(app).post("/api/v1/execute", json={"request": "List VMs", "callback_url": "http://169.254.169.254/latest"})
+    assert response.status_code == 422
+    assert "non-public" in response.json()["detail"]